@@ -2,9 +2,11 @@ from flask import Flask, jsonify, request, session, redirect
 from flask_cors import CORS
 import ssl
 import atexit
+import hmac
 
 from config.settings import (
     FLASK_SECRET_KEY,
+    METRICS_TOKEN,
     CORS_ORIGINS,
     CORS_HEADERS,
     CORS_METHODS,
@@ -12,10 +14,12 @@ from config.settings import (
 )
 from config.database import Database
 from services.auth_service import AuthService
+from services.google_client_factory import GoogleClientFactory
 from services.scheduler_service import SchedulerService
 from models.user import User
 from utils.helpers import format_error_response
 from utils.logger import auth_logger, log_error
+from utils.metrics import metrics
 
 app = Flask(__name__)
 app.secret_key = FLASK_SECRET_KEY
@@ -39,6 +43,7 @@ if not db.ensure_connected():
     print("Warning: Failed to establish database connection. Some features may not work.")
 
 # Initialize services
+GoogleClientFactory.get_instance()  # Load discovery documents before the first request
 auth_service = AuthService()
 scheduler_service = SchedulerService.get_instance()
 
@@ -130,6 +135,16 @@ def index():
         }), 503
     return jsonify({"status": "healthy"})
 
+@app.route('/metrics')
+def get_metrics():
+    """Internal counters for operators, behind the METRICS_TOKEN bearer token"""
+    if not METRICS_TOKEN:
+        return format_error_response("Not found", 404)
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not hmac.compare_digest(token.encode('utf-8'), METRICS_TOKEN.encode('utf-8')):
+        return format_error_response("Unauthorized", 401)
+    return jsonify(metrics.snapshot())
+
 if __name__ == '__main__':
     context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
     context.load_cert_chain('../frontend/cert.pem', '../frontend/key.pem')
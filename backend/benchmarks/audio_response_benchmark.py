@@ -0,0 +1,161 @@
+"""Compare serving audio summaries from memory and from disk under concurrent requests.
+
+Requests go through the real /audio-summary view with gTTS replaced by a stub
+that returns a fixed-size MP3 at once, so the numbers show only the cost of
+buffering, caching and sending the file. The memory path is the default
+AudioCache; the disk path sets its memory budget and spool threshold to zero,
+so every render goes through a temporary file and every play opens the file.
+
+Scenarios:
+    play    every request replays the same cached summary
+    range   like play, with a Range request for the second half of the file
+    render  every request is for a new summary, so it is rendered and cached
+
+Usage (from the backend directory):
+    python benchmarks/audio_response_benchmark.py [--concurrency 1 8 32] [--requests 400] [--size-kb 300]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('AUDIO_CACHE_DIR', tempfile.mkdtemp(prefix='audio-benchmark-'))
+os.environ.setdefault('AUDIO_PRERENDER_ENABLED', 'false')
+os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+
+from flask import Flask  # noqa: E402
+
+from services.credential_manager import CredentialManager  # noqa: E402
+from services.scheduler_service import SchedulerService  # noqa: E402
+
+# The audio view needs neither; skip their MongoDB connection on import
+SchedulerService._instance = SchedulerService.__new__(SchedulerService)
+CredentialManager._instance = CredentialManager.__new__(CredentialManager)
+
+import blueprints.summary as summary_blueprint  # noqa: E402
+from services import tts_service  # noqa: E402
+from services.audio_cache import AudioCache  # noqa: E402
+from utils.metrics import percentile  # noqa: E402
+
+# One sentence, so each render is a single stub chunk of --size-kb
+SCRIPT = 'Good morning, here is your summary.'
+
+
+class StubTTS:
+    """gTTS stand-in that writes a fixed-size MP3 without a network call"""
+    size = 0
+
+    def __init__(self, text, **kwargs):
+        self.text = text
+
+    def write_to_fp(self, fp):
+        fp.write(os.urandom(self.size))
+
+
+class CurrentSummary:
+    """Stands in for the user's stored summary; the render scenario bumps it per request"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def set_fresh(self):
+        with self._lock:
+            self._counter += 1
+            self._local.summary = {'benchmark': self._counter}
+
+    def set_fixed(self):
+        self._local.summary = {'benchmark': 'fixed'}
+
+    def get(self, user_id):
+        return type('StoredSummary', (), {'summary': self._local.summary})()
+
+
+def _make_app(current):
+    summary_blueprint.Summary.get_recent_summary = staticmethod(current.get)
+    summary_blueprint.User.record_audio_access = staticmethod(lambda user_id: None)
+    summary_blueprint.User.get_audio_script_mode = staticmethod(lambda user_id: None)
+    tts_service.gTTS = StubTTS
+    tts_service.TTSService._generate_summary_script = lambda self, summary_data, *args: (SCRIPT, True)
+
+    app = Flask(__name__)
+    app.secret_key = 'benchmark'
+    app.register_blueprint(summary_blueprint.summary_bp)
+    return app
+
+
+def _use_cache(mode, directory):
+    if mode == 'memory':
+        cache = AudioCache(directory)
+    else:
+        cache = AudioCache(directory, memory_bytes=0, spool_threshold=0)
+    AudioCache._instance = cache
+    # Chunks are cached separately; keep them in memory for both modes
+    AudioCache._chunk_instance = AudioCache(os.path.join(directory, 'chunks'), name='audio_chunk_cache')
+
+
+def _request(app, current, scenario, size):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 'benchmark'
+
+    if scenario == 'render':
+        current.set_fresh()
+    else:
+        current.set_fixed()
+    headers = {'Range': f"bytes={size // 2}-"} if scenario == 'range' else {}
+
+    start = time.perf_counter()
+    response = client.get('/audio-summary', headers=headers)
+    body = response.get_data()
+    elapsed = time.perf_counter() - start
+
+    expected = size - size // 2 if scenario == 'range' else size
+    assert response.status_code in (200, 206), response.status_code
+    assert len(body) == expected, f"expected {expected} bytes, got {len(body)}"
+    return elapsed
+
+
+def run(concurrency_levels, requests, size):
+    # Per-request INFO logs would dominate the timings
+    logging.disable(logging.INFO)
+    StubTTS.size = size
+    current = CurrentSummary()
+    app = _make_app(current)
+
+    print(f"MP3 size: {size // 1024} KB, {requests} requests per run")
+    print(f"{'scenario':>8} | {'threads':>7} | {'mode':>6} | {'req/s':>8} | {'p50 (ms)':>8} | {'p95 (ms)':>8}")
+    print('-' * 61)
+    for scenario in ('play', 'range', 'render'):
+        for concurrency in concurrency_levels:
+            for mode in ('disk', 'memory'):
+                _use_cache(mode, tempfile.mkdtemp(prefix=f"{mode}-", dir=os.environ['AUDIO_CACHE_DIR']))
+                # Warm the cache so play and range measure only hits
+                current.set_fixed()
+                _request(app, current, 'play', size)
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    latencies = list(pool.map(lambda _: _request(app, current, scenario, size), range(requests)))
+                elapsed = time.perf_counter() - start
+
+                print(
+                    f"{scenario:>8} | {concurrency:>7} | {mode:>6} | {requests / elapsed:>8.0f} | "
+                    f"{percentile(latencies, 50) * 1000:>8.2f} | {percentile(latencies, 95) * 1000:>8.2f}"
+                )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32], help='Concurrent request threads')
+    parser.add_argument('--requests', type=int, default=400, help='Requests per scenario, thread count and mode')
+    parser.add_argument('--size-kb', type=int, default=300, help='Size of the stub MP3')
+    args = parser.parse_args()
+    run(args.concurrency, args.requests, args.size_kb * 1024)
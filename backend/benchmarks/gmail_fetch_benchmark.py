@@ -0,0 +1,123 @@
+"""Compare serial and batched Gmail message fetching against a mocked transport.
+
+The mocked transport sleeps for a fixed round-trip latency on every HTTP call,
+so the numbers show how wall-clock time grows with max_results for each mode.
+
+Usage (from the backend directory):
+    python benchmarks/gmail_fetch_benchmark.py [--latency-ms 80] [--sizes 10 25 50 100]
+"""
+import argparse
+import base64
+import json
+import os
+import re
+import sys
+import time
+
+import httplib2
+from googleapiclient.discovery import build
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Measure transport latency only, not the per-user quota limiter
+os.environ.setdefault('GMAIL_USER_QPS', '100000')
+os.environ.setdefault('GMAIL_PROJECT_QPS', '100000')
+
+from services.gmail_service import GmailService  # noqa: E402
+from services.google_api_executor import GoogleApiExecutor  # noqa: E402
+
+CONTENT_ID_PATTERN = re.compile(r'Content-ID: <([^>]+)>')
+REQUEST_LINE_PATTERN = re.compile(r'GET /gmail/v1/users/me/messages/([^/?\s]+)')
+
+
+def _fake_message(message_id):
+    body = base64.urlsafe_b64encode(f"Body of message {message_id}".encode('utf-8')).decode('utf-8')
+    return {
+        'id': message_id,
+        'threadId': f"thread-{message_id}",
+        'snippet': f"Snippet for {message_id}",
+        'payload': {
+            'headers': [
+                {'name': 'Subject', 'value': f"Subject {message_id}"},
+                {'name': 'From', 'value': f"Sender <sender-{message_id}@example.com>"},
+                {'name': 'Date', 'value': 'Mon, 1 Jan 2024 09:00:00 +0000'},
+            ],
+            'body': {'data': body},
+        },
+    }
+
+
+class LatencyHttp:
+    """httplib2-compatible transport that answers Gmail calls after a fixed delay"""
+
+    def __init__(self, latency, max_results):
+        self.latency = latency
+        self.max_results = max_results
+        self.calls = 0
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+
+        if '/batch' in uri:
+            return self._batch_response(body)
+        if re.search(r'/users/me/messages\?', uri) or uri.endswith('/users/me/messages'):
+            messages = [{'id': f"msg{i}", 'threadId': f"thread-msg{i}"} for i in range(self.max_results)]
+            return self._json_response({'messages': messages})
+
+        message_id = uri.split('/messages/')[1].split('?')[0]
+        return self._json_response(_fake_message(message_id))
+
+    def _json_response(self, payload):
+        return httplib2.Response({'status': '200', 'content-type': 'application/json'}), json.dumps(payload).encode('utf-8')
+
+    def _batch_response(self, body):
+        boundary = 'batch_benchmark_boundary'
+        parts = []
+        for content_id, message_id in zip(CONTENT_ID_PATTERN.findall(body), REQUEST_LINE_PATTERN.findall(body)):
+            parts.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                "HTTP/1.1 200 OK\r\n"
+                "Content-Type: application/json; charset=UTF-8\r\n\r\n"
+                f"{json.dumps(_fake_message(message_id))}\r\n"
+            )
+        content = ''.join(parts) + f"--{boundary}--\r\n"
+        headers = {'status': '200', 'content-type': f"multipart/mixed; boundary={boundary}"}
+        return httplib2.Response(headers), content.encode('utf-8')
+
+
+def _make_gmail_service(http):
+    gmail_service = GmailService.__new__(GmailService)
+    gmail_service.service = build('gmail', 'v1', http=http)
+    gmail_service.executor = GoogleApiExecutor.get_instance()
+    gmail_service.quota_key = 'benchmark'
+    return gmail_service
+
+
+def run(latency, sizes):
+    print(f"Round-trip latency: {latency * 1000:.0f} ms")
+    print(f"{'max_results':>11} | {'serial (s)':>10} | {'calls':>5} | {'batched (s)':>11} | {'calls':>5} | {'speedup':>7}")
+    print('-' * 66)
+    for size in sizes:
+        timings = {}
+        for batched in (False, True):
+            http = LatencyHttp(latency, size)
+            gmail_service = _make_gmail_service(http)
+            start = time.perf_counter()
+            emails = gmail_service.get_recent_emails(max_results=size, batched=batched)
+            elapsed = time.perf_counter() - start
+            assert len(emails) == size, f"expected {size} emails, got {len(emails)}"
+            timings[batched] = (elapsed, http.calls)
+
+        (serial_time, serial_calls), (batched_time, batched_calls) = timings[False], timings[True]
+        print(f"{size:>11} | {serial_time:>10.3f} | {serial_calls:>5} | {batched_time:>11.3f} | {batched_calls:>5} | {serial_time / batched_time:>6.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency-ms', type=float, default=80.0, help='Simulated round-trip latency per HTTP call')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 25, 50, 75, 100], help='max_results values to measure')
+    args = parser.parse_args()
+    run(args.latency_ms / 1000.0, args.sizes)
@@ -1,15 +1,27 @@
-from flask import Blueprint, jsonify, session, request, send_file
+from flask import Blueprint, Response, jsonify, session, request, send_file, stream_with_context
 from models.user import User
 from models.summary import Summary
+from services.async_google_client import AsyncGoogleClient, AsyncGoogleApiError
 from services.calendar_service import CalendarService
+from services.calendar_sync_service import CalendarSyncService
 from services.gmail_service import GmailService
 from services.gemini_service import GeminiService, GeminiServiceError
+from services.local_summarizer import local_summary
 from services.scheduler_service import SchedulerService
-from services.tts_service import TTSService
+from services.smart_reply_service import SmartReplyService
+from services.summary_merger import summary_sources
+from services.tts_service import TTSService, script_mode
+from services.audio_prerender import AudioPrerenderer
+from services.credential_manager import CredentialManager
 from utils.helpers import format_error_response
+from config.settings import AUDIO_CLIENT_MAX_AGE_SECONDS, AUDIO_SCRIPT_MODES
 from utils.logger import summary_logger, log_error
 from datetime import datetime, timedelta, timezone
-import os
+import json
+import time
+
+# Longest an audio request waits on a background render of the same summary
+AUDIO_PRERENDER_WAIT_SECONDS = 60
 
 # Error messages
 INIT_SERVICES_ERROR = "Failed to initialize services"
@@ -24,6 +36,7 @@ DB_UNAVAILABLE_ERROR = "Database service unavailable"
 
 summary_bp = Blueprint('summary', __name__)
 scheduler_service = SchedulerService.get_instance()
+credential_manager = CredentialManager.get_instance()
 
 @summary_bp.route('/summary')
 def get_summary():
@@ -40,7 +53,7 @@ def get_summary():
             summary_logger.error(f"User {user_id} not found")
             return format_error_response(USER_NOT_FOUND_ERROR, 401)
             
-        credentials = user.credentials
+        credentials = credential_manager.get_credentials(user)
         if not credentials:
             summary_logger.error(f"No valid credentials found for user {user_id}")
             return format_error_response(NO_CREDENTIALS_ERROR, 401)
@@ -54,49 +67,25 @@ def get_summary():
             if cached_summary and not _is_summary_stale(cached_summary):
                 summary_logger.info(f"Returning cached summary for user {user_id}")
                 return jsonify({
-                    "summary": cached_summary.summary_text,
+                    "summary": cached_summary.summary,
                     "cached": True,
+                    "degraded": cached_summary.degraded,
                     "generated_at": cached_summary.generated_at.isoformat()
                 })
 
         # Force refresh or no valid cache - use scheduler to refresh digest
         try:
             summary_logger.info(f"Refreshing digest for user {user_id}")
-            calendar_service = CalendarService(credentials)
-            gmail_service = GmailService(credentials)
+            digest = scheduler_service.refresh_user_digest(user_id, window_hours=48, max_emails=10)
+            if not digest:
+                # The user or their credentials went away during the refresh
+                return format_error_response(NO_CREDENTIALS_ERROR, 401)
 
-            events = calendar_service.get_events(
-                time_min=datetime.now(timezone.utc).isoformat(),
-                time_max=(datetime.now(timezone.utc) + timedelta(hours=48)).isoformat()
-            )
-            raw_emails = gmail_service.get_recent_emails(max_results=10)  # Get up to 20 emails for summary
-            
-            # Format emails to ensure threadId and other required fields are included
-            formatted_emails = []
-            for email in raw_emails:
-                if email and email.get('threadId'):  # Only include emails with valid threadId
-                    formatted_emails.append({
-                        'subject': email.get('subject', 'No Subject'),
-                        'from': email.get('from', 'Unknown Sender'),
-                        'from_email': email.get('from_email'),  # Include from_email field
-                        'threadId': email['threadId'],
-                        'snippet': email.get('snippet', ''),
-                        'date': email.get('date', ''),
-                        'id': email.get('id', '')
-                    })
-            
-            # Generate structured summary through Gemini
-            gemini_service = GeminiService()
-            summary_text = gemini_service.generate_summary(events, formatted_emails)
-            
-            # Save the summary
-            summary = Summary(user_id, summary_text)
-            summary.save()
-            
             return jsonify({
-                "summary": summary_text,
+                "summary": digest["summary"],
                 "cached": False,
-                "generated_at": datetime.now(timezone.utc).isoformat()
+                "degraded": digest.get("degraded", False),
+                "generated_at": digest["generated_at"]
             })
         except Exception as e:
             log_error(summary_logger, e, "Failed to refresh digest")
@@ -106,6 +95,118 @@ def get_summary():
         log_error(summary_logger, e, "Unexpected error in summary endpoint")
         return format_error_response(str(e), 500)
 
+@summary_bp.route('/summary/stream')
+def stream_summary():
+    """Stream a freshly generated summary over Server-Sent Events.
+
+    Each top-level section (quickSummary, events, emails, actionItems) is sent
+    as a `section` event as soon as Gemini has produced it, followed by a
+    `done` event once the full summary is validated and saved. If Gemini fails
+    or its circuit breaker is open, the local summary's sections are sent
+    instead and `done` is marked degraded. While another run holds the user's
+    digest lock, the summary it saves is replayed instead of generating a second one.
+    """
+    try:
+        summary_logger.info("Streaming summary request initiated")
+        user_id = session.get('user_id')
+        if not user_id:
+            summary_logger.warning("Unauthorized summary stream request - no user_id in session")
+            return format_error_response(UNAUTHORIZED_ERROR, 401)
+
+        user = User.find_by_id(user_id)
+        if not user:
+            summary_logger.error(f"User {user_id} not found")
+            return format_error_response(USER_NOT_FOUND_ERROR, 401)
+        if not credential_manager.get_credentials(user):
+            summary_logger.error(f"No valid credentials found for user {user_id}")
+            return format_error_response(NO_CREDENTIALS_ERROR, 401)
+
+        inputs = scheduler_service.collect_digest_inputs(user_id, window_hours=48, max_emails=10)
+        if not inputs:
+            return format_error_response(NO_CREDENTIALS_ERROR, 401)
+        gemini_service = GeminiService()
+    except Exception as e:
+        log_error(summary_logger, e, "Failed to prepare summary stream")
+        return format_error_response(FETCH_DATA_ERROR, 500)
+
+    def generate():
+        lock_owner = None
+        try:
+            # Share the digest lock with /summary and the scheduler so only one run saves a summary
+            lock_owner, latest = scheduler_service.acquire_digest_lock(user_id, inputs["window"])
+            if latest:
+                for section, value in latest["summary"].items():
+                    yield _sse('section', {"key": section, "value": value})
+                yield _sse('done', {
+                    "cached": True,
+                    "coalesced": True,
+                    "degraded": latest["degraded"],
+                    "generated_at": latest["generated_at"]
+                })
+                return
+
+            previous = inputs["previous"]
+            if inputs["unchanged"]:
+                previous.touch()
+                for section, value in previous.summary.items():
+                    yield _sse('section', {"key": section, "value": value})
+                yield _sse('done', {"cached": True, "generated_at": previous.generated_at.isoformat()})
+                return
+
+            summary_data = None
+            breaker = scheduler_service.summary_breaker
+            if breaker.allow():
+                started = time.monotonic()
+                disconnected = False
+                try:
+                    for event in gemini_service.generate_summary_stream(inputs["events"], inputs["emails"]):
+                        if event[0] == 'section':
+                            yield _sse('section', {"key": event[1], "value": event[2]})
+                        else:
+                            summary_data = event[1]
+                except GeneratorExit:
+                    # The client went away; that says nothing about Gemini
+                    disconnected = True
+                    raise
+                except Exception as e:
+                    log_error(summary_logger, e, "Gemini summary stream failed, using local summary")
+                finally:
+                    breaker.record(time.monotonic() - started, disconnected or summary_data is not None)
+
+            if summary_data is None:
+                # Sections already sent are replaced by the local summary's
+                summary_data = local_summary(inputs["events"], inputs["emails"])
+                for section, value in summary_data.items():
+                    yield _sse('section', {"key": section, "value": value})
+                summary = Summary(user_id, summary_data, degraded=True, window=inputs["window"])
+            else:
+                summary = Summary(
+                    user_id,
+                    summary_data,
+                    fingerprint=inputs["fingerprint"],
+                    sources=summary_sources(inputs["events"], inputs["emails"]),
+                    window=inputs["window"]
+                )
+            summary.save()
+            if not summary.degraded:
+                AudioPrerenderer.get_instance().submit(user, summary.summary)
+            yield _sse('done', {
+                "cached": False,
+                "degraded": summary.degraded,
+                "generated_at": summary.generated_at.isoformat()
+            })
+        except Exception as e:
+            log_error(summary_logger, e, "Failed to stream summary")
+            yield _sse('error', {"error": str(e)})
+        finally:
+            if lock_owner:
+                scheduler_service.release_digest_lock(user_id, inputs["window"], lock_owner)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stop proxies from buffering the stream
+    })
+
 @summary_bp.route('/smart-replies/<thread_id>')
 def get_smart_replies(thread_id):
     try:
@@ -127,33 +228,25 @@ def get_smart_replies(thread_id):
             summary_logger.error(f"User {user_id} not found")
             return format_error_response(USER_NOT_FOUND_ERROR, 401)
             
-        credentials = user.credentials
+        credentials = credential_manager.get_credentials(user)
         if not credentials:
             summary_logger.error(f"No valid credentials found for user {user_id}")
             return format_error_response(NO_CREDENTIALS_ERROR, 401)
 
         # Initialize services
         try:
-            gmail_service = GmailService(credentials)
-            gemini_service = GeminiService()
+            smart_reply_service = SmartReplyService(user_id, AsyncGoogleClient(credentials, user_id))
         except Exception as e:
             log_error(summary_logger, e, "Failed to initialize services")
             return format_error_response(INIT_SERVICES_ERROR, 500)
 
-        # Get thread details
+        # Serve cached replies for the thread's latest message, or generate them
         try:
-            thread = gmail_service.get_thread(thread_id)
-        except Exception as e:
+            result = smart_reply_service.get_replies(thread_id)
+            return jsonify(result)
+        except AsyncGoogleApiError as e:
             log_error(summary_logger, e, "Failed to fetch thread")
             return format_error_response(FETCH_THREAD_ERROR, 500)
-
-        # Generate smart replies
-        try:
-            replies = gemini_service.generate_smart_replies(thread)
-            return jsonify({
-                "replies": replies,
-                "thread": thread
-            })
         except Exception as e:
             log_error(summary_logger, e, "Failed to generate smart replies")
             return format_error_response(str(e), 500)
@@ -177,12 +270,13 @@ def send_reply():
 
         # Get user and check credentials
         user = User.find_by_id(user_id)
-        if not user or not user.credentials:
+        credentials = credential_manager.get_credentials(user) if user else None
+        if not credentials:
             return format_error_response(UNAUTHORIZED_ERROR, 401)
 
         # Initialize Gmail service
         try:
-            gmail_service = GmailService(user.credentials)
+            gmail_service = GmailService(credentials)
         except Exception as e:
             log_error(summary_logger, e, "Failed to initialize Gmail service")
             return format_error_response(INIT_SERVICES_ERROR, 500)
@@ -222,30 +316,72 @@ def get_audio_summary():
         if not cached_summary:
             return format_error_response("No recent summary available", 404)
             
-        # Generate audio from summary
-        tts_service = TTSService()
-        audio_file = tts_service.generate_audio_summary(cached_summary.summary_text)
-        
+        mode = None
         try:
-            response = send_file(
-                audio_file,
-                mimetype='audio/mpeg',
-                as_attachment=True,
-                download_name='summary.mp3'
-            )
-            # Add CORS headers specifically for audio streaming
-            response.headers['Accept-Ranges'] = 'bytes'
-            response.headers['Cache-Control'] = 'no-cache'
+            User.record_audio_access(user_id)
+            mode = User.get_audio_script_mode(user_id)
+        except Exception as e:
+            log_error(summary_logger, e, f"Failed to record audio access for user {user_id}")
+
+        # Serve the audio for this summary, rendering it on the first request.
+        # A background render already in progress is awaited instead of repeated.
+        AudioPrerenderer.get_instance().wait(cached_summary.summary, mode, timeout=AUDIO_PRERENDER_WAIT_SECONDS)
+        tts_service = TTSService()
+        audio, audio_key = tts_service.get_cached_audio(cached_summary.summary, mode)
+        if audio is None:
+            # Stream chunks as they are synthesized; later requests hit the cache
+            chunks, audio_key = tts_service.stream_audio(cached_summary.summary, mode)
+            response = Response(stream_with_context(chunks), mimetype='audio/mpeg')
+            response.headers['Content-Disposition'] = 'attachment; filename=summary.mp3'
+            response.headers['Cache-Control'] = 'no-store'
+            response.headers['X-Accel-Buffering'] = 'no'
             return response
-        finally:
-            # Clean up the temporary file after sending
-            if os.path.exists(audio_file):
-                os.unlink(audio_file)
+
+        # The ETag is the summary hash, so conditional and Range requests
+        # (If-None-Match, If-Range) are answered from the cached copy, which
+        # is an in-memory buffer unless the MP3 is too large to hold
+        response = send_file(
+            audio,
+            mimetype='audio/mpeg',
+            as_attachment=True,
+            download_name='summary.mp3',
+            conditional=True,
+            etag=audio_key,
+            max_age=AUDIO_CLIENT_MAX_AGE_SECONDS
+        )
+        response.cache_control.public = False
+        response.cache_control.private = True
+        response.cache_control.must_revalidate = True
+        response.headers['Accept-Ranges'] = 'bytes'
+        return response
                 
     except Exception as e:
         log_error(summary_logger, e, "Failed to generate audio summary")
         return format_error_response(str(e), 500)
 
+@summary_bp.route('/audio-summary/mode', methods=['GET', 'POST'])
+def audio_script_mode():
+    """Get or set how the audio summary script is written: auto, llm or template"""
+    try:
+        user_id = session.get('user_id')
+        if not user_id:
+            summary_logger.warning("Unauthorized audio mode request")
+            return format_error_response(UNAUTHORIZED_ERROR, 401)
+
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            if data.get('mode') not in AUDIO_SCRIPT_MODES:
+                return format_error_response(f"mode must be one of: {', '.join(AUDIO_SCRIPT_MODES)}", 400)
+            User.set_audio_script_mode(user_id, data['mode'])
+            summary_logger.info(f"Audio script mode set to {data['mode']} for user {user_id}")
+            return jsonify({"mode": data['mode']})
+
+        return jsonify({"mode": script_mode(User.get_audio_script_mode(user_id))})
+
+    except Exception as e:
+        log_error(summary_logger, e, "Failed to update audio script mode")
+        return format_error_response(str(e), 500)
+
 @summary_bp.route('/pending-invites')
 def get_pending_invites():
     """Get list of pending calendar invitations"""
@@ -262,14 +398,13 @@ def get_pending_invites():
             summary_logger.error(f"User {user_id} not found")
             return format_error_response(USER_NOT_FOUND_ERROR, 401)
             
-        credentials = user.credentials
+        credentials = credential_manager.get_credentials(user)
         if not credentials:
             summary_logger.error(f"No valid credentials found for user {user_id}")
             return format_error_response(NO_CREDENTIALS_ERROR, 401)
 
-        # Get pending invites using calendar service
-        calendar_service = CalendarService(credentials)
-        pending_invites = calendar_service.get_pending_invites()
+        # Get pending invites from the synced local event store
+        pending_invites = CalendarSyncService(user_id, AsyncGoogleClient(credentials, user_id)).get_pending_invites()
         
         return jsonify({
             "pending_invites": pending_invites
@@ -295,7 +430,7 @@ def accept_invite(event_id):
             summary_logger.error(f"User {user_id} not found")
             return format_error_response(USER_NOT_FOUND_ERROR, 401)
             
-        credentials = user.credentials
+        credentials = credential_manager.get_credentials(user)
         if not credentials:
             summary_logger.error(f"No valid credentials found for user {user_id}")
             return format_error_response(NO_CREDENTIALS_ERROR, 401)
@@ -303,6 +438,8 @@ def accept_invite(event_id):
         # Accept invite using calendar service
         calendar_service = CalendarService(credentials)
         success = calendar_service.accept_calendar_invite(event_id)
+        if success:
+            CalendarSyncService(user_id, AsyncGoogleClient(credentials, user_id)).invalidate()
         
         return jsonify({
             "success": success,
@@ -329,7 +466,7 @@ def decline_invite(event_id):
             summary_logger.error(f"User {user_id} not found")
             return format_error_response(USER_NOT_FOUND_ERROR, 401)
             
-        credentials = user.credentials
+        credentials = credential_manager.get_credentials(user)
         if not credentials:
             summary_logger.error(f"No valid credentials found for user {user_id}")
             return format_error_response(NO_CREDENTIALS_ERROR, 401)
@@ -337,6 +474,8 @@ def decline_invite(event_id):
         # Decline invite using calendar service
         calendar_service = CalendarService(credentials)
         success = calendar_service.decline_calendar_invite(event_id)
+        if success:
+            CalendarSyncService(user_id, AsyncGoogleClient(credentials, user_id)).invalidate()
         
         return jsonify({
             "success": success,
@@ -347,10 +486,18 @@ def decline_invite(event_id):
         log_error(summary_logger, e, "Failed to decline calendar invite")
         return format_error_response(str(e), 500)
 
+def _sse(event, data):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 def _is_summary_stale(summary):
     """Check if a cached summary is too old to use"""
     if not summary or not summary.generated_at:
         return True
+
+    # Fallback summaries are replaced as soon as Gemini can be reached again
+    if summary.degraded:
+        return True
     
     # Both datetimes are now guaranteed to be timezone-aware in UTC
     age = datetime.now(timezone.utc) - summary.generated_at
@@ -1,5 +1,5 @@
 from pymongo import MongoClient
-from .settings import MONGO_URI, DATABASE_NAME
+from .settings import MONGO_URI, DATABASE_NAME, SMART_REPLY_CACHE_TTL_DAYS
 from utils.logger import db_logger, log_error
 
 class DatabaseError(Exception):
@@ -37,6 +37,16 @@ class Database:
         self.db = None
         self.users = None
         self.summaries = None
+        self.gmail_sync_state = None
+        self.gmail_messages = None
+        self.calendar_sync_state = None
+        self.calendar_events = None
+        self.scheduler_leases = None
+        self.scheduler_nodes = None
+        self.digest_shards = None
+        self.gemini_cache = None
+        self.rate_limits = None
+        self.smart_replies = None
         self.initialize()
     
     def initialize(self):
@@ -46,11 +56,35 @@ class Database:
             self.db = self.client[DATABASE_NAME]
             self.users = self.db['users']
             self.summaries = self.db['summaries']
+            self.gmail_sync_state = self.db['gmail_sync_state']
+            self.gmail_messages = self.db['gmail_messages']
+            self.calendar_sync_state = self.db['calendar_sync_state']
+            self.calendar_events = self.db['calendar_events']
+            self.scheduler_leases = self.db['scheduler_leases']
+            self.scheduler_nodes = self.db['scheduler_nodes']
+            self.digest_shards = self.db['digest_shards']
+            self.gemini_cache = self.db['gemini_cache']
+            self.rate_limits = self.db['rate_limits']
+            self.smart_replies = self.db['smart_replies']
             
             # Create indexes
             db_logger.info("Creating database indexes")
             self.users.create_index("user_id", unique=True)
             self.summaries.create_index([("user_id", 1), ("generated_at", -1)])
+            self.summaries.create_index([("user_id", 1), ("window", 1), ("generated_at", -1)])
+            self.gmail_sync_state.create_index("user_id", unique=True)
+            self.gmail_messages.create_index([("user_id", 1), ("message_id", 1)], unique=True)
+            self.gmail_messages.create_index([("user_id", 1), ("internal_date", -1)])
+            self.calendar_sync_state.create_index("user_id", unique=True)
+            self.calendar_events.create_index([("user_id", 1), ("event_id", 1)], unique=True)
+            self.calendar_events.create_index([("user_id", 1), ("start_at", 1)])
+            self.scheduler_nodes.create_index("node_id", unique=True)
+            self.scheduler_nodes.create_index("expires_at", expireAfterSeconds=0)
+            self.digest_shards.create_index([("status", 1), ("lease_expires_at", 1)])
+            self.digest_shards.create_index("created_at", expireAfterSeconds=7 * 24 * 3600)
+            self.gemini_cache.create_index("expires_at", expireAfterSeconds=0)
+            self.smart_replies.create_index([("user_id", 1), ("thread_id", 1)], unique=True)
+            self.smart_replies.create_index("generated_at", expireAfterSeconds=SMART_REPLY_CACHE_TTL_DAYS * 24 * 3600)
             
             # Test connection
             self.client.server_info()
@@ -61,6 +95,16 @@ class Database:
             self.db = None
             self.users = None
             self.summaries = None
+            self.gmail_sync_state = None
+            self.gmail_messages = None
+            self.calendar_sync_state = None
+            self.calendar_events = None
+            self.scheduler_leases = None
+            self.scheduler_nodes = None
+            self.digest_shards = None
+            self.gemini_cache = None
+            self.rate_limits = None
+            self.smart_replies = None
             raise DatabaseConnectionError("Failed to initialize database connection") from e
     
     def is_connected(self):
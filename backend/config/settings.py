@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 from utils.logger import auth_logger
 
@@ -6,6 +7,7 @@ load_dotenv()
 
 # Flask Configuration
 FLASK_SECRET_KEY = os.environ.get("FLASK_SECRET_KEY", "supersecretkey")
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")  # Bearer token for /metrics; the endpoint is disabled when unset
 FRONTEND_URL = os.environ.get("FRONTEND_URL", "https://localhost:3001")
 BACKEND_URL = os.environ.get('BACKEND_URL', 'https://localhost:5000')
 
@@ -35,9 +37,93 @@ SCOPES = [
     'https://www.googleapis.com/auth/gmail.send',  # For sending emails
 ]
 
+# OAuth token refresh Configuration
+CREDENTIAL_REFRESH_MARGIN_SECONDS = int(os.environ.get("CREDENTIAL_REFRESH_MARGIN_SECONDS", 300))  # Refresh tokens this long before expiry
+CREDENTIAL_REFRESH_INTERVAL_MINUTES = int(os.environ.get("CREDENTIAL_REFRESH_INTERVAL_MINUTES", 10))  # Background refresh cadence
+
+# Digest refresh Configuration
+DIGEST_REFRESH_INTERVAL_MINUTES = int(os.environ.get("DIGEST_REFRESH_INTERVAL_MINUTES", 60))  # Bulk refresh cadence
+DIGEST_REFRESH_CONCURRENCY = int(os.environ.get("DIGEST_REFRESH_CONCURRENCY", 25))  # Users refreshed at once by the bulk job
+DIGEST_INCREMENTAL_MAX_CHANGES = int(os.environ.get("DIGEST_INCREMENTAL_MAX_CHANGES", 10))  # Merge into the previous summary up to this many added/removed items
+DIGEST_FULL_REFRESH_HOURS = int(os.environ.get("DIGEST_FULL_REFRESH_HOURS", 24))  # Rebuild from scratch at least this often
+DIGEST_LOCK_TTL_SECONDS = int(os.environ.get("DIGEST_LOCK_TTL_SECONDS", 120))  # Cross-worker lock on one user's digest generation
+
+# Scheduler cluster Configuration
+SCHEDULER_HEARTBEAT_SECONDS = int(os.environ.get("SCHEDULER_HEARTBEAT_SECONDS", 30))  # Node heartbeat and shard polling cadence
+SCHEDULER_LEASE_TTL_SECONDS = int(os.environ.get("SCHEDULER_LEASE_TTL_SECONDS", 90))  # Leader and shard leases expire after this without renewal
+DIGEST_SHARD_MAX_ATTEMPTS = int(os.environ.get("DIGEST_SHARD_MAX_ATTEMPTS", 3))  # Give up on a shard after this many claims
+
+# Google API client Configuration
+GOOGLE_CLIENT_CACHE_SIZE = int(os.environ.get("GOOGLE_CLIENT_CACHE_SIZE", 256))  # Built service objects kept in memory
+GOOGLE_CLIENT_CACHE_TTL_SECONDS = int(os.environ.get("GOOGLE_CLIENT_CACHE_TTL_SECONDS", 1800))
+GOOGLE_HTTP_TIMEOUT_SECONDS = int(os.environ.get("GOOGLE_HTTP_TIMEOUT_SECONDS", 30))
+GOOGLE_ASYNC_MAX_CONNECTIONS = int(os.environ.get("GOOGLE_ASYNC_MAX_CONNECTIONS", 100))  # Pooled connections shared by the async client
+ASYNC_BLOCKING_WORKERS = int(os.environ.get("ASYNC_BLOCKING_WORKERS", 64))  # Threads for blocking calls (pymongo) made from async code
+
+# Google API quota Configuration (requests per second per user and per project)
+GOOGLE_API_RATE_LIMITS = {
+    'gmail': {
+        'user_qps': float(os.environ.get("GMAIL_USER_QPS", 50)),  # 250 quota units/s at 5 units per call
+        'project_qps': float(os.environ.get("GMAIL_PROJECT_QPS", 2000))
+    },
+    'calendar': {
+        'user_qps': float(os.environ.get("CALENDAR_USER_QPS", 10)),
+        'project_qps': float(os.environ.get("CALENDAR_PROJECT_QPS", 150))
+    }
+}
+GOOGLE_API_MAX_RETRIES = int(os.environ.get("GOOGLE_API_MAX_RETRIES", 5))
+GOOGLE_API_BACKOFF_BASE_SECONDS = float(os.environ.get("GOOGLE_API_BACKOFF_BASE_SECONDS", 1))
+GOOGLE_API_BACKOFF_MAX_SECONDS = float(os.environ.get("GOOGLE_API_BACKOFF_MAX_SECONDS", 32))
+
+# Gmail API Configuration
+GMAIL_BATCH_SIZE = int(os.environ.get("GMAIL_BATCH_SIZE", 50))  # Gmail accepts up to 100 calls per batch request
+GMAIL_SYNC_MAX_MESSAGES = int(os.environ.get("GMAIL_SYNC_MAX_MESSAGES", 100))  # Messages cached by a full resync
+GMAIL_SYNC_MIN_INTERVAL_SECONDS = int(os.environ.get("GMAIL_SYNC_MIN_INTERVAL_SECONDS", 60))  # Skip syncs closer together than this
+GMAIL_ASYNC_FETCH_CONCURRENCY = int(os.environ.get("GMAIL_ASYNC_FETCH_CONCURRENCY", 10))  # Concurrent message fetches per user
+
+# Calendar API Configuration
+CALENDAR_SYNC_LOOKBACK_DAYS = int(os.environ.get("CALENDAR_SYNC_LOOKBACK_DAYS", 1))  # How far back a full resync starts
+CALENDAR_SYNC_LOOKAHEAD_DAYS = int(os.environ.get("CALENDAR_SYNC_LOOKAHEAD_DAYS", 90))  # How far ahead a full resync expands recurring events
+CALENDAR_SYNC_MIN_INTERVAL_SECONDS = int(os.environ.get("CALENDAR_SYNC_MIN_INTERVAL_SECONDS", 60))  # Skip syncs closer together than this
+
 # Gemini API Configuration
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 GEMINI_MODEL = 'models/gemini-2.0-flash'
+GEMINI_CACHE_ENABLED = os.environ.get("GEMINI_CACHE_ENABLED", "true").lower() == "true"  # Set to false to bypass the response cache
+GEMINI_CACHE_TTL_SECONDS = int(os.environ.get("GEMINI_CACHE_TTL_SECONDS", 24 * 3600))
+GEMINI_CACHE_MEMORY_SIZE = int(os.environ.get("GEMINI_CACHE_MEMORY_SIZE", 512))  # Results kept in the in-process LRU
+SUMMARY_PROMPT_TOKEN_BUDGET = int(os.environ.get("SUMMARY_PROMPT_TOKEN_BUDGET", 6000))  # Max prompt tokens for a digest
+SMART_REPLY_PROMPT_TOKEN_BUDGET = int(os.environ.get("SMART_REPLY_PROMPT_TOKEN_BUDGET", 3000))  # Max prompt tokens for smart replies
+PROMPT_TOKEN_COUNTER = os.environ.get("PROMPT_TOKEN_COUNTER", "estimate")  # "estimate" (local) or "count_tokens" (Gemini API)
+GEMINI_CONCURRENCY_INITIAL = int(os.environ.get("GEMINI_CONCURRENCY_INITIAL", 4))  # Starting limit on concurrent Gemini calls
+GEMINI_CONCURRENCY_MIN = int(os.environ.get("GEMINI_CONCURRENCY_MIN", 1))
+GEMINI_CONCURRENCY_MAX = int(os.environ.get("GEMINI_CONCURRENCY_MAX", 32))
+GEMINI_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("GEMINI_QUEUE_TIMEOUT_SECONDS", 60))  # How long a call may wait for capacity
+GEMINI_LIMITER_SHARED = os.environ.get("GEMINI_LIMITER_SHARED", "false").lower() == "true"  # Share rate-limit cuts between processes
+SMART_REPLY_CACHE_TTL_DAYS = int(os.environ.get("SMART_REPLY_CACHE_TTL_DAYS", 7))  # How long cached thread replies are kept
+SMART_REPLY_PREGENERATE_MAX_THREADS = int(os.environ.get("SMART_REPLY_PREGENERATE_MAX_THREADS", 5))  # Threads per digest to prepare replies for
+GEMINI_SUMMARY_TIMEOUT_SECONDS = float(os.environ.get("GEMINI_SUMMARY_TIMEOUT_SECONDS", 30))  # Give up on a summary call and fall back after this
+SUMMARY_SLO_P95_SECONDS = float(os.environ.get("SUMMARY_SLO_P95_SECONDS", 20))  # Route to the local summarizer above this p95 latency
+SUMMARY_SLO_ERROR_RATE = float(os.environ.get("SUMMARY_SLO_ERROR_RATE", 0.5))  # ... or above this error rate
+SUMMARY_BREAKER_WINDOW = int(os.environ.get("SUMMARY_BREAKER_WINDOW", 20))  # Recent Gemini summary calls the SLO is measured over
+SUMMARY_BREAKER_OPEN_SECONDS = int(os.environ.get("SUMMARY_BREAKER_OPEN_SECONDS", 60))  # How long to stay on the fallback before trying Gemini again
+
+# Audio summary Configuration
+AUDIO_CACHE_DIR = os.environ.get("AUDIO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "digest-audio"))  # Rendered MP3s, one per summary
+AUDIO_CACHE_MAX_BYTES = int(os.environ.get("AUDIO_CACHE_MAX_BYTES", 200 * 1024 * 1024))  # Least recently played files are evicted above this
+AUDIO_MEMORY_CACHE_MAX_BYTES = int(os.environ.get("AUDIO_MEMORY_CACHE_MAX_BYTES", 64 * 1024 * 1024))  # Recently played MP3s served from memory, per cache
+AUDIO_MEMORY_MAX_BYTES = int(os.environ.get("AUDIO_MEMORY_MAX_BYTES", 4 * 1024 * 1024))  # Larger MP3s are spooled to disk and served from the file
+AUDIO_CLIENT_MAX_AGE_SECONDS = int(os.environ.get("AUDIO_CLIENT_MAX_AGE_SECONDS", 300))  # Browser cache lifetime before revalidating the ETag
+AUDIO_PRERENDER_ENABLED = os.environ.get("AUDIO_PRERENDER_ENABLED", "true").lower() == "true"  # Render audio after each summary refresh
+AUDIO_PRERENDER_ACTIVE_DAYS = int(os.environ.get("AUDIO_PRERENDER_ACTIVE_DAYS", 7))  # Only for users who played audio this recently
+AUDIO_PRERENDER_WORKERS = int(os.environ.get("AUDIO_PRERENDER_WORKERS", 2))  # Background render threads
+AUDIO_PRERENDER_MAX_PENDING = int(os.environ.get("AUDIO_PRERENDER_MAX_PENDING", 100))  # Renders queued beyond this are dropped
+AUDIO_SCRIPT_MODES = ('auto', 'llm', 'template')
+AUDIO_SCRIPT_MODE = os.environ.get("AUDIO_SCRIPT_MODE", "auto")  # Default for users without a preference: auto, llm or template
+AUDIO_SCRIPT_BUDGET_MS = int(os.environ.get("AUDIO_SCRIPT_BUDGET_MS", 1500))  # In auto mode, use the template if Gemini's script takes longer
+TTS_CHUNK_MAX_CHARS = int(os.environ.get("TTS_CHUNK_MAX_CHARS", 200))  # Longer sentences are split at commas or spaces
+TTS_CHUNK_CONCURRENCY = int(os.environ.get("TTS_CHUNK_CONCURRENCY", 8))  # Chunks synthesized at once, across all requests
+AUDIO_CHUNK_CACHE_MAX_BYTES = int(os.environ.get("AUDIO_CHUNK_CACHE_MAX_BYTES", 100 * 1024 * 1024))  # Per-sentence MP3s shared between summaries
 
 # CORS Configuration
 CORS_ORIGINS = ["http://localhost:3000", "http://localhost:3001", "https://localhost:3001", "https://calendar-gmail-summary-frontend.onrender.com"]
@@ -1,12 +1,24 @@
+import json
 from datetime import datetime, timedelta, timezone
 from config.database import Database, DatabaseConnectionError, DB_ERROR_MESSAGES
 
 class Summary:
-    def __init__(self, user_id, summary_text, prompt_used=None):
+    """A generated digest; the summary document is stored as a BSON subdocument"""
+
+    def __init__(self, user_id, summary, prompt_used=None, fingerprint=None, sources=None, full_generated_at=None, degraded=False, window=None):
         self.user_id = user_id
-        self.summary_text = summary_text
+        self.summary = summary
         self.prompt_used = prompt_used
+        self.fingerprint = fingerprint
+        self.sources = sources
+        # The calendar hours and email count the summary covers, e.g. "48h/10"
+        self.window = window
+        # Built by the local fallback summarizer rather than Gemini
+        self.degraded = degraded
         self.generated_at = datetime.now(timezone.utc)
+        # When the summary was last built from scratch rather than merged
+        self.full_generated_at = full_generated_at or self.generated_at
+        self._id = None
         self.db = Database.get_instance()
 
     def save(self):
@@ -15,11 +27,26 @@ class Summary:
         
         summary_doc = {
             "user_id": self.user_id,
-            "summary_text": self.summary_text,
+            "summary": self.summary,
             "generated_at": self.generated_at,
-            "prompt_used": self.prompt_used
+            "prompt_used": self.prompt_used,
+            "fingerprint": self.fingerprint,
+            "sources": self.sources,
+            "full_generated_at": self.full_generated_at,
+            "degraded": self.degraded,
+            "window": self.window
         }
-        return self.db.summaries.insert_one(summary_doc)
+        result = self.db.summaries.insert_one(summary_doc)
+        self._id = result.inserted_id
+        return result
+
+    def touch(self):
+        """Mark an unchanged summary as freshly generated without rewriting it"""
+        if self.db is None or not self.db.is_connected():
+            raise DatabaseConnectionError(DB_ERROR_MESSAGES['connection'])
+
+        self.generated_at = datetime.now(timezone.utc)
+        return self.db.summaries.update_one({'_id': self._id}, {'$set': {'generated_at': self.generated_at}})
 
     @staticmethod
     def get_recent_summary(user_id, hours=1):
@@ -36,17 +63,49 @@ class Summary:
             sort=[('generated_at', -1)]
         )
         
-        if cached_summary:
-            summary = Summary(
-                user_id=cached_summary['user_id'],
-                summary_text=cached_summary['summary_text'],
-                prompt_used=cached_summary.get('prompt_used')
-            )
-            # Convert stored datetime to timezone-aware if it isn't already
-            generated_at = cached_summary['generated_at']
-            if generated_at.tzinfo is None:
-                generated_at = generated_at.replace(tzinfo=timezone.utc)
-            summary.generated_at = generated_at
-            return summary
-        
-        return None
\ No newline at end of file
+        return Summary._from_doc(cached_summary) if cached_summary else None
+
+    @staticmethod
+    def get_latest_summary(user_id, window=None):
+        """Get the user's newest summary regardless of age, optionally only one built for window"""
+        db = Database.get_instance()
+        if db is None or not db.is_connected():
+            raise DatabaseConnectionError(DB_ERROR_MESSAGES['connection'])
+
+        query = {'user_id': user_id}
+        if window is not None:
+            query['window'] = window
+        latest_summary = db.summaries.find_one(query, sort=[('generated_at', -1)])
+        return Summary._from_doc(latest_summary) if latest_summary else None
+
+    @staticmethod
+    def _from_doc(summary_doc):
+        summary = Summary(
+            user_id=summary_doc['user_id'],
+            summary=_stored_summary(summary_doc),
+            prompt_used=summary_doc.get('prompt_used'),
+            fingerprint=summary_doc.get('fingerprint'),
+            sources=summary_doc.get('sources'),
+            degraded=summary_doc.get('degraded', False),
+            window=summary_doc.get('window')
+        )
+        # Convert stored datetimes to timezone-aware if they aren't already
+        generated_at = summary_doc['generated_at']
+        if generated_at.tzinfo is None:
+            generated_at = generated_at.replace(tzinfo=timezone.utc)
+        summary.generated_at = generated_at
+        full_generated_at = summary_doc.get('full_generated_at') or generated_at
+        if full_generated_at.tzinfo is None:
+            full_generated_at = full_generated_at.replace(tzinfo=timezone.utc)
+        summary.full_generated_at = full_generated_at
+        summary._id = summary_doc.get('_id')
+        return summary
+
+def _stored_summary(summary_doc):
+    """Read the summary subdocument, decoding the JSON string older documents stored"""
+    if 'summary' in summary_doc:
+        return summary_doc['summary']
+    try:
+        return json.loads(summary_doc.get('summary_text') or 'null')
+    except ValueError:
+        return None
@@ -1,4 +1,4 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from config.database import Database, DatabaseError, DatabaseConnectionError, DB_ERROR_MESSAGES
 from config.settings import SCOPES
 from utils.logger import db_logger as logger
@@ -18,6 +18,8 @@ class User:
         self.name = name
         self.db = Database.get_instance()
         self._credentials = None
+        self.last_audio_access = None
+        self.audio_script_mode = None
 
     @property
     def credentials(self):
@@ -26,6 +28,11 @@ class User:
             self._credentials = self.get_credentials()
         return self._credentials
 
+    @credentials.setter
+    def credentials(self, credentials_dict):
+        """Replace the loaded credentials, e.g. with ones refreshed and stored elsewhere."""
+        self._credentials = credentials_dict
+
     @staticmethod
     def find_by_id(user_id):
         db = Database.get_instance()
@@ -37,9 +44,48 @@ class User:
             user = User(user_data['user_id'], user_data['email'], user_data['name'])
             if 'credentials' in user_data:
                 user._credentials = user_data['credentials']
+            user.last_audio_access = user_data.get('last_audio_access')
+            user.audio_script_mode = user_data.get('audio_script_mode')
             return user
         return None
 
+    @staticmethod
+    def record_audio_access(user_id):
+        """Note that the user just played an audio summary"""
+        db = Database.get_instance()
+        if db is None or not db.is_connected():
+            raise DatabaseConnectionError(DB_ERROR_MESSAGES['connection'])
+
+        return db.users.update_one({'user_id': user_id}, {'$set': {'last_audio_access': datetime.now(timezone.utc)}})
+
+    @staticmethod
+    def get_audio_script_mode(user_id):
+        """The user's preferred audio script mode, or None for the default"""
+        db = Database.get_instance()
+        if db is None or not db.is_connected():
+            raise DatabaseConnectionError(DB_ERROR_MESSAGES['connection'])
+
+        user_data = db.users.find_one({'user_id': user_id}, {'audio_script_mode': 1})
+        return user_data.get('audio_script_mode') if user_data else None
+
+    @staticmethod
+    def set_audio_script_mode(user_id, mode):
+        """Store the user's preferred audio script mode"""
+        db = Database.get_instance()
+        if db is None or not db.is_connected():
+            raise DatabaseConnectionError(DB_ERROR_MESSAGES['connection'])
+
+        return db.users.update_one({'user_id': user_id}, {'$set': {'audio_script_mode': mode}})
+
+    def used_audio_within(self, days):
+        """Check whether the user played an audio summary in the last `days` days"""
+        if not self.last_audio_access:
+            return False
+        last_access = self.last_audio_access
+        if last_access.tzinfo is None:
+            last_access = last_access.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - last_access <= timedelta(days=days)
+
     def save_credentials(self, credentials_dict):
         """Save or update user credentials, handling scope changes."""
         if self.db is None or not self.db.is_connected():
@@ -0,0 +1,269 @@
+import asyncio
+import weakref
+import httpx
+from config.settings import (
+    GOOGLE_HTTP_TIMEOUT_SECONDS,
+    GOOGLE_ASYNC_MAX_CONNECTIONS,
+    GOOGLE_API_MAX_RETRIES,
+    GMAIL_ASYNC_FETCH_CONCURRENCY
+)
+from services.calendar_service import format_event, select_pending_invites
+from services.credential_manager import CredentialManager
+from services.gmail_service import METADATA_HEADERS, METADATA_FIELDS, recent_emails_query, parse_message, parse_thread
+from services.google_api_executor import GoogleApiExecutor, quota_user_key
+from utils.logger import api_logger, log_error
+from utils.metrics import metrics
+
+GMAIL_API_URL = 'https://gmail.googleapis.com/gmail/v1/users/me'
+CALENDAR_API_URL = 'https://www.googleapis.com/calendar/v3'
+
+class AsyncGoogleApiError(Exception):
+    """Exception raised when a Gmail or Calendar REST call fails."""
+
+    def __init__(self, status, message):
+        super().__init__(f"Google API request failed with status {status}: {message}")
+        self.status = status
+
+class AsyncGoogleClient:
+    """Asyncio client for the Gmail and Calendar REST endpoints.
+
+    All clients on an event loop share one pooled httpx.AsyncClient, so
+    hundreds of concurrent user refreshes reuse the same keep-alive
+    connections. Requests go through the same quota buckets and retry rules
+    as GoogleApiExecutor. A rejected access token is refreshed once through
+    CredentialManager, so the new token is stored for the user's later
+    requests.
+    """
+    _http_clients = weakref.WeakKeyDictionary()
+
+    def __init__(self, credentials_dict, user_id):
+        self.credentials_dict = credentials_dict
+        self.user_id = user_id
+        self.token = credentials_dict['token']
+        self.quota_key = quota_user_key(credentials_dict)
+        self.executor = GoogleApiExecutor.get_instance()
+
+    @classmethod
+    def _http(cls):
+        loop = asyncio.get_running_loop()
+        client = cls._http_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                timeout=GOOGLE_HTTP_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=GOOGLE_ASYNC_MAX_CONNECTIONS,
+                    max_keepalive_connections=GOOGLE_ASYNC_MAX_CONNECTIONS
+                )
+            )
+            cls._http_clients[loop] = client
+        return client
+
+    async def request(self, api, url, params=None):
+        """GET a Google API URL and return the decoded JSON body"""
+        attempt = 0
+        refreshed = False
+        while True:
+            wait = self.executor.reserve(api, self.quota_key)
+            if wait > 0:
+                metrics.increment(f'google_api.{api}.throttled')
+                await asyncio.sleep(wait)
+            metrics.increment(f'google_api.{api}.requests')
+
+            try:
+                response = await self._http().get(url, params=params, headers={'Authorization': f'Bearer {self.token}'})
+            except httpx.TransportError as e:
+                # Timeouts and connection failures are transient, like a 503
+                if attempt >= GOOGLE_API_MAX_RETRIES:
+                    self.executor.record_failure(api)
+                    raise
+                delay = self.executor.backoff_delay(None, attempt)
+                attempt += 1
+                self.executor.record_retry(api)
+                api_logger.warning(f"{api} request failed with {type(e).__name__}, retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            if response.status_code < 300:
+                return response.json()
+
+            if response.status_code == 401 and not refreshed:
+                refreshed = True
+                if await asyncio.to_thread(self._refresh_token):
+                    continue
+
+            reasons = _error_reasons(response)
+            if not self.executor.is_retryable_status(response.status_code, reasons) or attempt >= GOOGLE_API_MAX_RETRIES:
+                self.executor.record_failure(api)
+                raise AsyncGoogleApiError(response.status_code, response.text[:200])
+            delay = self.executor.backoff_delay(response.headers.get('retry-after'), attempt)
+            attempt += 1
+            self.executor.record_retry(api)
+            api_logger.warning(f"{api} request failed with status {response.status_code}, retry {attempt} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    def _refresh_token(self):
+        """Swap in a refreshed token; returns False if there is no newer one"""
+        credentials = CredentialManager.get_instance().refresh_rejected(self.user_id, self.token)
+        if not credentials or credentials['token'] == self.token:
+            return False
+        self.credentials_dict = credentials
+        self.token = credentials['token']
+        return True
+
+    # Gmail
+
+    async def list_recent_message_ids(self, max_results):
+        """List the IDs of up to max_results messages from the recent window"""
+        message_ids = []
+        page_token = None
+        while len(message_ids) < max_results:
+            params = {'q': recent_emails_query(), 'maxResults': min(max_results - len(message_ids), 500)}
+            if page_token:
+                params['pageToken'] = page_token
+            results = await self.request('gmail', f'{GMAIL_API_URL}/messages', params)
+            message_ids.extend(message['id'] for message in results.get('messages', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+        return message_ids
+
+    async def get_messages(self, message_ids):
+        """Fetch message metadata with a bounded concurrent fan-out, keeping order.
+
+        A failed fetch only drops that message.
+        """
+        semaphore = asyncio.Semaphore(GMAIL_ASYNC_FETCH_CONCURRENCY)
+
+        async def _fetch(message_id):
+            async with semaphore:
+                try:
+                    message = await self.request('gmail', f'{GMAIL_API_URL}/messages/{message_id}', {
+                        'format': 'metadata',
+                        'metadataHeaders': METADATA_HEADERS,
+                        'fields': METADATA_FIELDS
+                    })
+                    return parse_message(message)
+                except Exception as e:
+                    log_error(api_logger, e, f"Failed to fetch email details for ID: {message_id}")
+                    return None
+
+        messages = await asyncio.gather(*(_fetch(message_id) for message_id in message_ids))
+        return [message for message in messages if message]
+
+    async def get_recent_emails(self, max_results=10):
+        """Fetch recent email metadata directly from the API"""
+        return await self.get_messages(await self.list_recent_message_ids(max_results))
+
+    async def get_thread(self, thread_id):
+        """Fetch a thread with full message bodies"""
+        thread = await self.request('gmail', f'{GMAIL_API_URL}/threads/{thread_id}', {'format': 'full'})
+        return parse_thread(thread)
+
+    async def get_thread_message_ids(self, thread_id):
+        """List a thread's message IDs, oldest first, without fetching the messages"""
+        thread = await self.request('gmail', f'{GMAIL_API_URL}/threads/{thread_id}', {
+            'format': 'minimal',
+            'fields': 'messages/id'
+        })
+        return [message['id'] for message in thread.get('messages', [])]
+
+    async def get_history_id(self):
+        """Get the mailbox's current historyId"""
+        profile = await self.request('gmail', f'{GMAIL_API_URL}/profile')
+        return profile.get('historyId')
+
+    async def list_history(self, start_history_id):
+        """List mailbox history records since start_history_id.
+
+        Returns the records and the latest historyId. Raises
+        AsyncGoogleApiError with status 404 when start_history_id is too old.
+        """
+        records = []
+        latest_history_id = start_history_id
+        page_token = None
+        while True:
+            params = {
+                'startHistoryId': start_history_id,
+                'historyTypes': ['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved']
+            }
+            if page_token:
+                params['pageToken'] = page_token
+            response = await self.request('gmail', f'{GMAIL_API_URL}/history', params)
+            records.extend(response.get('history', []))
+            latest_history_id = response.get('historyId', latest_history_id)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return records, latest_history_id
+
+    # Calendar
+
+    async def get_primary_calendar_id(self):
+        """Get the primary calendar ID, which is the user's email address"""
+        calendar = await self.request('calendar', f'{CALENDAR_API_URL}/users/me/calendarList/primary')
+        return calendar.get('id')
+
+    async def list_event_changes(self, sync_token=None, time_min=None, time_max=None):
+        """List expanded events for incremental sync.
+
+        Without a sync_token this is a full listing of the time_min to time_max
+        window; with one it returns only events changed since that token,
+        including cancelled ones.
+        Returns the events and the nextSyncToken. Raises AsyncGoogleApiError
+        with status 410 when the sync token has expired.
+        """
+        events = []
+        page_token = None
+        while True:
+            params = {'singleEvents': 'true', 'maxResults': 2500}
+            if sync_token:
+                params['syncToken'] = sync_token
+            else:
+                params['timeMin'] = time_min
+                params['timeMax'] = time_max
+            if page_token:
+                params['pageToken'] = page_token
+            events_result = await self.request('calendar', f'{CALENDAR_API_URL}/calendars/primary/events', params)
+            events.extend(events_result.get('items', []))
+            page_token = events_result.get('nextPageToken')
+            if not page_token:
+                return events, events_result.get('nextSyncToken')
+
+    async def list_events(self, time_min, time_max, max_results=None):
+        """List raw events overlapping a window directly from the API, in start order"""
+        events = []
+        page_token = None
+        while True:
+            params = {
+                'timeMin': time_min,
+                'timeMax': time_max,
+                'singleEvents': 'true',
+                'orderBy': 'startTime',
+                'maxResults': max_results or 2500
+            }
+            if page_token:
+                params['pageToken'] = page_token
+            events_result = await self.request('calendar', f'{CALENDAR_API_URL}/calendars/primary/events', params)
+            events.extend(events_result.get('items', []))
+            page_token = events_result.get('nextPageToken')
+            if max_results or not page_token:
+                return events
+
+    async def get_events(self, time_min, time_max, max_results=10):
+        """Fetch formatted events overlapping a window directly from the API"""
+        return [format_event(event) for event in await self.list_events(time_min, time_max, max_results)]
+
+    async def get_pending_invites(self, time_min, time_max):
+        """Fetch unanswered invites in a window directly from the API"""
+        user_email, events = await asyncio.gather(
+            self.get_primary_calendar_id(),
+            self.list_events(time_min, time_max)
+        )
+        return select_pending_invites(events, user_email)
+
+def _error_reasons(response):
+    """Pull the error reasons out of a Google API error body"""
+    try:
+        error = response.json().get('error', {})
+    except ValueError:
+        return []
+    details = error.get('errors', []) + error.get('details', [])
+    return [detail.get('reason') for detail in details if isinstance(detail, dict)]
@@ -0,0 +1,239 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from tempfile import NamedTemporaryFile
+from config.settings import (
+    AUDIO_CACHE_DIR,
+    AUDIO_CACHE_MAX_BYTES,
+    AUDIO_CHUNK_CACHE_MAX_BYTES,
+    AUDIO_MEMORY_CACHE_MAX_BYTES,
+    AUDIO_MEMORY_MAX_BYTES
+)
+from utils.logger import summary_logger
+from utils.metrics import metrics
+
+class AudioCache:
+    """Size-bounded disk cache of rendered audio summaries.
+
+    Files are named by a hash of the summary content, so an unchanged summary
+    is rendered once and every later play is a single file read. Hits refresh
+    the file's mtime; when the directory grows past AUDIO_CACHE_MAX_BYTES the
+    least recently used files are deleted. A running byte total is kept, so
+    the directory is only scanned once it may be over the limit. Files are
+    written under a temporary name and renamed into place, so readers never
+    see a partial MP3.
+
+    In front of the disk sits an LRU of recently used files of at most
+    spool_threshold bytes, bounded by memory_bytes in total, so repeat plays
+    are served from memory without touching the disk.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+    _chunk_instance = None
+
+    @classmethod
+    def get_instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    @classmethod
+    def get_chunk_instance(cls):
+        """Cache of per-sentence MP3 chunks, kept in a subdirectory with its own size limit"""
+        with cls._instance_lock:
+            if cls._chunk_instance is None:
+                cls._chunk_instance = cls(os.path.join(AUDIO_CACHE_DIR, 'chunks'), AUDIO_CHUNK_CACHE_MAX_BYTES, 'audio_chunk_cache')
+            return cls._chunk_instance
+
+    def __init__(self, directory=AUDIO_CACHE_DIR, max_bytes=AUDIO_CACHE_MAX_BYTES, name='audio_cache',
+                 memory_bytes=AUDIO_MEMORY_CACHE_MAX_BYTES, spool_threshold=AUDIO_MEMORY_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.name = name
+        self.memory_bytes = memory_bytes
+        self.spool_threshold = spool_threshold
+        self._memory = OrderedDict()
+        self._memory_total = 0
+        # Bytes on disk as of the last scan plus files put since; None until the first scan
+        self._disk_total = None
+        self._lock = threading.Lock()
+        self._memory_lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, summary_data, variant=''):
+        """Content hash of a summary (plus anything else that changes the audio)"""
+        content = json.dumps(summary_data, sort_keys=True, default=str)
+        return hashlib.sha256(f"{variant}\n{content}".encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def get(self, key):
+        """Path of the cached file for key, or None on a miss"""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            metrics.increment(f'{self.name}.misses')
+            return None
+        metrics.increment(f'{self.name}.hits')
+        return path
+
+    def read(self, key):
+        """Bytes of the cached file for key from memory or disk, or None on a miss"""
+        data = self._recall(key)
+        if data is None:
+            data = self._load(key, self.get(key))
+        return data
+
+    def open(self, key):
+        """Something send_file can serve for key: a BytesIO when it fits in memory, else a path; None on a miss"""
+        data = self._recall(key)
+        if data is None:
+            path = self.get(key)
+            try:
+                if path is not None and os.path.getsize(path) > self.spool_threshold:
+                    return path
+            except FileNotFoundError:
+                return None
+            data = self._load(key, path)
+        # BytesIO shares the bytes object's buffer instead of copying it
+        return io.BytesIO(data) if data is not None else None
+
+    def buffer(self):
+        """Start an AudioBuffer to render into before commit()"""
+        return AudioBuffer(self, self.spool_threshold)
+
+    def temp_file(self):
+        """Open a temporary file in the cache directory to render into before put()"""
+        return NamedTemporaryFile(dir=self.directory, suffix='.part', delete=False)
+
+    def put(self, key, temp_path):
+        """Move a rendered file into the cache and return its path"""
+        path = self.path(key)
+        size = os.path.getsize(temp_path)
+        try:
+            replaced = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(temp_path, path)
+        with self._lock:
+            if self._disk_total is not None:
+                self._disk_total += size - replaced
+                if self._disk_total <= self.max_bytes:
+                    metrics.set_gauge(f'{self.name}.bytes', self._disk_total)
+                    return path
+        self._evict()
+        return path
+
+    def put_bytes(self, key, data):
+        """Store a rendered MP3 held in memory and return its path"""
+        self._remember(key, data)
+        with self.temp_file() as temp_file:
+            temp_file.write(data)
+        return self.put(key, temp_file.name)
+
+    def _recall(self, key):
+        with self._memory_lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+        if data is not None:
+            metrics.increment(f'{self.name}.memory_hits')
+        return data
+
+    def _load(self, key, path):
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None  # Evicted since the lookup
+        self._remember(key, data)
+        return data
+
+    def _remember(self, key, data):
+        if len(data) > self.spool_threshold or len(data) > self.memory_bytes:
+            return
+        with self._memory_lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_total -= len(previous)
+            self._memory[key] = data
+            self._memory_total += len(data)
+            while self._memory_total > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_total -= len(evicted)
+            metrics.set_gauge(f'{self.name}.memory_bytes', self._memory_total)
+
+    def _evict(self):
+        with self._lock:
+            files = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith('.mp3'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                    total -= size
+                    metrics.increment(f'{self.name}.evictions')
+                except FileNotFoundError:
+                    pass
+            # Rescanning also picks up files written by other processes
+            self._disk_total = total
+            metrics.set_gauge(f'{self.name}.bytes', total)
+        summary_logger.debug(f"{self.name} holds {total} bytes")
+
+class AudioBuffer:
+    """Collects an MP3 as it is rendered.
+
+    Data stays in memory up to max_memory bytes; past that it is spooled to a
+    temporary file in the cache directory, so only large renders touch the
+    disk before commit().
+    """
+
+    def __init__(self, cache, max_memory):
+        self.cache = cache
+        self.max_memory = max_memory
+        self.size = 0
+        self._parts = []
+        self._file = None
+
+    def write(self, data):
+        self.size += len(data)
+        if self._file is None and self.size > self.max_memory:
+            self._file = self.cache.temp_file()
+            self._file.writelines(self._parts)
+            self._parts = []
+        if self._file is None:
+            self._parts.append(data)
+        else:
+            self._file.write(data)
+
+    def commit(self, key):
+        """Store the rendered MP3 in the cache under key and return its path"""
+        if self._file is None:
+            return self.cache.put_bytes(key, b''.join(self._parts))
+        self._file.close()
+        return self.cache.put(key, self._file.name)
+
+    def discard(self):
+        self._parts = []
+        if self._file is not None:
+            self._file.close()
+            os.unlink(self._file.name)
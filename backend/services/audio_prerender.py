@@ -0,0 +1,81 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from config.settings import (
+    AUDIO_PRERENDER_ENABLED,
+    AUDIO_PRERENDER_ACTIVE_DAYS,
+    AUDIO_PRERENDER_WORKERS,
+    AUDIO_PRERENDER_MAX_PENDING
+)
+from services.audio_cache import AudioCache
+from services.tts_service import TTSService, script_mode
+from utils.logger import summary_logger, log_error
+from utils.metrics import metrics
+
+class AudioPrerenderer:
+    """Renders audio summaries in the background after a summary refresh.
+
+    Only users who played audio in the last AUDIO_PRERENDER_ACTIVE_DAYS are
+    rendered for, on a pool of AUDIO_PRERENDER_WORKERS threads. Renders are
+    deduplicated by summary hash and dropped when AUDIO_PRERENDER_MAX_PENDING
+    are already queued. The audio endpoint calls wait() so a request that
+    arrives mid-render picks up that render instead of starting another.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=AUDIO_PRERENDER_WORKERS, thread_name_prefix='audio-prerender')
+        self.audio_cache = AudioCache.get_instance()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def submit(self, user, summary_data):
+        """Queue a render of summary_data for user if they use audio; returns whether it was queued"""
+        if not AUDIO_PRERENDER_ENABLED or not user or not user.used_audio_within(AUDIO_PRERENDER_ACTIVE_DAYS):
+            return False
+
+        mode = script_mode(user.audio_script_mode)
+        key = self.audio_cache.key(summary_data, variant=mode)
+        with self._lock:
+            if key in self._pending:
+                return False
+            if len(self._pending) >= AUDIO_PRERENDER_MAX_PENDING:
+                metrics.increment('audio_prerender.dropped')
+                summary_logger.warning(f"Audio prerender queue is full, skipping user {user.user_id}")
+                return False
+            future = self.executor.submit(self._render, user.user_id, summary_data, mode)
+            self._pending[key] = future
+        future.add_done_callback(lambda _: self._done(key))
+        return True
+
+    def wait(self, summary_data, mode=None, timeout=None):
+        """Block until an in-flight render of summary_data in mode finishes, if there is one"""
+        with self._lock:
+            future = self._pending.get(self.audio_cache.key(summary_data, variant=script_mode(mode)))
+        if future is None:
+            return
+        metrics.increment('audio_prerender.joined')
+        try:
+            future.exception(timeout)
+        except TimeoutError:
+            summary_logger.warning("Timed out waiting for a background audio render")
+
+    def _render(self, user_id, summary_data, mode):
+        try:
+            TTSService().get_audio(summary_data, mode)
+            metrics.increment('audio_prerender.rendered')
+            summary_logger.info(f"Pre-rendered audio summary for user {user_id}")
+        except Exception as e:
+            log_error(summary_logger, e, f"Failed to pre-render audio summary for user {user_id}")
+            raise
+
+    def _done(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
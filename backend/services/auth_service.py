@@ -3,7 +3,6 @@ from flask import session
 from google_auth_oauthlib.flow import Flow
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
 import json
 
 from utils.logger import auth_logger, log_error
@@ -16,6 +15,7 @@ from config.settings import (
     FRONTEND_URL
 )
 from models.user import User
+from services.google_client_factory import GoogleClientFactory
 
 class AuthServiceError(Exception):
     """Base exception for authentication service errors."""
@@ -113,7 +113,7 @@ class AuthService:
                 auth_logger.error("Invalid credentials when fetching user info")
                 return None
 
-            service = build('oauth2', 'v2', credentials=self._credentials)
+            service = GoogleClientFactory.get_instance().build_service('oauth2', 'v2', self._credentials)
             user_info = service.userinfo().get().execute()
             auth_logger.info(f"Raw user info response: {user_info}")
             
@@ -142,7 +142,8 @@ class AuthService:
                 'token_uri': credentials.token_uri,
                 'client_id': credentials.client_id,
                 'client_secret': credentials.client_secret,
-                'scopes': credentials.scopes
+                'scopes': credentials.scopes,
+                'expiry': credentials.expiry
             }
         except Exception as e:
             auth_logger.error(f"Error converting credentials to dict: {str(e)}")
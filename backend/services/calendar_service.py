@@ -1,21 +1,15 @@
 from datetime import datetime, timedelta, timezone
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from services.google_client_factory import GoogleClientFactory
+from services.google_api_executor import GoogleApiExecutor, quota_user_key
 from utils.logger import api_logger, log_error
 
 class CalendarService:
     def __init__(self, credentials_dict):
         try:
             api_logger.info("Initializing Calendar service")
-            credentials = Credentials(
-                token=credentials_dict['token'],
-                refresh_token=credentials_dict.get('refresh_token'),
-                token_uri=credentials_dict['token_uri'],
-                client_id=credentials_dict['client_id'],
-                client_secret=credentials_dict['client_secret'],
-                scopes=credentials_dict['scopes']
-            )
-            self.service = build('calendar', 'v3', credentials=credentials)
+            self.service = GoogleClientFactory.get_instance().get_service('calendar', 'v3', credentials_dict)
+            self.executor = GoogleApiExecutor.get_instance()
+            self.quota_key = quota_user_key(credentials_dict)
             api_logger.info("Calendar service initialized successfully")
         except Exception as e:
             log_error(api_logger, e, "Failed to initialize Calendar service")
@@ -34,41 +28,26 @@ class CalendarService:
                 # Format time as RFC3339 timestamp, 7 days from now
                 time_max = (now + timedelta(days=7)).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
 
-            events_result = self.service.events().list(
+            events_result = self._execute(self.service.events().list(
                 calendarId='primary',
                 timeMin=time_min,
                 timeMax=time_max,
                 maxResults=max_results,
                 singleEvents=True,
                 orderBy='startTime'
-            ).execute()
+            ))
 
             events = events_result.get('items', [])
             api_logger.info(f"Successfully fetched {len(events)} calendar events")
-            return [self._format_event(event) for event in events]
+            return [format_event(event) for event in events]
             
         except Exception as e:
             log_error(api_logger, e, "Failed to fetch calendar events")
             raise
 
-    def _format_event(self, event):
-        start = event.get('start', {}).get('dateTime', event.get('start', {}).get('date'))
-        end = event.get('end', {}).get('dateTime', event.get('end', {}).get('date'))
-        
-        return {
-            'id': event.get('id'),  # Add event ID
-            'summary': event.get('summary', 'No Title'),
-            'start': start,
-            'end': end,
-            'description': event.get('description', ''),
-            'attendees': [
-                {'email': attendee.get('email'), 'name': attendee.get('displayName')}
-                for attendee in event.get('attendees', [])
-            ],
-            'location': event.get('location', ''),
-            'status': event.get('status', ''),
-            'htmlLink': event.get('htmlLink', '')
-        }
+    def _execute(self, request):
+        """Execute a request through the shared rate limiter and retry layer"""
+        return self.executor.execute(request, 'calendar', self.quota_key)
 
     def accept_calendar_invite(self, event_id):
         """Accept a calendar invitation"""
@@ -76,13 +55,13 @@ class CalendarService:
             api_logger.info(f"Accepting calendar invite for event: {event_id}")
             
             # Get the event first to check if we need to handle it
-            event = self.service.events().get(
+            event = self._execute(self.service.events().get(
                 calendarId='primary',
                 eventId=event_id
-            ).execute()
+            ))
             
             # Find the attendee that matches the authenticated user
-            user_email = self.service.calendarList().get(calendarId='primary').execute().get('id')
+            user_email = self._execute(self.service.calendarList().get(calendarId='primary')).get('id')
             user_attendee = next(
                 (attendee for attendee in event.get('attendees', [])
                 if attendee.get('email') == user_email),
@@ -101,12 +80,12 @@ class CalendarService:
             user_attendee['responseStatus'] = 'accepted'
             
             # Update the event
-            self.service.events().patch(
+            self._execute(self.service.events().patch(
                 calendarId='primary',
                 eventId=event_id,
                 body={'attendees': event.get('attendees', [])},
                 sendUpdates='all'  # Notify other attendees
-            ).execute()
+            ))
             
             api_logger.info(f"Successfully accepted calendar invite for event: {event_id}")
             return True
@@ -121,13 +100,13 @@ class CalendarService:
             api_logger.info(f"Declining calendar invite for event: {event_id}")
             
             # Get the event first to check if we need to handle it
-            event = self.service.events().get(
+            event = self._execute(self.service.events().get(
                 calendarId='primary',
                 eventId=event_id
-            ).execute()
+            ))
             
             # Find the attendee that matches the authenticated user
-            user_email = self.service.calendarList().get(calendarId='primary').execute().get('id')
+            user_email = self._execute(self.service.calendarList().get(calendarId='primary')).get('id')
             user_attendee = next(
                 (attendee for attendee in event.get('attendees', [])
                 if attendee.get('email') == user_email),
@@ -146,12 +125,12 @@ class CalendarService:
             user_attendee['responseStatus'] = 'declined'
             
             # Update the event
-            self.service.events().patch(
+            self._execute(self.service.events().patch(
                 calendarId='primary',
                 eventId=event_id,
                 body={'attendees': event.get('attendees', [])},
                 sendUpdates='all'  # Notify other attendees
-            ).execute()
+            ))
             
             api_logger.info(f"Successfully declined calendar invite for event: {event_id}")
             return True
@@ -166,14 +145,14 @@ class CalendarService:
             api_logger.info("Fetching pending calendar invites")
             
             # Get user's email
-            user_email = self.service.calendarList().get(calendarId='primary').execute().get('id')
+            user_email = self._execute(self.service.calendarList().get(calendarId='primary')).get('id')
             
             # Get events where user's response is needed or not responded
             # Look for future events within next 30 days
             time_min = datetime.now(timezone.utc)
             time_max = time_min + timedelta(days=30)
             
-            events_result = self.service.events().list(
+            events_result = self._execute(self.service.events().list(
                 calendarId='primary',
                 timeMin=time_min.isoformat(),
                 timeMax=time_max.isoformat(),
@@ -182,36 +161,66 @@ class CalendarService:
                 orderBy='startTime',
                 showDeleted=False,
                 fields='items(id,summary,start,end,attendees,location,status,description,htmlLink)'  # Optimize response
-            ).execute()
-            
-            events = events_result.get('items', [])
-            pending_invites = []
+            ))
             
-            for event in events:
-                # Skip events without attendees (not an invitation)
-                if not event.get('attendees'):
-                    continue
-                    
-                # Check if user is an attendee and hasn't responded
-                attendees = event.get('attendees', [])
-                user_attendee = next(
-                    (attendee for attendee in attendees 
-                    if attendee.get('email') == user_email and 
-                    attendee.get('responseStatus') in ['needsAction', 'tentative']),  # Include tentative responses
-                    None
-                )
-                
-                # Only include if user is an attendee who needs to respond
-                # and event is not cancelled
-                if (user_attendee and 
-                    event.get('status') != 'cancelled'):
-                    formatted_event = self._format_event(event)
-                    formatted_event['responseStatus'] = user_attendee.get('responseStatus', 'needsAction')
-                    pending_invites.append(formatted_event)
+            pending_invites = select_pending_invites(events_result.get('items', []), user_email)
                     
             api_logger.info(f"Found {len(pending_invites)} pending invites")
             return pending_invites
             
         except Exception as e:
             log_error(api_logger, e, "Failed to fetch pending invites")
-            raise
\ No newline at end of file
+            raise
+
+def format_event(event):
+    """Convert a Calendar API event into the dict used across the app"""
+    start = event.get('start', {}).get('dateTime', event.get('start', {}).get('date'))
+    end = event.get('end', {}).get('dateTime', event.get('end', {}).get('date'))
+
+    return {
+        'id': event.get('id'),  # Add event ID
+        'summary': event.get('summary', 'No Title'),
+        'start': start,
+        'end': end,
+        'description': event.get('description', ''),
+        'attendees': [
+            {
+                'email': attendee.get('email'),
+                'name': attendee.get('displayName'),
+                'responseStatus': attendee.get('responseStatus'),
+                'self': attendee.get('self', False)
+            }
+            for attendee in event.get('attendees', [])
+        ],
+        'location': event.get('location', ''),
+        'status': event.get('status', ''),
+        'htmlLink': event.get('htmlLink', ''),
+        'etag': event.get('etag'),
+        'updated': event.get('updated')
+    }
+
+def select_pending_invites(events, user_email):
+    """Pick the events the user was invited to and has not answered yet"""
+    pending_invites = []
+    for event in events:
+        # Skip events without attendees (not an invitation)
+        if not event.get('attendees'):
+            continue
+            
+        # Check if user is an attendee and hasn't responded
+        attendees = event.get('attendees', [])
+        user_attendee = next(
+            (attendee for attendee in attendees 
+            if attendee.get('email') == user_email and 
+            attendee.get('responseStatus') in ['needsAction', 'tentative']),  # Include tentative responses
+            None
+        )
+        
+        # Only include if user is an attendee who needs to respond
+        # and event is not cancelled
+        if (user_attendee and 
+            event.get('status') != 'cancelled'):
+            formatted_event = format_event(event)
+            formatted_event['responseStatus'] = user_attendee.get('responseStatus', 'needsAction')
+            pending_invites.append(formatted_event)
+    return pending_invites
@@ -0,0 +1,221 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from pymongo import UpdateOne
+from config.database import Database, DatabaseConnectionError, DB_ERROR_MESSAGES
+from config.settings import CALENDAR_SYNC_LOOKBACK_DAYS, CALENDAR_SYNC_LOOKAHEAD_DAYS, CALENDAR_SYNC_MIN_INTERVAL_SECONDS
+from services.async_google_client import AsyncGoogleApiError
+from services.calendar_service import format_event, select_pending_invites
+from utils.async_runner import AsyncRunner
+from utils.logger import api_logger, log_error
+
+# Furthest ahead the store is read, for pending invites
+PENDING_INVITE_DAYS = 30
+
+class CalendarSyncService:
+    """Keeps a per-user store of expanded calendar events in MongoDB.
+
+    A full sync lists events from CALENDAR_SYNC_LOOKBACK_DAYS ago to
+    CALENDAR_SYNC_LOOKAHEAD_DAYS ahead and saves the nextSyncToken; later syncs
+    only fetch events changed since that token. Unchanged events that move into
+    range later are not reported, so the store is rebuilt once the synced
+    horizon is less than PENDING_INVITE_DAYS away. A 410 Gone response means the
+    token expired, so the store is rebuilt as well.
+    Window queries for upcoming events and pending invites are answered from
+    the store.
+
+    The work is done by the *_async methods on an AsyncGoogleClient; the
+    plain methods are blocking facades for Flask views.
+    """
+
+    def __init__(self, user_id, client):
+        self.user_id = user_id
+        self.client = client
+        self.db = Database.get_instance()
+
+    def get_events(self, time_min=None, time_max=None, max_results=10):
+        """Return events overlapping the window, like CalendarService.get_events"""
+        return AsyncRunner.get_instance().run(self.get_events_async(time_min, time_max, max_results))
+
+    def get_pending_invites(self):
+        """Return invites in the next 30 days the user still has to answer"""
+        return AsyncRunner.get_instance().run(self.get_pending_invites_async())
+
+    def sync(self, force=False):
+        """Bring the event store up to date and return the sync state"""
+        return AsyncRunner.get_instance().run(self.sync_async(force))
+
+    def invalidate(self):
+        """Force the next read to sync, e.g. after the user answered an invite"""
+        if self.db is None or not self.db.is_connected():
+            raise DatabaseConnectionError(DB_ERROR_MESSAGES['connection'])
+        self.db.calendar_sync_state.update_one({'user_id': self.user_id}, {'$unset': {'last_synced_at': ""}})
+
+    async def get_events_async(self, time_min=None, time_max=None, max_results=10):
+        """Return events overlapping the window, like CalendarService.get_events"""
+        now = datetime.now(timezone.utc)
+        window_start = _parse_time(time_min) if time_min else now
+        window_end = _parse_time(time_max) if time_max else now + timedelta(days=7)
+
+        try:
+            await self.sync_async()
+        except Exception as e:
+            log_error(api_logger, e, f"Calendar sync failed for user {self.user_id}, fetching events directly")
+            return await self.client.get_events(window_start.isoformat(), window_end.isoformat(), max_results)
+
+        events = await asyncio.to_thread(self._read_window, window_start, window_end, max_results)
+        api_logger.info(f"Read {len(events)} calendar events from local store for user {self.user_id}")
+        return [format_event(event) for event in events]
+
+    async def get_pending_invites_async(self):
+        """Return invites in the next 30 days the user still has to answer"""
+        now = datetime.now(timezone.utc)
+        window_end = now + timedelta(days=PENDING_INVITE_DAYS)
+
+        try:
+            state = await self.sync_async()
+        except Exception as e:
+            log_error(api_logger, e, f"Calendar sync failed for user {self.user_id}, fetching invites directly")
+            return await self.client.get_pending_invites(now.isoformat(), window_end.isoformat())
+
+        events = await asyncio.to_thread(self._read_window, now, window_end)
+        pending_invites = select_pending_invites(events, state.get('calendar_id'))
+        api_logger.info(f"Found {len(pending_invites)} pending invites in local store for user {self.user_id}")
+        return pending_invites
+
+    async def sync_async(self, force=False):
+        """Bring the event store up to date and return the sync state"""
+        if self.db is None or not self.db.is_connected():
+            raise DatabaseConnectionError(DB_ERROR_MESSAGES['connection'])
+
+        state = await asyncio.to_thread(self.db.calendar_sync_state.find_one, {'user_id': self.user_id})
+        if not force and state and self._synced_recently(state):
+            return state
+
+        if state and state.get('sync_token') and not self._horizon_due(state):
+            try:
+                return await self._incremental_sync(state)
+            except AsyncGoogleApiError as e:
+                if e.status != 410:
+                    raise
+                api_logger.warning(f"Calendar sync token expired for user {self.user_id}, running full resync")
+        return await self._full_sync()
+
+    def _synced_recently(self, state):
+        last_synced_at = state.get('last_synced_at')
+        if not last_synced_at:
+            return False
+        if last_synced_at.tzinfo is None:
+            last_synced_at = last_synced_at.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - last_synced_at < timedelta(seconds=CALENDAR_SYNC_MIN_INTERVAL_SECONDS)
+
+    def _horizon_due(self, state):
+        """Check whether the synced window ends too soon to answer window reads"""
+        sync_horizon = state.get('sync_horizon')
+        if not sync_horizon:
+            # Stores synced before the window was bounded cover every future event
+            return False
+        if sync_horizon.tzinfo is None:
+            sync_horizon = sync_horizon.replace(tzinfo=timezone.utc)
+        return sync_horizon - datetime.now(timezone.utc) < timedelta(days=PENDING_INVITE_DAYS)
+
+    async def _full_sync(self):
+        api_logger.info(f"Running full calendar sync for user {self.user_id}")
+        now = datetime.now(timezone.utc)
+        time_min = now - timedelta(days=CALENDAR_SYNC_LOOKBACK_DAYS)
+        sync_horizon = now + timedelta(days=CALENDAR_SYNC_LOOKAHEAD_DAYS)
+        calendar_id, (events, sync_token) = await asyncio.gather(
+            self.client.get_primary_calendar_id(),
+            self.client.list_event_changes(time_min=time_min.isoformat(), time_max=sync_horizon.isoformat())
+        )
+        stored, state = await asyncio.to_thread(self._replace_events, events, sync_token, calendar_id, sync_horizon)
+
+        api_logger.info(f"Full calendar sync stored {stored} events for user {self.user_id}")
+        return state
+
+    async def _incremental_sync(self, state):
+        events, sync_token = await self.client.list_event_changes(sync_token=state['sync_token'])
+        stored, removed, state = await asyncio.to_thread(self._update_events, events, sync_token, state.get('calendar_id'))
+
+        api_logger.info(f"Incremental calendar sync for user {self.user_id}: {stored} updated, {removed} removed")
+        return state
+
+    def _replace_events(self, events, sync_token, calendar_id, sync_horizon):
+        self.db.calendar_events.delete_many({'user_id': self.user_id})
+        stored, _ = self._apply_changes(events)
+        state = self._save_state({'sync_token': sync_token, 'calendar_id': calendar_id, 'sync_horizon': sync_horizon}, full=True)
+        return stored, state
+
+    def _update_events(self, events, sync_token, calendar_id):
+        stored, removed = self._apply_changes(events)
+        self._prune_expired()
+        state = self._save_state({'sync_token': sync_token, 'calendar_id': calendar_id})
+        return stored, removed, state
+
+    def _apply_changes(self, events):
+        operations = []
+        removed_ids = []
+        for event in events:
+            if event.get('status') == 'cancelled':
+                removed_ids.append(event['id'])
+                continue
+            start_at = _event_time(event.get('start', {}))
+            end_at = _event_time(event.get('end', {})) or start_at
+            if not start_at:
+                continue
+            operations.append(UpdateOne(
+                {'user_id': self.user_id, 'event_id': event['id']},
+                {'$set': {
+                    'start_at': start_at,
+                    'end_at': end_at,
+                    'event': event,
+                    'synced_at': datetime.now(timezone.utc)
+                }},
+                upsert=True
+            ))
+        if operations:
+            self.db.calendar_events.bulk_write(operations, ordered=False)
+        if removed_ids:
+            self.db.calendar_events.delete_many({'user_id': self.user_id, 'event_id': {'$in': removed_ids}})
+        return len(operations), len(removed_ids)
+
+    def _prune_expired(self):
+        cutoff = datetime.now(timezone.utc) - timedelta(days=CALENDAR_SYNC_LOOKBACK_DAYS)
+        self.db.calendar_events.delete_many({'user_id': self.user_id, 'end_at': {'$lt': cutoff}})
+
+    def _save_state(self, update, full=False):
+        now = datetime.now(timezone.utc)
+        update = dict(update, user_id=self.user_id, last_synced_at=now)
+        if full:
+            update['last_full_sync_at'] = now
+        self.db.calendar_sync_state.update_one(
+            {'user_id': self.user_id},
+            {'$set': update},
+            upsert=True
+        )
+        return update
+
+    def _read_window(self, window_start, window_end, max_results=0):
+        cursor = self.db.calendar_events.find(
+            {
+                'user_id': self.user_id,
+                'start_at': {'$lt': window_end},
+                'end_at': {'$gt': window_start}
+            },
+            {'event': 1, '_id': 0}
+        ).sort('start_at', 1).limit(max_results)
+        return [doc['event'] for doc in cursor]
+
+def _parse_time(value):
+    """Parse an RFC3339 timestamp into a timezone-aware UTC datetime"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+def _event_time(time_info):
+    """Get the start or end of an event; all-day events use midnight UTC"""
+    if time_info.get('dateTime'):
+        return _parse_time(time_info['dateTime'])
+    if time_info.get('date'):
+        return datetime.fromisoformat(time_info['date']).replace(tzinfo=timezone.utc)
+    return None
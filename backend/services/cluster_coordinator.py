@@ -0,0 +1,183 @@
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from config.database import Database, DatabaseConnectionError, DB_ERROR_MESSAGES
+from config.settings import SCHEDULER_LEASE_TTL_SECONDS, DIGEST_SHARD_MAX_ATTEMPTS
+from utils.logger import summary_logger
+from utils.metrics import metrics
+
+# Lease held by the node that schedules cluster-wide jobs
+LEADER_LEASE = 'scheduler_leader'
+
+class ClusterCoordinator:
+    """Coordinates scheduler work between processes through MongoDB.
+
+    Every process heartbeats into scheduler_nodes. One process at a time holds
+    the leader lease in scheduler_leases. It splits each digest run into one
+    shard per live node and records them in digest_shards. Nodes claim their
+    own shard and keep its lease alive while they work. A shard whose lease
+    runs out, because its node died, is picked up by any other node. Named
+    leases also serve as cross-worker locks, e.g. on one user's digest.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def __init__(self):
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_ttl = timedelta(seconds=SCHEDULER_LEASE_TTL_SECONDS)
+        self.db = Database.get_instance()
+
+    def heartbeat(self):
+        """Register this node as alive and try to hold the leader lease; returns whether it leads"""
+        self._ensure_db()
+        now = datetime.now(timezone.utc)
+        self.db.scheduler_nodes.update_one(
+            {'node_id': self.node_id},
+            {'$set': {'heartbeat_at': now, 'expires_at': now + self.lease_ttl}},
+            upsert=True
+        )
+        is_leader = self.acquire_lease(LEADER_LEASE)
+        metrics.set_gauge('scheduler.is_leader', int(is_leader))
+        return is_leader
+
+    def is_leader(self):
+        """Check whether this node currently holds an unexpired leader lease"""
+        self._ensure_db()
+        return self.db.scheduler_leases.count_documents({
+            '_id': LEADER_LEASE,
+            'owner': self.node_id,
+            'expires_at': {'$gt': datetime.now(timezone.utc)}
+        }) > 0
+
+    def lock_owner(self):
+        """Return a new owner ID for one holder of a named lease on this node.
+
+        Leases taken with the default owner are shared by everything in this
+        process; pass a lock_owner() ID to keep two holders on the same node apart.
+        """
+        return f"{self.node_id}:{uuid.uuid4().hex[:8]}"
+
+    def acquire_lease(self, name, ttl=None, owner=None):
+        """Take or renew a named lease; fails while another owner holds it unexpired"""
+        self._ensure_db()
+        owner = owner or self.node_id
+        now = datetime.now(timezone.utc)
+        try:
+            self.db.scheduler_leases.find_one_and_update(
+                {'_id': name, '$or': [{'owner': owner}, {'expires_at': {'$lt': now}}]},
+                {'$set': {'owner': owner, 'expires_at': now + (ttl or self.lease_ttl)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def release_lease(self, name, owner=None):
+        """Give up a named lease if this owner (by default this node) still holds it"""
+        self._ensure_db()
+        self.db.scheduler_leases.delete_one({'_id': name, 'owner': owner or self.node_id})
+
+    def lease_held(self, name):
+        """Check whether any node holds an unexpired lease with this name"""
+        self._ensure_db()
+        return self.db.scheduler_leases.count_documents({
+            '_id': name,
+            'expires_at': {'$gt': datetime.now(timezone.utc)}
+        }) > 0
+
+    def live_nodes(self):
+        """IDs of nodes with an unexpired heartbeat"""
+        self._ensure_db()
+        cursor = self.db.scheduler_nodes.find(
+            {'expires_at': {'$gt': datetime.now(timezone.utc)}},
+            {'node_id': 1, '_id': 0}
+        )
+        return sorted(node['node_id'] for node in cursor)
+
+    def create_digest_run(self):
+        """Split a digest run across the live nodes; returns the run ID, or None if a run is unfinished"""
+        self._ensure_db()
+        now = datetime.now(timezone.utc)
+        # Shards that used up their attempts are given up on so new runs can start
+        self.db.digest_shards.update_many(
+            {'status': {'$in': ['pending', 'running']}, 'lease_expires_at': {'$lt': now},
+             'attempts': {'$gte': DIGEST_SHARD_MAX_ATTEMPTS}},
+            {'$set': {'status': 'failed', 'finished_at': now}}
+        )
+        if self.db.digest_shards.count_documents({'status': {'$in': ['pending', 'running']}}, limit=1):
+            summary_logger.warning("Previous digest run is still in progress, skipping this run")
+            return None
+
+        nodes = self.live_nodes() or [self.node_id]
+        run_id = now.strftime('%Y%m%dT%H%M%S') + '-' + uuid.uuid4().hex[:6]
+        self.db.digest_shards.insert_many([
+            {
+                '_id': f"{run_id}:{node}",
+                'run_id': run_id,
+                'shard': node,
+                'nodes': nodes,
+                'owner': node,
+                'status': 'pending',
+                'attempts': 0,
+                'lease_expires_at': now + self.lease_ttl,
+                'created_at': now
+            }
+            for node in nodes
+        ])
+        summary_logger.info(f"Created digest run {run_id} with {len(nodes)} shards")
+        return run_id
+
+    def claim_shard(self):
+        """Claim this node's pending shard, or any shard whose lease expired"""
+        self._ensure_db()
+        now = datetime.now(timezone.utc)
+        return self.db.digest_shards.find_one_and_update(
+            {'$or': [
+                {'status': 'pending', 'owner': self.node_id},
+                {'status': {'$in': ['pending', 'running']}, 'lease_expires_at': {'$lt': now},
+                 'attempts': {'$lt': DIGEST_SHARD_MAX_ATTEMPTS}}
+            ]},
+            {
+                '$set': {'owner': self.node_id, 'status': 'running', 'lease_expires_at': now + self.lease_ttl},
+                '$inc': {'attempts': 1}
+            },
+            sort=[('created_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def renew_shard(self, shard_id):
+        """Extend this node's lease on a shard; returns False if the shard was taken over"""
+        result = self.db.digest_shards.update_one(
+            {'_id': shard_id, 'owner': self.node_id, 'status': 'running'},
+            {'$set': {'lease_expires_at': datetime.now(timezone.utc) + self.lease_ttl}}
+        )
+        return result.matched_count > 0
+
+    def complete_shard(self, shard_id, stats):
+        """Mark a shard done with its run stats, if this node still owns it"""
+        self.db.digest_shards.update_one(
+            {'_id': shard_id, 'owner': self.node_id, 'status': 'running'},
+            {'$set': {'status': 'done', 'stats': stats, 'finished_at': datetime.now(timezone.utc)}}
+        )
+
+    def shutdown(self):
+        """Drop this node's heartbeat and leader lease so others take over at once"""
+        if self.db is None or not self.db.is_connected():
+            return
+        self.db.scheduler_nodes.delete_one({'node_id': self.node_id})
+        self.db.scheduler_leases.delete_one({'_id': LEADER_LEASE, 'owner': self.node_id})
+
+    def _ensure_db(self):
+        if self.db is None or not self.db.is_connected():
+            raise DatabaseConnectionError(DB_ERROR_MESSAGES['connection'])
@@ -0,0 +1,165 @@
+import threading
+import zlib
+from datetime import datetime, timedelta, timezone
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from config.database import Database, DatabaseConnectionError, DB_ERROR_MESSAGES
+from config.settings import CREDENTIAL_REFRESH_MARGIN_SECONDS
+from models.user import User
+from utils.logger import auth_logger, log_error
+from utils.metrics import metrics
+
+# Number of striped locks used to single-flight refreshes per user
+LOCK_STRIPES = 64
+
+class CredentialManager:
+    """Refreshes OAuth access tokens shortly before they expire.
+
+    Refreshed tokens are written back through User.update_credentials, so later
+    requests reuse them. Only one thread refreshes a given user's token at a
+    time; threads that wait on it re-read the stored credentials and reuse the
+    fresh token. A refresh token Google rejects for good is removed, so the
+    user is asked to sign in again instead of failing on every refresh.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def __init__(self):
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    def get_credentials(self, user):
+        """Get the user's credentials dict, refreshing it first if it is about to expire"""
+        credentials = user.credentials
+        margin = timedelta(seconds=CREDENTIAL_REFRESH_MARGIN_SECONDS)
+        if not credentials or not self._needs_refresh(credentials, margin):
+            return credentials
+        try:
+            return self._refresh(user, margin)
+        except RefreshError as e:
+            # Keep the current token through a transient failure; a revoked one was cleared
+            return credentials if e.retryable else None
+
+    def refresh_due_credentials(self, within):
+        """Refresh every user whose token expires within the given timedelta.
+
+        Returns counts of users refreshed and users whose refresh failed.
+        """
+        db = Database.get_instance()
+        if db is None or not db.is_connected():
+            raise DatabaseConnectionError(DB_ERROR_MESSAGES['connection'])
+
+        cutoff = datetime.now(timezone.utc) + within
+        users_cursor = db.users.find(
+            {
+                'credentials.refresh_token': {'$exists': True, '$ne': None},
+                '$or': [
+                    {'credentials.expiry': {'$lte': cutoff}},
+                    {'credentials.expiry': {'$exists': False}}
+                ]
+            },
+            {'user_id': 1, 'email': 1, 'name': 1}
+        )
+
+        stats = {'refreshed': 0, 'failed': 0}
+        for user_data in users_cursor:
+            try:
+                user = User(user_data['user_id'], user_data.get('email'), user_data.get('name', ''))
+                self._refresh(user, within)
+                stats['refreshed'] += 1
+            except RefreshError:
+                # Already logged and, if the token was revoked, cleared by _refresh
+                stats['failed'] += 1
+            except Exception as e:
+                log_error(auth_logger, e, f"Background token refresh failed for user: {user_data.get('user_id')}")
+                stats['failed'] += 1
+
+        auth_logger.info(f"Background token refresh: {stats}")
+        return stats
+
+    def _refresh(self, user, margin):
+        with self._lock_for(user.user_id):
+            # Another thread may have refreshed the token while we waited
+            credentials = user.get_credentials()
+            if not credentials or not self._needs_refresh(credentials, margin):
+                user.credentials = credentials
+                return credentials
+            return self._refresh_locked(user, credentials)
+
+    def refresh_rejected(self, user_id, rejected_token):
+        """Refresh a user's credentials after the API rejected their access token (HTTP 401).
+
+        If another caller already stored a different token, that one is
+        returned without refreshing again. Returns None when the user has no
+        usable credentials left.
+        """
+        user = User(user_id, None, '')
+        with self._lock_for(user_id):
+            credentials = user.get_credentials()
+            if not credentials or credentials.get('token') != rejected_token:
+                return credentials
+            if not credentials.get('refresh_token'):
+                return None
+            try:
+                return self._refresh_locked(user, credentials)
+            except RefreshError as e:
+                return credentials if e.retryable else None
+
+    def _refresh_locked(self, user, credentials):
+        """Refresh and store credentials; the caller holds the user's lock"""
+        try:
+            with metrics.timer('credentials.refresh_seconds'):
+                refreshed = self._refresh_token(credentials)
+        except RefreshError as e:
+            metrics.increment('credentials.refresh_failed')
+            log_error(auth_logger, e, f"Token refresh failed for user: {user.user_id}")
+            if not e.retryable:
+                # The refresh token was revoked or expired; clear it so the user signs in again
+                user.remove_credentials()
+                user.credentials = None
+                metrics.increment('credentials.revoked')
+            raise
+
+        user.update_credentials(refreshed)
+        user.credentials = refreshed
+        metrics.increment('credentials.refreshed')
+        auth_logger.info(f"Refreshed access token for user: {user.user_id}")
+        return refreshed
+
+    def _refresh_token(self, credentials_dict):
+        credentials = Credentials(
+            token=credentials_dict['token'],
+            refresh_token=credentials_dict.get('refresh_token'),
+            token_uri=credentials_dict['token_uri'],
+            client_id=credentials_dict['client_id'],
+            client_secret=credentials_dict['client_secret'],
+            scopes=credentials_dict['scopes']
+        )
+        credentials.refresh(Request())
+        return dict(
+            credentials_dict,
+            token=credentials.token,
+            refresh_token=credentials.refresh_token or credentials_dict.get('refresh_token'),
+            expiry=credentials.expiry
+        )
+
+    def _needs_refresh(self, credentials, margin):
+        if not credentials.get('refresh_token'):
+            return False
+        expiry = credentials.get('expiry')
+        if expiry is None:
+            # Stored before expiry was tracked; refresh once to learn it
+            return True
+        if expiry.tzinfo is None:
+            expiry = expiry.replace(tzinfo=timezone.utc)
+        return expiry - datetime.now(timezone.utc) <= margin
+
+    def _lock_for(self, user_id):
+        return self._locks[zlib.crc32(user_id.encode('utf-8')) % LOCK_STRIPES]
@@ -0,0 +1,97 @@
+import hashlib
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+from cachetools import LRUCache
+from config.database import Database
+from config.settings import GEMINI_CACHE_MEMORY_SIZE, GEMINI_CACHE_TTL_SECONDS
+from utils.logger import summary_logger
+from utils.metrics import metrics
+
+class GeminiResponseCache:
+    """Content-addressed cache of Gemini results.
+
+    Entries are keyed by a hash of the model name and the normalized prompt.
+    Lookups check an in-process LRU first and then the gemini_cache
+    collection, where a TTL index removes expired entries. A MongoDB outage
+    only disables the shared tier; it never fails the Gemini call.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._memory = LRUCache(maxsize=GEMINI_CACHE_MEMORY_SIZE)
+
+    def key(self, model_name, contents):
+        """Build the cache key for a prompt (a string or a list of parts)"""
+        return hashlib.sha256(f"{model_name}\n{_normalize(contents)}".encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Get a cached result, or None on a miss"""
+        with self._lock:
+            value = self._memory.get(key)
+        if value is not None:
+            metrics.increment('gemini_cache.memory_hits')
+            return value
+
+        try:
+            collection = self._collection()
+            if collection is not None:
+                doc = collection.find_one(
+                    {'_id': key, 'expires_at': {'$gt': datetime.now(timezone.utc)}},
+                    {'value': 1}
+                )
+                if doc:
+                    with self._lock:
+                        self._memory[key] = doc['value']
+                    metrics.increment('gemini_cache.mongo_hits')
+                    return doc['value']
+        except Exception as e:
+            summary_logger.warning(f"Gemini cache lookup failed: {str(e)}")
+
+        metrics.increment('gemini_cache.misses')
+        return None
+
+    def set(self, key, value, model_name=None):
+        """Store a result in both tiers"""
+        with self._lock:
+            self._memory[key] = value
+        try:
+            collection = self._collection()
+            if collection is not None:
+                now = datetime.now(timezone.utc)
+                collection.update_one(
+                    {'_id': key},
+                    {'$set': {
+                        'value': value,
+                        'model': model_name,
+                        'created_at': now,
+                        'expires_at': now + timedelta(seconds=GEMINI_CACHE_TTL_SECONDS)
+                    }},
+                    upsert=True
+                )
+        except Exception as e:
+            summary_logger.warning(f"Gemini cache write failed: {str(e)}")
+
+    def _collection(self):
+        # Use the connection only if the app already opened one, so a MongoDB
+        # outage leaves Gemini calls working instead of failing or reconnecting
+        db = Database._instance
+        return db.gemini_cache if db is not None else None
+
+def _normalize(contents):
+    """Flatten a prompt to text and collapse whitespace so formatting noise doesn't miss the cache"""
+    if isinstance(contents, (list, tuple)):
+        contents = "\n".join(
+            part.get('text', '') if isinstance(part, dict) else str(part)
+            for part in contents
+        )
+    return re.sub(r'\s+', ' ', contents).strip()
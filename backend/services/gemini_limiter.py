@@ -0,0 +1,182 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timezone
+from google.api_core.exceptions import TooManyRequests
+from config.database import Database
+from config.settings import (
+    GEMINI_CONCURRENCY_INITIAL,
+    GEMINI_CONCURRENCY_MIN,
+    GEMINI_CONCURRENCY_MAX,
+    GEMINI_QUEUE_TIMEOUT_SECONDS,
+    GEMINI_LIMITER_SHARED
+)
+from services.google_api_executor import GoogleApiExecutor
+from utils.adaptive_limiter import AdaptiveLimiter
+from utils.logger import summary_logger
+from utils.metrics import metrics
+
+# Document in rate_limits that records the latest cluster-wide cut
+SHARED_LIMIT_ID = 'gemini'
+
+class GeminiCapacityError(Exception):
+    """Raised when a Gemini call could not get through before its deadline"""
+    pass
+
+class GeminiLimiter:
+    """Process-wide adaptive limit on concurrent Gemini calls.
+
+    Calls wait for a slot instead of failing. A rate-limited call
+    (429/RESOURCE_EXHAUSTED) cuts the limit and goes back in the queue with
+    backoff until GEMINI_QUEUE_TIMEOUT_SECONDS runs out. With
+    GEMINI_LIMITER_SHARED, cuts are written to the rate_limits collection and
+    applied by the other processes on their next sync(), since they share the
+    same API quota.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def __init__(self):
+        self.limiter = AdaptiveLimiter(GEMINI_CONCURRENCY_INITIAL, GEMINI_CONCURRENCY_MIN, GEMINI_CONCURRENCY_MAX)
+        self._last_shared_cut = datetime.now(timezone.utc)
+
+    def call(self, func):
+        """Run func() in a slot, retrying rate-limited attempts until the deadline"""
+        deadline = time.monotonic() + GEMINI_QUEUE_TIMEOUT_SECONDS
+        attempt = 0
+        while True:
+            try:
+                with self.slot(deadline):
+                    return func()
+            except Exception as e:
+                if not is_rate_limited(e):
+                    raise
+                time.sleep(self.retry_delay(attempt, deadline))
+                attempt += 1
+
+    async def call_async(self, func):
+        """Async version of call for a coroutine function"""
+        deadline = time.monotonic() + GEMINI_QUEUE_TIMEOUT_SECONDS
+        attempt = 0
+        while True:
+            try:
+                async with self.slot_async(deadline):
+                    return await func()
+            except Exception as e:
+                if not is_rate_limited(e):
+                    raise
+                await asyncio.sleep(self.retry_delay(attempt, deadline))
+                attempt += 1
+
+    @contextmanager
+    def slot(self, deadline=None):
+        """Hold a slot for the block, reporting a rate-limit failure to the limiter"""
+        deadline = deadline or time.monotonic() + GEMINI_QUEUE_TIMEOUT_SECONDS
+        ticket = self.limiter.acquire(max(0, deadline - time.monotonic()))
+        if ticket is None:
+            raise self._capacity_error()
+        overloaded = False
+        try:
+            yield
+        except Exception as e:
+            overloaded = is_rate_limited(e)
+            raise
+        finally:
+            if self._release(ticket, overloaded):
+                self._publish_cut()
+
+    @asynccontextmanager
+    async def slot_async(self, deadline=None):
+        """Async version of slot"""
+        deadline = deadline or time.monotonic() + GEMINI_QUEUE_TIMEOUT_SECONDS
+        ticket = await self.limiter.acquire_async(max(0, deadline - time.monotonic()))
+        if ticket is None:
+            raise self._capacity_error()
+        overloaded = False
+        try:
+            yield
+        except Exception as e:
+            overloaded = is_rate_limited(e)
+            raise
+        finally:
+            if self._release(ticket, overloaded):
+                await asyncio.to_thread(self._publish_cut)
+
+    def retry_delay(self, attempt, deadline):
+        """Backoff before retrying a rate-limited call; raises if the deadline leaves no time"""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise self._capacity_error()
+        return min(remaining, GoogleApiExecutor.get_instance().backoff_delay(None, attempt))
+
+    def sync(self):
+        """Apply a cut another process published since the last sync"""
+        collection = self._collection()
+        if collection is None:
+            return
+        doc = collection.find_one({'_id': SHARED_LIMIT_ID})
+        if not doc or not doc.get('cut_at'):
+            return
+        cut_at = doc['cut_at']
+        if cut_at.tzinfo is None:
+            cut_at = cut_at.replace(tzinfo=timezone.utc)
+        if cut_at > self._last_shared_cut:
+            self._last_shared_cut = cut_at
+            if self.limiter.cut():
+                summary_logger.info(f"Applied shared Gemini rate limit cut, limit is now {self.limiter.limit:.1f}")
+        metrics.set_gauge('gemini.concurrency_limit', self.limiter.limit)
+
+    def _release(self, ticket, overloaded):
+        """Free a slot; returns True if a rate-limited call cut the limit"""
+        if not overloaded:
+            self.limiter.release(ticket)
+            return False
+        metrics.increment('gemini.rate_limited')
+        if not self.limiter.release(ticket, overloaded=True):
+            return False
+        summary_logger.warning(f"Gemini rate limited, cut concurrency limit to {self.limiter.limit:.1f}")
+        metrics.set_gauge('gemini.concurrency_limit', self.limiter.limit)
+        return True
+
+    def _publish_cut(self):
+        collection = self._collection()
+        if collection is None:
+            return
+        try:
+            now = datetime.now(timezone.utc)
+            self._last_shared_cut = now
+            collection.update_one(
+                {'_id': SHARED_LIMIT_ID},
+                {'$set': {'cut_at': now, 'limit': self.limiter.limit}},
+                upsert=True
+            )
+        except Exception as e:
+            summary_logger.warning(f"Failed to share Gemini rate limit cut: {str(e)}")
+
+    def _collection(self):
+        if not GEMINI_LIMITER_SHARED:
+            return None
+        # Like the response cache, never open a connection just for this
+        db = Database._instance
+        return db.rate_limits if db is not None else None
+
+    def _capacity_error(self):
+        metrics.increment('gemini.queue_timeouts')
+        return GeminiCapacityError(
+            f"No Gemini capacity within {GEMINI_QUEUE_TIMEOUT_SECONDS:.0f}s (rate limit)"
+        )
+
+def is_rate_limited(error):
+    """Check whether a Gemini error means the quota is exhausted (HTTP 429)"""
+    if isinstance(error, TooManyRequests):
+        return True
+    message = str(error)
+    return '429' in message or 'RESOURCE_EXHAUSTED' in message
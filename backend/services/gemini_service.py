@@ -1,5 +1,21 @@
+import asyncio
+import json
+import re
+import time
 import google.generativeai as genai
-from config.settings import GEMINI_API_KEY
+from config.settings import (
+    GEMINI_API_KEY,
+    GEMINI_MODEL,
+    GEMINI_CACHE_ENABLED,
+    GEMINI_QUEUE_TIMEOUT_SECONDS,
+    SUMMARY_PROMPT_TOKEN_BUDGET,
+    SMART_REPLY_PROMPT_TOKEN_BUDGET,
+    PROMPT_TOKEN_COUNTER
+)
+from services.gemini_cache import GeminiResponseCache
+from services.gemini_limiter import GeminiLimiter, GeminiCapacityError, is_rate_limited
+from services.prompt_builder import PromptBuilder, estimate_tokens, scaled_counter
+from utils.json_stream import JsonSectionParser
 from utils.logger import summary_logger, log_error
 
 # Error messages
@@ -11,6 +27,178 @@ INVALID_KEY_ERROR = "Invalid API key configuration"
 SUMMARY_ERROR = "Error generating summary: {}"
 SMART_REPLY_ERROR = "Failed to generate smart replies: {}"
 
+SUMMARY_PROMPT_TEMPLATE = """Based on the calendar events and emails provided, generate a structured summary in the following strict JSON format:
+
+{{
+  "quickSummary": {{
+    "overview": "A 3-4 line comprehensive overview of the day, highlighting key events, important meetings, deadlines, critical emails, and any pending calendar invites that need attention. Include specific times and key action items that need immediate attention.",
+    "priority_level": "HIGH|MEDIUM|LOW"
+  }},
+  "events": {{
+    "total": <number>,
+    "upcoming": [
+      {{
+        "id": "<event id>",
+        "title": "<event title>",
+        "time": "<formatted time>",
+        "priority": "HIGH|MEDIUM|LOW",
+        "type": "MEETING|DEADLINE|PERSONAL|OTHER",
+        "needsResponse": true|false
+      }}
+    ]
+  }},
+  "emails": {{
+    "total": <number>,
+    "important": [
+      {{
+        "id": "<email id>",
+        "subject": "<email subject>",
+        "from": "<sender>",
+        "from_email": "<sender_email>",
+        "threadId": "<threadId>",
+        "priority": "HIGH|MEDIUM|LOW",
+        "actionRequired": true|false,
+        "snippet": "<email snippet>"
+      }}
+    ]
+  }},
+  "actionItems": [
+    {{
+      "task": "<action item>",
+      "priority": "HIGH|MEDIUM|LOW",
+      "source": "EMAIL|CALENDAR|BOTH",
+      "deadline": "<deadline if any>",
+      "refs": ["<ids of the events or emails this item comes from>"]
+    }}
+  ]
+}}
+
+Here are the current items to summarize:
+
+Calendar Events:
+{events_text}
+
+Important Emails:
+{emails_text}
+
+Rules:
+1. The quickSummary overview should be 3-4 lines long and include specific times and key details
+2. Priority should reflect urgency and importance
+3. Action items should be specific and actionable
+4. If no events or emails exist, return empty arrays but maintain the structure
+5. Type for events should be inferred from the content
+6. Keep email subjects, sender names, and email addresses exactly as provided in the original data
+7. Set needsResponse to true for any calendar events that are pending invites requiring user response
+8. Include action items for responding to calendar invites that need attention
+9. Copy event and email ids exactly as provided and list the source ids of every action item in refs
+
+Remember to:
+- Keep the JSON structure exactly as shown
+- Make the summary detailed but concise
+- Include all fields even if empty
+- Validate JSON format
+- Use priority consistently
+- Highlight pending calendar invites that need attention"""
+
+_PRIORITY = {"type": "string", "enum": ["HIGH", "MEDIUM", "LOW"]}
+
+# Response schema for structured output; it mirrors the JSON shown in the
+# prompt so Gemini returns a document that needs no cleanup before use
+SUMMARY_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "quickSummary": {
+            "type": "object",
+            "properties": {
+                "overview": {"type": "string"},
+                "priority_level": _PRIORITY
+            },
+            "required": ["overview", "priority_level"]
+        },
+        "events": {
+            "type": "object",
+            "properties": {
+                "total": {"type": "integer"},
+                "upcoming": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "string"},
+                            "title": {"type": "string"},
+                            "time": {"type": "string"},
+                            "priority": _PRIORITY,
+                            "type": {"type": "string", "enum": ["MEETING", "DEADLINE", "PERSONAL", "OTHER"]},
+                            "needsResponse": {"type": "boolean"}
+                        },
+                        "required": ["id", "title", "time", "priority", "type", "needsResponse"]
+                    }
+                }
+            },
+            "required": ["total", "upcoming"]
+        },
+        "emails": {
+            "type": "object",
+            "properties": {
+                "total": {"type": "integer"},
+                "important": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "string"},
+                            "subject": {"type": "string"},
+                            "from": {"type": "string"},
+                            "from_email": {"type": "string"},
+                            "threadId": {"type": "string"},
+                            "priority": _PRIORITY,
+                            "actionRequired": {"type": "boolean"},
+                            "snippet": {"type": "string"}
+                        },
+                        "required": ["id", "subject", "from", "from_email", "threadId", "priority", "actionRequired", "snippet"]
+                    }
+                }
+            },
+            "required": ["total", "important"]
+        },
+        "actionItems": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "task": {"type": "string"},
+                    "priority": _PRIORITY,
+                    "source": {"type": "string", "enum": ["EMAIL", "CALENDAR", "BOTH"]},
+                    "deadline": {"type": "string"},
+                    "refs": {"type": "array", "items": {"type": "string"}}
+                },
+                "required": ["task", "priority", "source", "refs"]
+            }
+        }
+    },
+    "required": ["quickSummary", "events", "emails", "actionItems"]
+}
+
+# A "REPLY:" line, allowing for "1. ", "- " or "**" before the marker
+REPLY_LINE_PATTERN = re.compile(r'^\s*(?:[-*]|\d+[.)])?\s*\**\s*REPLY\s*:\s*\**(.*)$', re.IGNORECASE)
+
+# Message bodies are cut to this length when a thread is over its token budget
+SMART_REPLY_COMPRESSED_BODY_CHARS = 1200
+
+SMART_REPLY_PROMPT_TEMPLATE = """Based on this email thread (showing the {count} most recent messages), generate appropriate reply suggestions:
+
+        Thread Context:
+        {separator}
+        {thread_text}
+        {separator}
+
+        Consider:
+        1. The tone and formality of previous messages
+        2. Any specific questions or requests made
+        3. Required next actions or decisions
+        4. Professional email etiquette
+        """
+
 class GeminiServiceError(Exception):
     """Custom exception for Gemini service errors"""
     pass
@@ -23,13 +211,21 @@ class GeminiService:
         try:
             summary_logger.info("Initializing Gemini service")
             genai.configure(api_key=GEMINI_API_KEY)
-            self.model = genai.GenerativeModel('models/gemini-2.0-flash')
+            self.model = genai.GenerativeModel(GEMINI_MODEL)
+            # Summaries come back as schema-conforming JSON; deltas as plain JSON
+            self.summary_config = genai.GenerationConfig(
+                response_mime_type='application/json',
+                response_schema=SUMMARY_RESPONSE_SCHEMA
+            )
+            self.json_config = genai.GenerationConfig(response_mime_type='application/json')
+            self.cache = GeminiResponseCache.get_instance()
+            self.limiter = GeminiLimiter.get_instance()
             summary_logger.info("Gemini service initialized successfully")
         except Exception as e:
             log_error(summary_logger, e, "Failed to initialize Gemini service")
             raise GeminiServiceError(INIT_ERROR.format(str(e)))
 
-    def generate_summary(self, calendar_events, emails):
+    def generate_summary(self, calendar_events, emails, use_cache=True):
         if not isinstance(calendar_events, list) or not isinstance(emails, list):
             raise ValueError("Calendar events and emails must be lists")
 
@@ -41,60 +237,117 @@ class GeminiService:
             prompt = self._create_prompt(calendar_events, emails)
             
             # Generate the summary
-            summary_logger.info("Sending request to Gemini API")
-            response = self.model.generate_content(prompt)
-            
-            if not response or not response.text:
-                summary_logger.error("Received empty response from Gemini API")
-                raise GeminiServiceError(EMPTY_RESPONSE_ERROR)
+            summary = self._generate(prompt, self._clean_response, use_cache, self.summary_config)
 
             summary_logger.info("Successfully generated summary")
-            return self._clean_response(response.text)
+            return summary
 
         except Exception as e:
             log_error(summary_logger, e, "Failed to generate summary")
-            error_msg = str(e)
-            if "rate limit" in error_msg.lower():
-                raise GeminiServiceError(RATE_LIMIT_ERROR)
-            elif "invalid api key" in error_msg.lower():
-                raise GeminiServiceError(INVALID_KEY_ERROR)
-            else:
-                raise GeminiServiceError(SUMMARY_ERROR.format(error_msg))
-
-    def generate_smart_replies(self, thread):
-        """Generate three smart reply suggestions for an email thread."""
+            raise self._summary_error(e)
+
+    async def generate_summary_async(self, calendar_events, emails, use_cache=True):
+        """Async version of generate_summary for the asyncio refresh pipeline"""
+        if not isinstance(calendar_events, list) or not isinstance(emails, list):
+            raise ValueError("Calendar events and emails must be lists")
+
         try:
-            summary_logger.info("Generating smart replies")
-            
-            # Format the thread context
-            messages = thread.get('messages', [])
-            if not messages:
-                raise ValueError("No messages in thread")
-            
-            # Create prompt for smart replies
-            prompt = self._create_smart_reply_prompt(messages)
-            
-            # Generate the replies
-            response = self.model.generate_content([
-                {"text": prompt},
-                {"text": "Generate exactly 3 concise, professional reply options, each starting with 'REPLY:' on a new line. Make them contextually appropriate, varying in tone from formal to casual but always professional."}
-            ])
-            
-            if not response or not response.text:
+            summary_logger.info("Generating summary",
+                              extra={"num_events": len(calendar_events), "num_emails": len(emails)})
+            # Building the prompt may call count_tokens, so keep it off the event loop
+            prompt = await asyncio.to_thread(self._create_prompt, calendar_events, emails)
+
+            summary = await self._generate_async(prompt, self._clean_response, use_cache, self.summary_config)
+
+            summary_logger.info("Successfully generated summary")
+            return summary
+
+        except Exception as e:
+            log_error(summary_logger, e, "Failed to generate summary")
+            raise self._summary_error(e)
+
+    def generate_summary_stream(self, calendar_events, emails, use_cache=True):
+        """Stream a summary as it is generated.
+
+        Yields ('section', key, value) for each top-level section as soon as it
+        is complete and valid JSON, then ('summary', summary) with the
+        validated document as a dict (None if it failed validation).
+        """
+        if not isinstance(calendar_events, list) or not isinstance(emails, list):
+            raise ValueError("Calendar events and emails must be lists")
+
+        try:
+            summary_logger.info("Streaming summary",
+                              extra={"num_events": len(calendar_events), "num_emails": len(emails)})
+            prompt = self._create_prompt(calendar_events, emails)
+            key = self._cache_key(prompt, self.summary_config)
+            cached = self.cache.get(key) if use_cache and GEMINI_CACHE_ENABLED else None
+            if cached is not None:
+                summary_logger.info("Using cached Gemini response")
+                for section, value in cached.items():
+                    yield ('section', section, value)
+                yield ('summary', cached)
+                return
+
+            summary_logger.info("Sending streaming request to Gemini API")
+            parser = JsonSectionParser()
+            chunks = []
+            for text in self._stream_content(prompt, self.summary_config):
+                chunks.append(text)
+                for section, value in parser.feed(text):
+                    yield ('section', section, value)
+
+            response_text = ''.join(chunks)
+            if not response_text:
                 summary_logger.error("Received empty response from Gemini API")
                 raise GeminiServiceError(EMPTY_RESPONSE_ERROR)
+            summary = self._clean_response(response_text)
+            if summary is not None and GEMINI_CACHE_ENABLED:
+                self.cache.set(key, summary, GEMINI_MODEL)
+
+            summary_logger.info("Successfully streamed summary")
+            yield ('summary', summary)
+
+        except Exception as e:
+            log_error(summary_logger, e, "Failed to stream summary")
+            raise self._summary_error(e)
+
+    async def generate_summary_delta_async(self, previous_summary, calendar_events, emails, removed_items, use_cache=True):
+        """Summarize only new events and emails as a delta for merge_summary"""
+        try:
+            summary_logger.info("Generating summary delta",
+                              extra={"num_events": len(calendar_events), "num_emails": len(emails)})
+            prompt = self._create_delta_prompt(previous_summary, calendar_events, emails, removed_items)
+            delta = await self._generate_async(prompt, self._clean_delta, use_cache, self.json_config)
+            if delta is None:
+                raise GeminiServiceError("Received an invalid summary delta from Gemini API")
+            return delta
+
+        except Exception as e:
+            log_error(summary_logger, e, "Failed to generate summary delta")
+            raise self._summary_error(e)
+
+    def _summary_error(self, error):
+        """Map a Gemini failure to the GeminiServiceError shown to users"""
+        error_msg = str(error)
+        if isinstance(error, GeminiCapacityError) or "rate limit" in error_msg.lower():
+            return GeminiServiceError(RATE_LIMIT_ERROR)
+        elif "invalid api key" in error_msg.lower():
+            return GeminiServiceError(INVALID_KEY_ERROR)
+        else:
+            return GeminiServiceError(SUMMARY_ERROR.format(error_msg))
+
+    def generate_smart_replies(self, thread, use_cache=True):
+        """Generate up to three smart reply suggestions for an email thread."""
+        try:
+            summary_logger.info("Generating smart replies")
             
-            # Parse the replies
-            replies = []
-            for line in response.text.split('\n'):
-                if line.startswith('REPLY:'):
-                    reply = line.replace('REPLY:', '').strip()
-                    if reply:
-                        replies.append(reply)
+            # Generate the replies
+            replies = self._generate(self._smart_reply_contents(thread), self._parse_replies, use_cache)
             
-            # Ensure exactly 3 replies
-            if len(replies) != 3:
-                raise GeminiServiceError("Failed to generate the required number of replies")
+            # A response without any usable reply is an error; fewer than 3 is fine
+            if replies is None:
+                raise GeminiServiceError("Received no usable replies from Gemini API")
                 
             summary_logger.info("Successfully generated smart replies")
             return replies
@@ -103,8 +356,126 @@ class GeminiService:
             log_error(summary_logger, e, "Failed to generate smart replies")
             raise GeminiServiceError(SMART_REPLY_ERROR.format(str(e)))
 
+    async def generate_smart_replies_async(self, thread, use_cache=True):
+        """Async version of generate_smart_replies"""
+        try:
+            summary_logger.info("Generating smart replies")
+            contents = await asyncio.to_thread(self._smart_reply_contents, thread)
+            replies = await self._generate_async(contents, self._parse_replies, use_cache)
+            if replies is None:
+                raise GeminiServiceError("Received no usable replies from Gemini API")
+            summary_logger.info("Successfully generated smart replies")
+            return replies
+
+        except Exception as e:
+            log_error(summary_logger, e, "Failed to generate smart replies")
+            raise GeminiServiceError(SMART_REPLY_ERROR.format(str(e)))
+
+    def _smart_reply_contents(self, thread):
+        messages = thread.get('messages', [])
+        if not messages:
+            raise ValueError("No messages in thread")
+
+        return [
+            {"text": self._create_smart_reply_prompt(messages)},
+            {"text": "Generate exactly 3 concise, professional reply options, each starting with 'REPLY:' on a new line. Make them contextually appropriate, varying in tone from formal to casual but always professional."}
+        ]
+
+    def generate_text(self, prompt, use_cache=True):
+        """Generate free-form text for a prompt, e.g. the audio summary script"""
+        return self._generate(prompt, lambda text: text.strip() or None, use_cache)
+
+    async def generate_text_async(self, prompt, use_cache=True):
+        """Async version of generate_text"""
+        return await self._generate_async(prompt, lambda text: text.strip() or None, use_cache)
+
+    def _generate(self, contents, parse, use_cache=True, generation_config=None):
+        """Call Gemini through the response cache.
+
+        parse turns the response text into the result; None means the response
+        was unusable and is not cached. With use_cache=False the lookup is
+        skipped but the fresh result is still stored.
+        """
+        key = self._cache_key(contents, generation_config)
+        if use_cache and GEMINI_CACHE_ENABLED:
+            cached = self.cache.get(key)
+            if cached is not None:
+                summary_logger.info("Using cached Gemini response")
+                return cached
+
+        summary_logger.info("Sending request to Gemini API")
+        response = self.limiter.call(
+            lambda: self.model.generate_content(contents, generation_config=generation_config)
+        )
+        result = self._parse_response(response, parse)
+        if result is not None and GEMINI_CACHE_ENABLED:
+            self.cache.set(key, result, GEMINI_MODEL)
+        return result
+
+    async def _generate_async(self, contents, parse, use_cache=True, generation_config=None):
+        """Async version of _generate"""
+        key = self._cache_key(contents, generation_config)
+        if use_cache and GEMINI_CACHE_ENABLED:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                summary_logger.info("Using cached Gemini response")
+                return cached
+
+        summary_logger.info("Sending async request to Gemini API")
+        response = await self.limiter.call_async(
+            lambda: self.model.generate_content_async(contents, generation_config=generation_config)
+        )
+        result = self._parse_response(response, parse)
+        if result is not None and GEMINI_CACHE_ENABLED:
+            await asyncio.to_thread(self.cache.set, key, result, GEMINI_MODEL)
+        return result
+
+    def _stream_content(self, contents, generation_config=None):
+        """Stream response text through the limiter; rate limits are retried only before the first chunk"""
+        deadline = time.monotonic() + GEMINI_QUEUE_TIMEOUT_SECONDS
+        attempt = 0
+        while True:
+            started = False
+            try:
+                with self.limiter.slot(deadline):
+                    for chunk in self.model.generate_content(contents, generation_config=generation_config, stream=True):
+                        started = True
+                        yield chunk.text
+                return
+            except Exception as e:
+                if started or not is_rate_limited(e):
+                    raise
+                time.sleep(self.limiter.retry_delay(attempt, deadline))
+                attempt += 1
+
+    def _cache_key(self, contents, generation_config=None):
+        # The output format is part of the key so structured results never
+        # collide with text cached for the same prompt
+        model_name = GEMINI_MODEL
+        if generation_config is not None and generation_config.response_mime_type:
+            model_name = f"{GEMINI_MODEL}+{generation_config.response_mime_type}"
+        return self.cache.key(model_name, contents)
+
+    def _parse_response(self, response, parse):
+        if not response or not response.text:
+            summary_logger.error("Received empty response from Gemini API")
+            raise GeminiServiceError(EMPTY_RESPONSE_ERROR)
+        return parse(response.text)
+
+    def _parse_replies(self, text):
+        """Pull up to 3 REPLY: lines out of a smart replies response; None if there are none"""
+        replies = []
+        for line in text.split('\n'):
+            # Tolerate list numbering and markdown emphasis around the marker
+            match = REPLY_LINE_PATTERN.match(line)
+            if match:
+                reply = match.group(1).strip().strip('*').strip()
+                if reply:
+                    replies.append(reply)
+        return replies[:3] or None
+
     def _clean_response(self, text):
-        """Clean and validate the response text and ensure it's proper JSON"""
+        """Decode and validate a summary response; returns the summary dict or None"""
         if not text:
             return None
             
@@ -112,16 +483,15 @@ class GeminiService:
         text = text.replace('```json', '').replace('```', '').strip()
         
         try:
-            import json
             # Try to parse as JSON
             data = json.loads(text)
             
             # Validate required structure
             required_keys = ['quickSummary', 'events', 'emails', 'actionItems']
-            if not all(key in data for key in required_keys):
+            if not isinstance(data, dict) or not all(key in data for key in required_keys):
                 raise ValueError("Missing required keys in response structure")
                 
-            return json.dumps(data)  # Return properly formatted JSON string
+            return data
         except json.JSONDecodeError:
             summary_logger.error("Failed to parse response as JSON")
             return None
@@ -133,154 +503,182 @@ class GeminiService:
         try:
             summary_logger.debug("Creating prompt for summary generation")
             
-            # Format calendar events and emails
-            events_text = self._format_events(calendar_events)
-            emails_text = self._format_emails(emails)
+            # Fit calendar events and emails into the token budget, most important first
+            template = SUMMARY_PROMPT_TEMPLATE.format(events_text='', emails_text='')
+            valid_events = [event for event in calendar_events if isinstance(event, dict)]
+            valid_emails = [email for email in emails if isinstance(email, dict)]
+            items = [
+                ('events', self._format_event(event), _event_priority(event, rank), self._format_event_brief(event))
+                for rank, event in enumerate(valid_events)
+            ] + [
+                ('emails', self._format_email(email), _email_priority(rank), self._format_email_brief(email))
+                for rank, email in enumerate(valid_emails)
+            ]
+            builder = PromptBuilder('summary', SUMMARY_PROMPT_TOKEN_BUDGET,
+                                    self._token_counter([template] + [text for _, text, _, _ in items]))
+            builder.reserve(template)
+            for section, text, priority, compressed in items:
+                builder.add(section, text, priority, compressed=compressed)
+            sections = builder.build()
+
+            events_text = '\n'.join(sections.get('events', [])) or (
+                "No calendar events scheduled for today." if not valid_events else "No calendar events fit in the prompt.")
+            emails_text = '\n'.join(sections.get('emails', [])) or (
+                "No new emails today." if not valid_emails else "No emails fit in the prompt.")
+
+            prompt = SUMMARY_PROMPT_TEMPLATE.format(events_text=events_text, emails_text=emails_text)
+            
+            summary_logger.debug("Successfully created prompt")
+            return prompt
+
+        except Exception as e:
+            log_error(summary_logger, e, "Failed to create summary prompt")
+            raise
+
+    def _create_delta_prompt(self, previous_summary, calendar_events, emails, removed_items):
+        overview = previous_summary.get('quickSummary', {}).get('overview', '')
+        removed_text = "\n".join(f"- {title}" for title in removed_items) or "None"
+
+        return f"""You are updating an existing daily summary. Only the new items below need to be summarized.
+
+Current overview:
+{overview}
 
-            prompt = f"""Based on the calendar events and emails provided, generate a structured summary in the following strict JSON format:
+Items no longer relevant (drop them from the overview):
+{removed_text}
+
+New Calendar Events:
+{self._format_events(calendar_events) if calendar_events else "None"}
+
+New Emails:
+{self._format_emails(emails) if emails else "None"}
+
+Return only this strict JSON, describing just the new items:
 
 {{
   "quickSummary": {{
-    "overview": "A 3-4 line comprehensive overview of the day, highlighting key events, important meetings, deadlines, critical emails, and any pending calendar invites that need attention. Include specific times and key action items that need immediate attention.",
+    "overview": "The current overview rewritten in 3-4 lines to include the new items and drop the ones no longer relevant",
     "priority_level": "HIGH|MEDIUM|LOW"
   }},
-  "events": {{
-    "total": "<number>",
-    "upcoming": [
-      {{
-        "title": "<event title>",
-        "time": "<formatted time>",
-        "priority": "HIGH|MEDIUM|LOW",
-        "type": "MEETING|DEADLINE|PERSONAL|OTHER",
-        "needsResponse": true|false
-      }}
-    ]
-  }},
-  "emails": {{
-    "total": "<number>",
-    "important": [
-      {{
-        "subject": "<email subject>",
-        "from": "<sender>",
-        "from_email": "<sender_email>",
-        "threadId": "<threadId>",
-        "priority": "HIGH|MEDIUM|LOW",
-        "actionRequired": true|false,
-        "snippet": "<email snippet>"
-      }}
-    ]
-  }},
+  "events": [
+    {{"id": "<event id>", "title": "<event title>", "time": "<formatted time>", "priority": "HIGH|MEDIUM|LOW", "type": "MEETING|DEADLINE|PERSONAL|OTHER", "needsResponse": true|false}}
+  ],
+  "emails": [
+    {{"id": "<email id>", "subject": "<email subject>", "from": "<sender>", "from_email": "<sender_email>", "threadId": "<threadId>", "priority": "HIGH|MEDIUM|LOW", "actionRequired": true|false, "snippet": "<email snippet>"}}
+  ],
   "actionItems": [
-    {{
-      "task": "<action item>",
-      "priority": "HIGH|MEDIUM|LOW",
-      "source": "EMAIL|CALENDAR|BOTH",
-      "deadline": "<deadline if any>"
-    }}
+    {{"task": "<action item>", "priority": "HIGH|MEDIUM|LOW", "source": "EMAIL|CALENDAR|BOTH", "deadline": "<deadline if any>", "refs": ["<source ids>"]}}
   ]
 }}
 
-Here are the current items to summarize:
-
-Calendar Events:
-{events_text}
-
-Important Emails:
-{emails_text}
-
-Rules:
-1. The quickSummary overview should be 3-4 lines long and include specific times and key details
-2. Priority should reflect urgency and importance
-3. Action items should be specific and actionable
-4. If no events or emails exist, return empty arrays but maintain the structure
-5. Type for events should be inferred from the content
-6. Keep email subjects, sender names, and email addresses exactly as provided in the original data
-7. Set needsResponse to true for any calendar events that are pending invites requiring user response
-8. Include action items for responding to calendar invites that need attention
+Copy ids, subjects, sender names and email addresses exactly as provided. Use empty arrays when there is nothing to add."""
 
-Remember to:
-- Keep the JSON structure exactly as shown
-- Make the summary detailed but concise
-- Include all fields even if empty
-- Validate JSON format
-- Use priority consistently
-- Highlight pending calendar invites that need attention"""
-            
-            summary_logger.debug("Successfully created prompt")
-            return prompt
-
-        except Exception as e:
-            log_error(summary_logger, e, "Failed to create summary prompt")
-            raise
+    def _clean_delta(self, text):
+        """Parse a summary delta response, or None if it isn't a JSON object"""
+        text = text.replace('```json', '').replace('```', '').strip()
+        try:
+            delta = json.loads(text)
+        except json.JSONDecodeError:
+            summary_logger.error("Failed to parse summary delta as JSON")
+            return None
+        return delta if isinstance(delta, dict) else None
 
     def _create_smart_reply_prompt(self, messages):
-        thread_context = []
         separator = '-' * 40
 
-        # Include only up to 5 most recent messages for smart replies
-        for msg in messages[-5:]:
-            thread_context.append(
-                f"From: {msg['from']}\n"
-                f"Subject: {msg['subject']}\n"
-                f"Content: {msg.get('body', msg['snippet'])}\n"
+        # Offer up to 5 most recent messages; the newest are kept in full first
+        recent_messages = messages[-5:]
+        template = SMART_REPLY_PROMPT_TEMPLATE.format(count=len(recent_messages), separator=separator, thread_text='')
+        texts = [
+            f"From: {msg['from']}\n"
+            f"Subject: {msg['subject']}\n"
+            f"Content: {msg.get('body', msg['snippet'])}\n"
+            for msg in recent_messages
+        ]
+        builder = PromptBuilder('smart_reply', SMART_REPLY_PROMPT_TOKEN_BUDGET, self._token_counter([template] + texts))
+        builder.reserve(template)
+        for position, (msg, text) in enumerate(zip(recent_messages, texts)):
+            builder.add(
+                'thread',
+                text,
+                priority=position,
+                compressed=f"From: {msg['from']}\n"
+                           f"Subject: {msg['subject']}\n"
+                           f"Content: {_truncate(msg.get('body') or msg['snippet'], SMART_REPLY_COMPRESSED_BODY_CHARS)}\n"
             )
+        thread_context = builder.build().get('thread', [])
 
         # Pre‑build the threaded text with actual newlines
         thread_text = "\n".join(thread_context)
 
-        # Now use a clean triple‑quoted f‑string
-        prompt = f"""Based on this email thread (showing the {len(thread_context)} most recent messages), generate appropriate reply suggestions:
+        return SMART_REPLY_PROMPT_TEMPLATE.format(count=len(thread_context), separator=separator, thread_text=thread_text)
 
-        Thread Context:
-        {separator}
-        {thread_text}
-        {separator}
+    def _token_counter(self, texts):
+        """Token counting function for prompt budgets over these candidate texts, per PROMPT_TOKEN_COUNTER.
 
-        Consider:
-        1. The tone and formality of previous messages
-        2. Any specific questions or requests made
-        3. Required next actions or decisions
-        4. Professional email etiquette
+        With count_tokens, Gemini is asked once for the whole candidate text and
+        items are estimated locally at that rate, instead of one call per item.
         """
-
-        return prompt
+        if PROMPT_TOKEN_COUNTER == 'count_tokens':
+            return scaled_counter(lambda text: self.model.count_tokens(text).total_tokens, '\n'.join(texts))
+        return estimate_tokens
 
     def _format_events(self, events):
         if not events:
             return "No calendar events scheduled for today."
         
-        formatted_events = []
-        for event in events:
-            if not isinstance(event, dict):
-                continue
-                
-            attendees = ", ".join([a.get('email', '') for a in event.get('attendees', [])])
-            event_lines = [
-                f"- {event.get('summary', 'Untitled Event')}",
-                f"  Time: {event.get('start', 'No start time')} - {event.get('end', 'No end time')}",
-                f"  Location: {event.get('location', 'No location')}",
-                f"  Attendees: {attendees if attendees else 'No attendees'}"
-            ]
-            formatted_events.append('\n'.join(event_lines))
-            
+        formatted_events = [self._format_event(event) for event in events if isinstance(event, dict)]
         return '\n'.join(formatted_events) if formatted_events else "No valid calendar events found."
 
+    def _format_event(self, event):
+        attendees = ", ".join([a.get('email', '') for a in event.get('attendees', [])])
+        event_lines = [
+            f"- {event.get('summary', 'Untitled Event')}",
+            f"  Id: {event.get('id', '')}",
+            f"  Time: {event.get('start', 'No start time')} - {event.get('end', 'No end time')}",
+            f"  Location: {event.get('location', 'No location')}",
+            f"  Attendees: {attendees if attendees else 'No attendees'}"
+        ]
+        return '\n'.join(event_lines)
+
+    def _format_event_brief(self, event):
+        """One-line form of an event used when the prompt is over budget"""
+        return f"- {event.get('summary', 'Untitled Event')} (Id: {event.get('id', '')}, {event.get('start', 'No start time')})"
+
     def _format_emails(self, emails):
         if not emails:
             return "No new emails today."
         
-        formatted_emails = []
-        for email in emails:
-            if not isinstance(email, dict):
-                continue
-                
-            email_lines = [
-                f"- Subject: {email.get('subject', 'No Subject')}",
-                f"  From: {email.get('from', 'Unknown Sender')}",
-                f"  From Email: {email.get('from_email', '')}",  # Add from_email explicitly
-                f"  ThreadId: {email.get('threadId', '')}",
-                f"  Preview: {email.get('snippet', 'No preview available')}"
-            ]
-            formatted_emails.append('\n'.join(email_lines))
-            
-        return '\n'.join(formatted_emails) if formatted_emails else "No valid emails found."
\ No newline at end of file
+        formatted_emails = [self._format_email(email) for email in emails if isinstance(email, dict)]
+        return '\n'.join(formatted_emails) if formatted_emails else "No valid emails found."
+
+    def _format_email(self, email):
+        email_lines = [
+            f"- Subject: {email.get('subject', 'No Subject')}",
+            f"  Id: {email.get('id', '')}",
+            f"  From: {email.get('from', 'Unknown Sender')}",
+            f"  From Email: {email.get('from_email', '')}",  # Add from_email explicitly
+            f"  ThreadId: {email.get('threadId', '')}",
+            f"  Preview: {email.get('snippet', 'No preview available')}"
+        ]
+        return '\n'.join(email_lines)
+
+    def _format_email_brief(self, email):
+        """Email without its preview, used when the prompt is over budget"""
+        return (
+            f"- Subject: {email.get('subject', 'No Subject')}\n"
+            f"  Id: {email.get('id', '')}\n"
+            f"  From: {email.get('from', 'Unknown Sender')} <{email.get('from_email', '')}>\n"
+            f"  ThreadId: {email.get('threadId', '')}"
+        )
+
+def _event_priority(event, rank):
+    """Sooner events rank higher, and meetings with attendees above solo events"""
+    return 2.0 + (0.5 if event.get('attendees') else 0.0) - rank * 0.01
+
+def _truncate(text, limit):
+    return text if len(text) <= limit else text[:limit].rstrip() + '...'
+
+def _email_priority(rank):
+    """Emails arrive newest first, so earlier ones rank higher"""
+    return 1.5 - rank * 0.01
@@ -1,55 +1,47 @@
 from datetime import datetime, timedelta, timezone
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
+from services.google_client_factory import GoogleClientFactory
+from services.google_api_executor import GoogleApiExecutor, quota_user_key
 from utils.logger import api_logger, log_error
+from config.settings import GMAIL_BATCH_SIZE, GOOGLE_API_MAX_RETRIES
+import time
 import base64
 import email
 
+# Headers and response fields needed to build the summary prompt, so the
+# summary paths never download or decode full MIME payloads
+METADATA_HEADERS = ['Subject', 'From', 'Date']
+METADATA_FIELDS = 'id,threadId,labelIds,snippet,historyId,internalDate,payload/headers'
+
+# Window used when listing recent emails
+RECENT_EMAIL_DAYS = 7
+
 class GmailService:
     def __init__(self, credentials_dict):
         try:
             api_logger.info("Initializing Gmail service")
-            credentials = Credentials(
-                token=credentials_dict['token'],
-                refresh_token=credentials_dict.get('refresh_token'),
-                token_uri=credentials_dict['token_uri'],
-                client_id=credentials_dict['client_id'],
-                client_secret=credentials_dict['client_secret'],
-                scopes=credentials_dict['scopes']
-            )
-            self.service = build('gmail', 'v1', credentials=credentials)
+            self.service = GoogleClientFactory.get_instance().get_service('gmail', 'v1', credentials_dict)
+            self.executor = GoogleApiExecutor.get_instance()
+            self.quota_key = quota_user_key(credentials_dict)
             api_logger.info("Gmail service initialized successfully")
         except Exception as e:
             log_error(api_logger, e, "Failed to initialize Gmail service")
             raise
 
-    def get_recent_emails(self, max_results=10):
-        try:
-            api_logger.info(f"Fetching recent emails, max_results={max_results}")
-            time_threshold = (datetime.now(timezone.utc) - timedelta(days=7)).strftime('%Y/%m/%d')
-            
-            query = f'after:{time_threshold}'
-            results = self.service.users().messages().list(
-                userId='me',
-                q=query,
-                maxResults=max_results
-            ).execute()
+    def get_recent_emails(self, max_results=10, batched=True, include_body=False):
+        """Fetch emails from the last RECENT_EMAIL_DAYS days.
 
-            messages = results.get('messages', [])
-            api_logger.info(f"Found {len(messages)} recent emails")
+        By default only the metadata needed for summaries is fetched; pass
+        include_body=True to download and decode full message bodies.
+        """
+        try:
+            api_logger.info(f"Fetching recent emails, max_results={max_results}, batched={batched}, include_body={include_body}")
+            message_ids = self.list_recent_message_ids(max_results)
+            api_logger.info(f"Found {len(message_ids)} recent emails")
 
-            emails = []
-            for message in messages:
-                try:
-                    msg = self.service.users().messages().get(
-                        userId='me',
-                        id=message['id'],
-                        format='full'
-                    ).execute()
-                    emails.append(self._parse_message(msg))
-                except Exception as e:
-                    log_error(api_logger, e, f"Failed to fetch email details for ID: {message['id']}")
-                    continue
+            if batched:
+                emails = self._fetch_messages_batched(message_ids, include_body)
+            else:
+                emails = self._fetch_messages_serial(message_ids, include_body)
 
             api_logger.info(f"Successfully processed {len(emails)} emails")
             return emails
@@ -58,59 +50,105 @@ class GmailService:
             log_error(api_logger, e, "Failed to fetch recent emails")
             raise
 
-    def _extract_email(self, address_string):
-        """Extract email address from a string that might include a display name."""
-        try:
-            # Handle format like: "Display Name <email@example.com>"
-            if '<' in address_string and '>' in address_string:
-                return address_string[address_string.find('<')+1:address_string.find('>')]
-            # Handle format with just email address
-            return address_string.strip()
-        except Exception as e:
-            log_error(api_logger, e, f"Failed to extract email from: {address_string}")
-            return None
+    def list_recent_message_ids(self, max_results):
+        """List the IDs of up to max_results messages from the recent window"""
+        query = recent_emails_query()
 
-    def _parse_message(self, message):
-        try:
-            headers = message['payload']['headers']
-            subject = next((h['value'] for h in headers if h['name'].lower() == 'subject'), 'No Subject')
-            from_header = next((h['value'] for h in headers if h['name'].lower() == 'from'), 'Unknown Sender')
-            date_header = next((h['value'] for h in headers if h['name'].lower() == 'date'), '')
-
-            # Extract clean email address from from_header
-            from_email = self._extract_email(from_header)
-            if not from_email:
-                from_email = from_header
-
-            # Extract body
-            body = ''
-            if 'parts' in message['payload']:
-                for part in message['payload']['parts']:
-                    if part['mimeType'] == 'text/plain':
-                        body = base64.urlsafe_b64decode(part['body'].get('data', '')).decode('utf-8')
-                        break
-            elif 'body' in message['payload']:
-                body = base64.urlsafe_b64decode(message['payload']['body'].get('data', '')).decode('utf-8')
-
-            # Ensure threadId is included and not null
-            thread_id = message.get('threadId')
-            if not thread_id:
-                api_logger.warning(f"No threadId found for message {message.get('id', 'unknown')}")
-                thread_id = message.get('id')  # Use message ID as fallback
-
-            return {
-                'id': message['id'],
-                'threadId': thread_id,
-                'subject': subject,
-                'from': from_header,  # Keep original for display
-                'from_email': from_email,  # Add clean email for reply
-                'date': date_header,
-                'snippet': message.get('snippet', ''),
-                'body': body
-            }
-        except Exception as e:
-            log_error(api_logger, e, f"Failed to parse email message ID: {message.get('id', 'unknown')}")
-            return None
+        message_ids = []
+        page_token = None
+        while len(message_ids) < max_results:
+            results = self._execute(self.service.users().messages().list(
+                userId='me',
+                q=query,
+                maxResults=min(max_results - len(message_ids), 500),
+                pageToken=page_token
+            ))
+            message_ids.extend(message['id'] for message in results.get('messages', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+        return message_ids
+
+    def _message_request(self, message_id, include_body=False):
+        """Build a messages.get request in full or metadata-only format"""
+        if include_body:
+            return self.service.users().messages().get(
+                userId='me',
+                id=message_id,
+                format='full'
+            )
+        return self.service.users().messages().get(
+            userId='me',
+            id=message_id,
+            format='metadata',
+            metadataHeaders=METADATA_HEADERS,
+            fields=METADATA_FIELDS
+        )
+
+    def _fetch_messages_serial(self, message_ids, include_body=False):
+        """Fetch messages one request at a time"""
+        emails = []
+        for message_id in message_ids:
+            try:
+                msg = self._execute(self._message_request(message_id, include_body))
+                emails.append(parse_message(msg))
+            except Exception as e:
+                log_error(api_logger, e, f"Failed to fetch email details for ID: {message_id}")
+                continue
+        return emails
+
+    def _fetch_messages_batched(self, message_ids, include_body=False):
+        """Fetch messages through Gmail batch requests, keeping the original order.
+
+        A failed call inside a batch only drops that message, the same as in
+        the serial path. Calls rejected for rate limits or transient errors are
+        sent again in a later batch after a backoff.
+        """
+        fetched = {}
+        retry_errors = {}
+
+        def _on_message(request_id, response, exception):
+            if exception is not None:
+                if self.executor.is_retryable(exception):
+                    retry_errors[request_id] = exception
+                    return
+                log_error(api_logger, exception, f"Failed to fetch email details for ID: {request_id}")
+                return
+            fetched[request_id] = parse_message(response)
+
+        pending = list(message_ids)
+        attempt = 0
+        while pending:
+            retry_errors.clear()
+            for start in range(0, len(pending), GMAIL_BATCH_SIZE):
+                chunk = pending[start:start + GMAIL_BATCH_SIZE]
+                batch = self.service.new_batch_http_request(callback=_on_message)
+                for message_id in chunk:
+                    batch.add(self._message_request(message_id, include_body), request_id=message_id)
+                try:
+                    self._execute(batch, cost=len(chunk))
+                except Exception as e:
+                    log_error(api_logger, e, f"Batch request failed for {len(chunk)} emails")
+                    continue
+
+            if not retry_errors:
+                break
+            if attempt >= GOOGLE_API_MAX_RETRIES:
+                self.executor.record_failure('gmail', len(retry_errors))
+                api_logger.error(f"Giving up on {len(retry_errors)} emails after {attempt} batch retries")
+                break
+            delay = max(self.executor.retry_delay(error, attempt) for error in retry_errors.values())
+            attempt += 1
+            self.executor.record_retry('gmail', len(retry_errors))
+            api_logger.warning(f"Retrying {len(retry_errors)} rate-limited emails in {delay:.2f}s")
+            time.sleep(delay)
+            pending = [message_id for message_id in pending if message_id in retry_errors]
+
+        return [fetched[message_id] for message_id in message_ids if message_id in fetched]
+
+    def _execute(self, request, cost=1, retry=True):
+        """Execute a request through the shared rate limiter and retry layer"""
+        return self.executor.execute(request, 'gmail', self.quota_key, cost=cost, retry=retry)
 
     def send_email(self, to, subject, body, thread_id=None):
         try:
@@ -126,10 +164,11 @@ class GmailService:
                 
             api_logger.info(f"Sending email reply to thread: {thread_id}")
             try:
-                sent_message = self.service.users().messages().send(
+                # Sending is not idempotent, so it is rate limited but never retried
+                sent_message = self._execute(self.service.users().messages().send(
                     userId='me',
                     body=message
-                ).execute()
+                ), retry=False)
                 api_logger.info("Email sent successfully")
                 return sent_message
             except Exception as e:
@@ -159,24 +198,92 @@ class GmailService:
         """Get full email thread details"""
         try:
             api_logger.info(f"Fetching thread: {thread_id}")
-            thread = self.service.users().threads().get(
+            thread = self._execute(self.service.users().threads().get(
                 userId='me',
                 id=thread_id,
                 format='full'
-            ).execute()
-            
-            # Parse the thread messages
-            messages = []
-            for msg in thread.get('messages', []):
-                parsed_msg = self._parse_message(msg)
-                if parsed_msg:
-                    messages.append(parsed_msg)
-                    
-            return {
-                'id': thread['id'],
-                'messages': messages,
-                'snippet': thread.get('snippet', '')
-            }
+            ))
+            return parse_thread(thread)
         except Exception as e:
             log_error(api_logger, e, f"Failed to fetch thread: {thread_id}")
-            raise
\ No newline at end of file
+            raise
+
+def parse_thread(thread):
+    """Parse a full-format thread resource into its id, parsed messages and snippet"""
+    messages = []
+    for msg in thread.get('messages', []):
+        parsed_msg = parse_message(msg)
+        if parsed_msg:
+            messages.append(parsed_msg)
+
+    return {
+        'id': thread['id'],
+        'messages': messages,
+        'snippet': thread.get('snippet', '')
+    }
+
+def recent_emails_query():
+    """Gmail search query matching messages from the recent window"""
+    time_threshold = (datetime.now(timezone.utc) - timedelta(days=RECENT_EMAIL_DAYS)).strftime('%Y/%m/%d')
+    return f'after:{time_threshold}'
+
+def extract_email(address_string):
+    """Extract email address from a string that might include a display name."""
+    try:
+        # Handle format like: "Display Name <email@example.com>"
+        if '<' in address_string and '>' in address_string:
+            return address_string[address_string.find('<')+1:address_string.find('>')]
+        # Handle format with just email address
+        return address_string.strip()
+    except Exception as e:
+        log_error(api_logger, e, f"Failed to extract email from: {address_string}")
+        return None
+
+def parse_message(message):
+    """Parse a Gmail API message resource into the dict used across the app"""
+    try:
+        headers = message['payload']['headers']
+        subject = next((h['value'] for h in headers if h['name'].lower() == 'subject'), 'No Subject')
+        from_header = next((h['value'] for h in headers if h['name'].lower() == 'from'), 'Unknown Sender')
+        date_header = next((h['value'] for h in headers if h['name'].lower() == 'date'), '')
+
+        # Extract clean email address from from_header
+        from_email = extract_email(from_header)
+        if not from_email:
+            from_email = from_header
+
+        # Extract body (absent for metadata-only messages)
+        body = extract_body(message['payload'])
+
+        # Ensure threadId is included and not null
+        thread_id = message.get('threadId')
+        if not thread_id:
+            api_logger.warning(f"No threadId found for message {message.get('id', 'unknown')}")
+            thread_id = message.get('id')  # Use message ID as fallback
+
+        return {
+            'id': message['id'],
+            'threadId': thread_id,
+            'subject': subject,
+            'from': from_header,  # Keep original for display
+            'from_email': from_email,  # Add clean email for reply
+            'date': date_header,
+            'snippet': message.get('snippet', ''),
+            'historyId': message.get('historyId'),
+            'internalDate': int(message.get('internalDate', 0)),
+            'labelIds': message.get('labelIds', []),
+            'body': body
+        }
+    except Exception as e:
+        log_error(api_logger, e, f"Failed to parse email message ID: {message.get('id', 'unknown')}")
+        return None
+
+def extract_body(payload):
+    """Decode the text/plain body of a message payload, if it was fetched"""
+    if 'parts' in payload:
+        for part in payload['parts']:
+            if part['mimeType'] == 'text/plain':
+                return base64.urlsafe_b64decode(part['body'].get('data', '')).decode('utf-8')
+    elif 'body' in payload:
+        return base64.urlsafe_b64decode(payload['body'].get('data', '')).decode('utf-8')
+    return ''
@@ -0,0 +1,169 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from pymongo import UpdateOne
+from config.database import Database, DatabaseConnectionError, DB_ERROR_MESSAGES
+from config.settings import GMAIL_SYNC_MAX_MESSAGES, GMAIL_SYNC_MIN_INTERVAL_SECONDS
+from services.async_google_client import AsyncGoogleApiError
+from services.gmail_service import RECENT_EMAIL_DAYS
+from utils.async_runner import AsyncRunner
+from utils.logger import api_logger, log_error
+
+# Messages carrying these labels are left out of the recent emails listing
+EXCLUDED_LABELS = {'SPAM', 'TRASH'}
+
+class GmailSyncService:
+    """Keeps a per-user cache of recent parsed messages in MongoDB.
+
+    The first sync lists the recent window and stores the mailbox historyId;
+    later syncs replay users.history.list from that historyId so only added
+    or removed messages are fetched. When Gmail no longer has history for the
+    stored ID, the cache is rebuilt with a full resync.
+
+    The work is done by the *_async methods on an AsyncGoogleClient; the
+    plain methods are blocking facades for Flask views.
+    """
+
+    def __init__(self, user_id, client):
+        self.user_id = user_id
+        self.client = client
+        self.db = Database.get_instance()
+
+    def get_recent_emails(self, max_results=10):
+        """Sync the cache and return the most recent emails from it"""
+        return AsyncRunner.get_instance().run(self.get_recent_emails_async(max_results))
+
+    def sync(self, force=False):
+        """Bring the cache up to date, returning counts of what changed"""
+        return AsyncRunner.get_instance().run(self.sync_async(force))
+
+    async def get_recent_emails_async(self, max_results=10):
+        """Sync the cache and return the most recent emails from it"""
+        try:
+            await self.sync_async()
+        except Exception as e:
+            log_error(api_logger, e, f"Gmail sync failed for user {self.user_id}, fetching emails directly")
+            return await self.client.get_recent_emails(max_results=max_results)
+        return await asyncio.to_thread(self._read_recent, max_results)
+
+    async def sync_async(self, force=False):
+        """Bring the cache up to date, returning counts of what changed"""
+        if self.db is None or not self.db.is_connected():
+            raise DatabaseConnectionError(DB_ERROR_MESSAGES['connection'])
+
+        state = await asyncio.to_thread(self.db.gmail_sync_state.find_one, {'user_id': self.user_id})
+        if not force and state and self._synced_recently(state):
+            api_logger.info(f"Gmail cache for user {self.user_id} synced recently, skipping")
+            return {'mode': 'skipped', 'added': 0, 'removed': 0}
+
+        if state and state.get('history_id'):
+            try:
+                return await self._incremental_sync(state['history_id'])
+            except AsyncGoogleApiError as e:
+                if e.status != 404:
+                    raise
+                api_logger.warning(f"History ID expired for user {self.user_id}, running full resync")
+        return await self._full_sync()
+
+    def _synced_recently(self, state):
+        last_synced_at = state.get('last_synced_at')
+        if not last_synced_at:
+            return False
+        if last_synced_at.tzinfo is None:
+            last_synced_at = last_synced_at.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - last_synced_at < timedelta(seconds=GMAIL_SYNC_MIN_INTERVAL_SECONDS)
+
+    async def _full_sync(self):
+        api_logger.info(f"Running full Gmail sync for user {self.user_id}")
+        # Read the historyId first so changes made while listing are replayed next time
+        history_id = await self.client.get_history_id()
+        message_ids = await self.client.list_recent_message_ids(GMAIL_SYNC_MAX_MESSAGES)
+        messages = await self.client.get_messages(message_ids)
+
+        await asyncio.to_thread(self.db.gmail_messages.delete_many, {'user_id': self.user_id})
+        added = await asyncio.to_thread(self._store_messages, messages)
+        await asyncio.to_thread(self._save_state, history_id, True)
+
+        api_logger.info(f"Full Gmail sync cached {added} emails for user {self.user_id}")
+        return {'mode': 'full', 'added': added, 'removed': 0}
+
+    async def _incremental_sync(self, history_id):
+        records, latest_history_id = await self.client.list_history(history_id)
+
+        added_ids, removed_ids = set(), set()
+        for record in records:
+            for item in record.get('messagesAdded', []):
+                added_ids.add(item['message']['id'])
+                removed_ids.discard(item['message']['id'])
+            for item in record.get('messagesDeleted', []):
+                removed_ids.add(item['message']['id'])
+                added_ids.discard(item['message']['id'])
+            for item in record.get('labelsAdded', []):
+                if EXCLUDED_LABELS.intersection(item.get('labelIds', [])):
+                    removed_ids.add(item['message']['id'])
+                    added_ids.discard(item['message']['id'])
+            for item in record.get('labelsRemoved', []):
+                if EXCLUDED_LABELS.intersection(item.get('labelIds', [])):
+                    added_ids.add(item['message']['id'])
+                    removed_ids.discard(item['message']['id'])
+
+        messages = await self.client.get_messages(sorted(added_ids)) if added_ids else []
+        added = await asyncio.to_thread(self._apply_changes, messages, removed_ids, latest_history_id)
+
+        api_logger.info(f"Incremental Gmail sync for user {self.user_id}: {added} added, {len(removed_ids)} removed")
+        return {'mode': 'incremental', 'added': added, 'removed': len(removed_ids)}
+
+    def _apply_changes(self, messages, removed_ids, history_id):
+        added = self._store_messages(messages)
+        if removed_ids:
+            self.db.gmail_messages.delete_many({'user_id': self.user_id, 'message_id': {'$in': list(removed_ids)}})
+        self._prune_expired()
+        self._save_state(history_id)
+        return added
+
+    def _store_messages(self, messages):
+        operations = []
+        for message in messages:
+            if not message or EXCLUDED_LABELS.intersection(message.get('labelIds', [])):
+                continue
+            operations.append(UpdateOne(
+                {'user_id': self.user_id, 'message_id': message['id']},
+                {'$set': {
+                    'thread_id': message['threadId'],
+                    'internal_date': message.get('internalDate', 0),
+                    'history_id': message.get('historyId'),
+                    'message': message,
+                    'synced_at': datetime.now(timezone.utc)
+                }},
+                upsert=True
+            ))
+        if operations:
+            self.db.gmail_messages.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    def _prune_expired(self):
+        self.db.gmail_messages.delete_many({
+            'user_id': self.user_id,
+            'internal_date': {'$lt': self._window_start_ms()}
+        })
+
+    def _save_state(self, history_id, full=False):
+        now = datetime.now(timezone.utc)
+        update = {'history_id': history_id, 'last_synced_at': now}
+        if full:
+            update['last_full_sync_at'] = now
+        self.db.gmail_sync_state.update_one(
+            {'user_id': self.user_id},
+            {'$set': update},
+            upsert=True
+        )
+
+    def _read_recent(self, max_results):
+        cursor = self.db.gmail_messages.find(
+            {'user_id': self.user_id, 'internal_date': {'$gte': self._window_start_ms()}},
+            {'message': 1, '_id': 0}
+        ).sort('internal_date', -1).limit(max_results)
+        return [doc['message'] for doc in cursor]
+
+    def _window_start_ms(self):
+        window_start = datetime.now(timezone.utc) - timedelta(days=RECENT_EMAIL_DAYS)
+        return int(window_start.timestamp() * 1000)
@@ -0,0 +1,149 @@
+import hashlib
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from cachetools import TTLCache
+from googleapiclient.errors import HttpError
+from config.settings import (
+    GOOGLE_API_RATE_LIMITS,
+    GOOGLE_API_MAX_RETRIES,
+    GOOGLE_API_BACKOFF_BASE_SECONDS,
+    GOOGLE_API_BACKOFF_MAX_SECONDS
+)
+from utils.logger import api_logger
+from utils.metrics import metrics
+from utils.rate_limiter import TokenBucket
+
+# HTTP statuses worth retrying, plus the 403 reasons Google uses for rate limits
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded', 'RATE_LIMIT_EXCEEDED'}
+
+# Idle per-user buckets are dropped after this long
+USER_BUCKET_TTL_SECONDS = 3600
+
+def quota_user_key(credentials_dict):
+    """Stable per-user key for rate limiting that survives token refreshes"""
+    secret = credentials_dict.get('refresh_token') or credentials_dict.get('token') or ''
+    return hashlib.sha256(secret.encode('utf-8')).hexdigest()[:16]
+
+class GoogleApiExecutor:
+    """Shared execution layer for Google API requests.
+
+    Every request first takes tokens from a per-project and a per-user bucket
+    for its API (see GOOGLE_API_RATE_LIMITS). Requests that fail with 429 or
+    5xx, or with a rate-limit 403, are retried with exponential backoff and
+    full jitter, honoring Retry-After when the server sends it. Throttled,
+    retried and failed requests are counted in the metrics registry.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._project_buckets = {
+            api: TokenBucket(limits['project_qps'])
+            for api, limits in GOOGLE_API_RATE_LIMITS.items()
+        }
+        self._user_buckets = TTLCache(maxsize=100000, ttl=USER_BUCKET_TTL_SECONDS)
+
+    def execute(self, request, api, user_key, cost=1, retry=True):
+        """Execute a googleapiclient request (or batch) under the API's limits.
+
+        cost is the number of API calls the request stands for, e.g. the size of
+        a batch. Pass retry=False for calls that are not safe to repeat.
+        """
+        attempt = 0
+        while True:
+            self.throttle(api, user_key, cost)
+            metrics.increment(f'google_api.{api}.requests', cost)
+            try:
+                return request.execute()
+            except HttpError as e:
+                if not retry or not self.is_retryable(e) or attempt >= GOOGLE_API_MAX_RETRIES:
+                    metrics.increment(f'google_api.{api}.failed')
+                    raise
+                delay = self.retry_delay(e, attempt)
+                attempt += 1
+                metrics.increment(f'google_api.{api}.retried')
+                api_logger.warning(f"{api} request failed with status {e.resp.status}, retry {attempt} in {delay:.2f}s")
+                time.sleep(delay)
+
+    def throttle(self, api, user_key, cost=1):
+        """Block until the API's project and user buckets allow cost more calls"""
+        wait = self.reserve(api, user_key, cost)
+        if wait > 0:
+            metrics.increment(f'google_api.{api}.throttled')
+            time.sleep(wait)
+
+    def reserve(self, api, user_key, cost=1):
+        """Reserve cost calls and return how long to wait before making them"""
+        project_wait = self._project_buckets[api].reserve(cost)
+        user_wait = self._user_bucket(api, user_key).reserve(cost)
+        return max(project_wait, user_wait)
+
+    def record_retry(self, api, count=1):
+        """Count calls retried outside execute, e.g. parts of a batch"""
+        metrics.increment(f'google_api.{api}.retried', count)
+
+    def record_failure(self, api, count=1):
+        """Count calls that failed for good outside execute"""
+        metrics.increment(f'google_api.{api}.failed', count)
+
+    def is_retryable(self, error):
+        """Check whether an HttpError is a transient or rate-limit failure"""
+        if not isinstance(error, HttpError):
+            return False
+        reasons = [detail.get('reason') for detail in (error.error_details or []) if isinstance(detail, dict)]
+        return self.is_retryable_status(error.resp.status, reasons)
+
+    def is_retryable_status(self, status, reasons=()):
+        """Check whether a response status (and error reasons) should be retried"""
+        if status in RETRYABLE_STATUSES:
+            return True
+        return status == 403 and any(reason in RATE_LIMIT_REASONS for reason in reasons)
+
+    def retry_delay(self, error, attempt):
+        """Seconds to wait before the next attempt, from Retry-After or backoff"""
+        return self.backoff_delay(error.resp.get('retry-after'), attempt)
+
+    def backoff_delay(self, retry_after, attempt):
+        """Seconds to wait given a Retry-After header value (or None) and the attempt number"""
+        retry_after = _parse_retry_after(retry_after)
+        if retry_after is not None:
+            return min(retry_after, GOOGLE_API_BACKOFF_MAX_SECONDS)
+        backoff = min(GOOGLE_API_BACKOFF_MAX_SECONDS, GOOGLE_API_BACKOFF_BASE_SECONDS * (2 ** attempt))
+        return random.uniform(0, backoff)
+
+    def _user_bucket(self, api, user_key):
+        key = (api, user_key)
+        with self._lock:
+            bucket = self._user_buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(GOOGLE_API_RATE_LIMITS[api]['user_qps'])
+                self._user_buckets[key] = bucket
+            return bucket
+
+def _parse_retry_after(value):
+    """Parse a Retry-After header given either in seconds or as an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
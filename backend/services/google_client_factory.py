@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+import httplib2
+import google_auth_httplib2
+from cachetools import TTLCache
+from google.oauth2.credentials import Credentials
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document, fix_method_name
+from config.settings import (
+    GOOGLE_CLIENT_CACHE_SIZE,
+    GOOGLE_CLIENT_CACHE_TTL_SECONDS,
+    GOOGLE_HTTP_TIMEOUT_SECONDS
+)
+from utils.helpers import credentials_fingerprint
+from utils.logger import api_logger, log_error
+from utils.metrics import metrics
+
+# APIs whose discovery documents are loaded when the factory starts
+PRELOADED_APIS = [('gmail', 'v1'), ('calendar', 'v3'), ('oauth2', 'v2')]
+
+class GoogleClientFactoryError(Exception):
+    """Exception raised when a Google API client cannot be built."""
+    pass
+
+class GoogleClientFactory:
+    """Builds Google API service objects and reuses them across requests.
+
+    Discovery documents come from the copies bundled with googleapiclient and
+    are parsed once per process. Built services are kept in a bounded LRU with
+    TTL eviction, keyed by API and credentials version, and shared by all
+    request threads. httplib2 is not thread-safe, so each service sends calls
+    through a per-thread transport: keep-alive connections are reused but
+    never shared between threads.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents = {}
+        self._services = TTLCache(maxsize=GOOGLE_CLIENT_CACHE_SIZE, ttl=GOOGLE_CLIENT_CACHE_TTL_SECONDS)
+
+        start = time.perf_counter()
+        for api, version in PRELOADED_APIS:
+            self._get_document(api, version)
+        startup_seconds = time.perf_counter() - start
+        metrics.set_gauge('google_client.startup_seconds', startup_seconds)
+        api_logger.info(f"Google client factory loaded {len(PRELOADED_APIS)} discovery documents in {startup_seconds:.3f}s")
+
+    def get_service(self, api, version, credentials_dict):
+        """Get a cached service for these credentials, building it if needed"""
+        with metrics.timer('google_client.get_service_seconds'):
+            key = (api, version, credentials_fingerprint(credentials_dict))
+            with self._lock:
+                service = self._services.get(key)
+            if service is not None:
+                metrics.increment('google_client.cache_hits')
+                return service
+
+            metrics.increment('google_client.cache_misses')
+            credentials = Credentials(
+                token=credentials_dict['token'],
+                refresh_token=credentials_dict.get('refresh_token'),
+                token_uri=credentials_dict['token_uri'],
+                client_id=credentials_dict['client_id'],
+                client_secret=credentials_dict['client_secret'],
+                scopes=credentials_dict['scopes'],
+                expiry=credentials_dict.get('expiry')
+            )
+            service = self.build_service(api, version, credentials)
+            with self._lock:
+                self._services[key] = service
+            return service
+
+    def build_service(self, api, version, credentials):
+        """Build an uncached service from a Credentials object"""
+        try:
+            with metrics.timer('google_client.build_seconds'):
+                document = self._get_document(api, version)
+                return build_from_document(document, http=ThreadLocalHttp(credentials))
+        except Exception as e:
+            log_error(api_logger, e, f"Failed to build {api} {version} service")
+            raise
+
+    def _get_document(self, api, version):
+        with self._lock:
+            document = self._documents.get((api, version))
+            if document is not None:
+                return document
+
+            content = discovery_cache.get_static_doc(api, version)
+            if content is None:
+                raise GoogleClientFactoryError(f"No bundled discovery document for {api} {version}")
+            document = json.loads(content)
+            # googleapiclient fills in method descriptions the first time each
+            # resource is built; do that now so later builds never resize the
+            # shared document while another thread is reading it.
+            self._prime_resources(build_from_document(document, http=httplib2.Http()), document)
+            self._documents[(api, version)] = document
+            return document
+
+    def _prime_resources(self, resource, resource_desc):
+        for name, description in resource_desc.get('resources', {}).items():
+            self._prime_resources(getattr(resource, fix_method_name(name))(), description)
+
+class ThreadLocalHttp:
+    """Authorized httplib2 transport that keeps a separate connection pool per thread.
+
+    Lets one service object be shared by request threads: every call goes
+    through the calling thread's AuthorizedHttp, built on first use.
+    """
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+        self._local = threading.local()
+
+    @property
+    def http(self):
+        """The calling thread's AuthorizedHttp"""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self._local.http = google_auth_httplib2.AuthorizedHttp(
+                self.credentials,
+                http=httplib2.Http(timeout=GOOGLE_HTTP_TIMEOUT_SECONDS)
+            )
+        return http
+
+    def request(self, *args, **kwargs):
+        return self.http.request(*args, **kwargs)
+
+    def __getattr__(self, name):
+        # Other httplib2 attributes (timeout, connections, close, ...) come from this thread's transport
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.http, name)
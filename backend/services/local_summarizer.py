@@ -0,0 +1,182 @@
+import re
+from datetime import datetime, timedelta, timezone
+from utils.logger import summary_logger
+
+# Keyword heuristics, matched case-insensitively against titles, subjects and snippets
+URGENT_PATTERN = re.compile(r'\b(urgent|asap|immediately|critical|important|action required|deadline|overdue|final notice)\b', re.IGNORECASE)
+REQUEST_PATTERN = re.compile(r'\?|\b(please|could you|can you|would you|let me know|review|approve|confirm|sign|rsvp|respond|reply|feedback)\b', re.IGNORECASE)
+DEADLINE_PATTERN = re.compile(
+    r'\b(?:by|due|before|until|no later than)\s+'
+    r'((?:today|tonight|tomorrow|eod|end of (?:day|week|month)|'
+    r'(?:next\s+)?(?:mon|tues|wednes|thurs|fri|satur|sun)day|'
+    r'\d{1,2}[/.-]\d{1,2}(?:[/.-]\d{2,4})?|'
+    r'(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+\d{1,2}(?:st|nd|rd|th)?)'
+    r'(?:\s+(?:at\s+)?\d{1,2}(?::\d{2})?\s*(?:am|pm)?)?)',
+    re.IGNORECASE
+)
+AUTOMATED_PATTERN = re.compile(r'\b(no-?reply|do-?not-?reply|notifications?|newsletter|mailer-daemon)\b', re.IGNORECASE)
+EVENT_TYPE_PATTERNS = [
+    ('DEADLINE', re.compile(r'\b(deadline|due|submit|submission|launch|release|cutoff)\b', re.IGNORECASE)),
+    ('PERSONAL', re.compile(r'\b(lunch|dinner|breakfast|gym|doctor|dentist|birthday|pick ?up|personal|vacation|holiday)\b', re.IGNORECASE)),
+    ('MEETING', re.compile(r'\b(meeting|call|sync|standup|stand-up|1:1|one on one|interview|review|demo|retro|planning|huddle)\b', re.IGNORECASE)),
+]
+PRIORITY_RANK = {'HIGH': 3, 'MEDIUM': 2, 'LOW': 1}
+
+# Events starting this soon are HIGH priority
+EVENT_SOON = timedelta(hours=2)
+
+def local_summary(calendar_events, emails, now=None):
+    """Build a summary with the same structure as the Gemini prompt, without calling a model.
+
+    Used when Gemini is unavailable. Priorities, event types, deadlines and
+    needsResponse come from keyword and timing heuristics, so the result is
+    deterministic for the same input.
+    """
+    now = now or datetime.now(timezone.utc)
+    events = [_summarize_event(event, now) for event in calendar_events if isinstance(event, dict)]
+    important = [_summarize_email(email) for email in emails if isinstance(email, dict)]
+    events.sort(key=lambda item: item.pop('_start'))
+    important.sort(key=lambda item: -PRIORITY_RANK[item['priority']])
+
+    action_items = []
+    for event in events:
+        if event['needsResponse']:
+            action_items.append(_action_item(f"Respond to the invitation for {event['title']}", 'HIGH', 'CALENDAR', event['time'], event['id']))
+        elif event['type'] == 'DEADLINE':
+            action_items.append(_action_item(f"Complete {event['title']}", event['priority'], 'CALENDAR', event['time'], event['id']))
+    for email in important:
+        if email['actionRequired']:
+            action_items.append(_action_item(
+                f"Reply to {_sender_name(email['from'])} about \"{email['subject']}\"",
+                email['priority'], 'EMAIL', email.pop('_deadline'), email['id']
+            ))
+        else:
+            email.pop('_deadline')
+    action_items.sort(key=lambda item: -PRIORITY_RANK[item['priority']])
+
+    summary = {
+        'quickSummary': {
+            'overview': _overview(events, important, action_items),
+            'priority_level': _overall_priority(events + important)
+        },
+        'events': {'total': len(events), 'upcoming': events},
+        'emails': {'total': len(important), 'important': important},
+        'actionItems': action_items
+    }
+    summary_logger.info(f"Built local summary with {len(events)} events and {len(important)} emails")
+    return summary
+
+def _summarize_event(event, now):
+    title = event.get('summary') or 'Untitled Event'
+    start = _parse_start(event.get('start'))
+    needs_response = any(
+        attendee.get('self') and attendee.get('responseStatus') == 'needsAction'
+        for attendee in event.get('attendees', [])
+    )
+    event_type = next((name for name, pattern in EVENT_TYPE_PATTERNS if pattern.search(title)), None)
+    if event_type is None:
+        event_type = 'MEETING' if len(event.get('attendees', [])) > 1 else 'OTHER'
+
+    if needs_response or URGENT_PATTERN.search(title) or (start and start - now <= EVENT_SOON):
+        priority = 'HIGH'
+    elif event_type in ('MEETING', 'DEADLINE') or (start and start.date() == now.date()):
+        priority = 'MEDIUM'
+    else:
+        priority = 'LOW'
+
+    return {
+        'id': event.get('id', ''),
+        'title': title,
+        'time': _format_time(start, event.get('start')),
+        'priority': priority,
+        'type': event_type,
+        'needsResponse': needs_response,
+        '_start': start or datetime.max.replace(tzinfo=timezone.utc)
+    }
+
+def _summarize_email(email):
+    text = f"{email.get('subject', '')}\n{email.get('snippet', '')}"
+    automated = bool(AUTOMATED_PATTERN.search(email.get('from_email') or email.get('from') or ''))
+    deadline = DEADLINE_PATTERN.search(text)
+    action_required = not automated and bool(REQUEST_PATTERN.search(text) or deadline)
+
+    if not automated and URGENT_PATTERN.search(text):
+        priority = 'HIGH'
+    elif action_required:
+        priority = 'MEDIUM'
+    else:
+        priority = 'LOW'
+
+    return {
+        'id': email.get('id', ''),
+        'subject': email.get('subject', 'No Subject'),
+        'from': email.get('from', 'Unknown Sender'),
+        'from_email': email.get('from_email') or '',
+        'threadId': email.get('threadId', ''),
+        'priority': priority,
+        'actionRequired': action_required,
+        'snippet': email.get('snippet', ''),
+        '_deadline': deadline.group(1) if deadline else ''
+    }
+
+def _action_item(task, priority, source, deadline, ref):
+    return {'task': task, 'priority': priority, 'source': source, 'deadline': deadline or '', 'refs': [ref] if ref else []}
+
+def _overview(events, emails, action_items):
+    sentences = []
+    if events:
+        first = events[0]
+        sentences.append(
+            f"You have {len(events)} upcoming event{'s' if len(events) != 1 else ''}; "
+            f"next is {first['title']} ({first['time']})."
+        )
+    else:
+        sentences.append("No calendar events are scheduled.")
+
+    invites = sum(event['needsResponse'] for event in events)
+    if invites:
+        sentences.append(f"{invites} calendar invite{'s' if invites != 1 else ''} still need{'s' if invites == 1 else ''} a response.")
+
+    needing_action = [email for email in emails if email['actionRequired']]
+    if needing_action:
+        top = needing_action[0]
+        sentences.append(
+            f"{len(needing_action)} of {len(emails)} recent emails need attention, "
+            f"starting with \"{top['subject']}\" from {_sender_name(top['from'])}."
+        )
+    elif emails:
+        sentences.append(f"None of the {len(emails)} recent emails appear to need a reply.")
+    else:
+        sentences.append("There are no new emails.")
+
+    if action_items:
+        sentences.append(f"Top action item: {action_items[0]['task']}.")
+    return ' '.join(sentences)
+
+def _overall_priority(items):
+    if not items:
+        return 'LOW'
+    return max((item['priority'] for item in items), key=PRIORITY_RANK.get)
+
+def _parse_start(value):
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+def _format_time(start, raw):
+    if start is None:
+        return raw or 'Time not set'
+    if raw and 'T' not in raw:
+        return start.strftime('%a %b %d (all day)')
+    return start.strftime('%a %b %d, %H:%M UTC')
+
+def _sender_name(sender):
+    """Display name from "Name <address>", or the address itself"""
+    name = sender.split('<')[0].strip().strip('"')
+    return name or sender.strip('<> ')
@@ -0,0 +1,97 @@
+import math
+from utils.logger import summary_logger
+from utils.metrics import metrics
+
+# Rough characters per token for English prose, used by the local estimator
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text):
+    """Cheap local token estimate"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def scaled_counter(count, sample):
+    """Local estimator scaled so it agrees with count(sample).
+
+    Lets an exact but slow counter, such as the Gemini count_tokens call,
+    run once over all candidate text instead of once per item.
+    """
+    estimate = estimate_tokens(sample)
+    if not estimate:
+        return estimate_tokens
+    ratio = count(sample) / estimate
+    return lambda text: math.ceil(estimate_tokens(text) * ratio)
+
+class PromptBuilder:
+    """Fills a token budget with prioritized prompt items.
+
+    Fixed text (the template) is reserved first. Items are then considered
+    from highest to lowest priority: each goes in whole if it fits, otherwise
+    in its compressed form, otherwise it is dropped. Included items keep
+    their original order within each section. build() returns the texts per
+    section and records tokens used and trimmed in the metrics registry.
+    """
+
+    def __init__(self, name, budget, counter=estimate_tokens):
+        self.name = name
+        self.budget = budget
+        self.counter = counter
+        self.fixed_tokens = 0
+        self._items = []
+        self.stats = None
+
+    def reserve(self, text):
+        """Count fixed text against the budget"""
+        self.fixed_tokens += self.counter(text)
+
+    def add(self, section, text, priority, compressed=None):
+        """Offer an item for a section; higher priority items are kept first"""
+        self._items.append({
+            'section': section,
+            'text': text,
+            'priority': priority,
+            'compressed': compressed,
+            'index': len(self._items)
+        })
+
+    def build(self):
+        """Choose what fits the budget and return {section: [texts in original order]}"""
+        remaining = self.budget - self.fixed_tokens
+        chosen = []
+        trimmed = 0
+        compressed_count = 0
+        dropped_count = 0
+
+        for item in sorted(self._items, key=lambda item: (-item['priority'], item['index'])):
+            tokens = self.counter(item['text'])
+            if tokens <= remaining:
+                chosen.append((item, item['text']))
+                remaining -= tokens
+                continue
+
+            compressed_tokens = self.counter(item['compressed']) if item['compressed'] else None
+            if compressed_tokens is not None and compressed_tokens <= remaining:
+                chosen.append((item, item['compressed']))
+                remaining -= compressed_tokens
+                trimmed += tokens - compressed_tokens
+                compressed_count += 1
+            else:
+                trimmed += tokens
+                dropped_count += 1
+
+        sections = {item['section']: [] for item in self._items}
+        for item, text in sorted(chosen, key=lambda choice: choice[0]['index']):
+            sections[item['section']].append(text)
+
+        self.stats = {
+            'budget': self.budget,
+            'tokens_used': self.budget - remaining,
+            'tokens_trimmed': trimmed,
+            'items': len(self._items),
+            'items_compressed': compressed_count,
+            'items_dropped': dropped_count
+        }
+        metrics.increment(f'prompt.{self.name}.tokens_used', self.stats['tokens_used'])
+        metrics.increment(f'prompt.{self.name}.tokens_trimmed', trimmed)
+        if compressed_count or dropped_count:
+            summary_logger.info(f"Trimmed {self.name} prompt to budget: {self.stats}")
+        return sections
@@ -2,13 +2,49 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime, timedelta, timezone
 import asyncio
+import hashlib
+import json
+import time
 from models.user import User
 from models.summary import Summary
-from services.calendar_service import CalendarService
-from services.gmail_service import GmailService
+from services.async_google_client import AsyncGoogleClient
+from services.calendar_sync_service import CalendarSyncService
+from services.gmail_sync_service import GmailSyncService
 from services.gemini_service import GeminiService
+from services.gemini_limiter import GeminiLimiter
+from services.audio_prerender import AudioPrerenderer
+from services.credential_manager import CredentialManager
+from services.cluster_coordinator import ClusterCoordinator
+from services.local_summarizer import local_summary
+from services.smart_reply_service import SmartReplyService
+from services.summary_merger import summary_sources, diff_sources, change_count, merge_summary
+from utils.async_runner import AsyncRunner
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from utils.hash_ring import HashRing
+from utils.single_flight import SingleFlight
 from utils.logger import summary_logger, log_error
+from utils.metrics import metrics, percentile
 from config.database import Database
+from config.settings import (
+    CREDENTIAL_REFRESH_INTERVAL_MINUTES,
+    CREDENTIAL_REFRESH_MARGIN_SECONDS,
+    DIGEST_REFRESH_INTERVAL_MINUTES,
+    DIGEST_REFRESH_CONCURRENCY,
+    DIGEST_INCREMENTAL_MAX_CHANGES,
+    DIGEST_FULL_REFRESH_HOURS,
+    DIGEST_LOCK_TTL_SECONDS,
+    SCHEDULER_HEARTBEAT_SECONDS,
+    SCHEDULER_LEASE_TTL_SECONDS,
+    GEMINI_SUMMARY_TIMEOUT_SECONDS,
+    SUMMARY_SLO_P95_SECONDS,
+    SUMMARY_SLO_ERROR_RATE,
+    SUMMARY_BREAKER_WINDOW,
+    SUMMARY_BREAKER_OPEN_SECONDS,
+    GEMINI_MODEL
+)
+
+# How often to check whether another worker finished a user's digest
+DIGEST_LOCK_POLL_SECONDS = 0.5
 
 class SingletonException(Exception):
     """Exception raised when attempting to create multiple instances of a singleton."""
@@ -30,19 +66,65 @@ class SchedulerService:
         self.scheduler = BackgroundScheduler()
         self.gemini_service = GeminiService()
         self.db = Database.get_instance()
+        self.coordinator = ClusterCoordinator.get_instance()
+        self.digest_flights = SingleFlight()
+        # Background renewals of digest locks taken by synchronous callers, by lock owner
+        self.lock_keepers = {}
+        self.background_tasks = set()
+        # Sends summaries to the local summarizer while Gemini misses its SLO
+        self.summary_breaker = CircuitBreaker(
+            'gemini_summary',
+            max_p95_seconds=SUMMARY_SLO_P95_SECONDS,
+            max_error_rate=SUMMARY_SLO_ERROR_RATE,
+            window=SUMMARY_BREAKER_WINDOW,
+            open_seconds=SUMMARY_BREAKER_OPEN_SECONDS
+        )
         self.loop = asyncio.get_event_loop()
         
     def start(self):
-        """Start the scheduler"""
+        """Start the scheduler.
+
+        Every process runs the scheduler, but only the leader node starts digest
+        runs and refreshes credentials. All nodes work through the digest shards
+        assigned to them.
+        """
         try:
-            # Add the refresh digest job to run every 60 minutes
+            # Heartbeat first so leadership is settled before the other jobs fire
+            self.scheduler.add_job(
+                func=self._heartbeat,
+                trigger=IntervalTrigger(seconds=SCHEDULER_HEARTBEAT_SECONDS),
+                id='cluster_heartbeat',
+                name='Cluster heartbeat and leader election',
+                next_run_time=datetime.now(timezone.utc),
+                replace_existing=True
+            )
+
+            # Pick up digest shards assigned to this node or left by dead nodes
+            self.scheduler.add_job(
+                func=self._process_digest_shards,
+                trigger=IntervalTrigger(seconds=SCHEDULER_HEARTBEAT_SECONDS),
+                id='process_digest_shards',
+                name='Process digest shards',
+                replace_existing=True
+            )
+
+            # Add the refresh digest job
             self.scheduler.add_job(
                 func=self._refresh_all_digests,
-                trigger=IntervalTrigger(minutes=60),
+                trigger=IntervalTrigger(minutes=DIGEST_REFRESH_INTERVAL_MINUTES),
                 id='refresh_digests',
                 name='Refresh user digests',
                 replace_existing=True
             )
+
+            # Refresh tokens that would expire before the next credentials run
+            self.scheduler.add_job(
+                func=self._refresh_due_credentials,
+                trigger=IntervalTrigger(minutes=CREDENTIAL_REFRESH_INTERVAL_MINUTES),
+                id='refresh_credentials',
+                name='Refresh expiring OAuth tokens',
+                replace_existing=True
+            )
             
             self.scheduler.start()
             summary_logger.info("Scheduler started successfully")
@@ -53,76 +135,447 @@ class SchedulerService:
     def stop(self):
         """Stop the scheduler"""
         self.scheduler.shutdown()
+        try:
+            self.coordinator.shutdown()
+        except Exception as e:
+            log_error(summary_logger, e, "Failed to release scheduler leases")
         summary_logger.info("Scheduler stopped")
 
-    def refresh_user_digest(self, user_id):
+    def refresh_user_digest(self, user_id, window_hours=24, max_emails=5):
         """Refresh digest for a single user synchronously"""
-        return asyncio.run(self._refresh_user_digest_async(user_id))
+        return AsyncRunner.get_instance().run(self._refresh_user_digest_async(user_id, window_hours, max_emails))
+            
+    def collect_digest_inputs(self, user_id, window_hours=24, max_emails=5):
+        """Fetch what a digest is built from synchronously, for callers that generate it themselves"""
+        return AsyncRunner.get_instance().run(self._collect_digest_inputs_async(user_id, window_hours, max_emails))
+
+    async def _collect_digest_inputs_async(self, user_id, window_hours=24, max_emails=5):
+        """Fetch the events and emails for a digest, their fingerprint and the previous summary.
+
+        Returns None when the user is missing or has no credentials.
+        """
+        # Get user and check credentials
+        user = await asyncio.to_thread(User.find_by_id, user_id)
+        credentials = await asyncio.to_thread(CredentialManager.get_instance().get_credentials, user) if user else None
+        if not credentials:
+            summary_logger.warning(f"User {user_id} not found or has no credentials")
+            return None
             
-    async def _refresh_user_digest_async(self, user_id):
-        """Refresh digest for a single user"""
+        # Fetch calendar and mail concurrently
+        client = AsyncGoogleClient(credentials, user_id)
+        window = digest_window(window_hours, max_emails)
+        now = datetime.now(timezone.utc)
+        (events, raw_emails), previous = await asyncio.gather(
+            asyncio.gather(
+                CalendarSyncService(user_id, client).get_events_async(
+                    time_min=now.isoformat(),
+                    time_max=(now + timedelta(hours=window_hours)).isoformat()
+                ),
+                GmailSyncService(user_id, client).get_recent_emails_async(max_results=max_emails)
+            ),
+            # Only a summary of the same window can be reused or merged into
+            asyncio.to_thread(Summary.get_latest_summary, user_id, window)
+        )
+        fingerprint = digest_fingerprint(events, raw_emails, window)
+        return {
+            "user": user,
+            "client": client,
+            "events": events,
+            "emails": _format_emails(raw_emails),
+            "fingerprint": fingerprint,
+            "window": window,
+            "previous": previous,
+            "unchanged": bool(previous and previous.summary and previous.fingerprint == fingerprint)
+        }
+
+    async def _refresh_user_digest_async(self, user_id, window_hours=24, max_emails=5):
+        """Refresh digest for a single user.
+
+        Concurrent refreshes of the same user and window share one run:
+        in-process callers await the in-flight task, and other workers wait on
+        the digest lock and then return the summary it produced.
+        """
+        window = digest_window(window_hours, max_emails)
+        return await self.digest_flights.do(
+            f"{user_id}:{window}",
+            lambda: self._refresh_user_digest_locked(user_id, window, window_hours, max_emails)
+        )
+
+    async def _refresh_user_digest_locked(self, user_id, window, window_hours, max_emails):
+        lock_owner, latest = await self._acquire_digest_lock(user_id, window)
+        if latest:
+            return latest
+
+        keep_lock = asyncio.create_task(self._keep_digest_lock(user_id, window, lock_owner))
+        try:
+            return await self._generate_user_digest_async(user_id, window_hours, max_emails)
+        finally:
+            keep_lock.cancel()
+            await asyncio.to_thread(self._release_digest_lock, user_id, window, lock_owner)
+
+    def acquire_digest_lock(self, user_id, window):
+        """Take the digest lock for a user and window synchronously, or wait for the run holding it.
+
+        A lock taken here is renewed in the background until release_digest_lock.
+        """
+        lock_owner, latest = AsyncRunner.get_instance().run(self._acquire_digest_lock(user_id, window))
+        if lock_owner:
+            self.lock_keepers[lock_owner] = AsyncRunner.get_instance().submit(
+                self._keep_digest_lock(user_id, window, lock_owner)
+            )
+        return lock_owner, latest
+
+    def release_digest_lock(self, user_id, window, lock_owner):
+        """Stop renewing and release a digest lock taken with acquire_digest_lock"""
+        keeper = self.lock_keepers.pop(lock_owner, None)
+        if keeper:
+            keeper.cancel()
+        self._release_digest_lock(user_id, window, lock_owner)
+
+    def _release_digest_lock(self, user_id, window, lock_owner):
+        try:
+            self.coordinator.release_lease(_digest_lock_name(user_id, window), lock_owner)
+        except Exception as e:
+            log_error(summary_logger, e, f"Failed to release digest lock for user: {user_id}")
+
+    async def _acquire_digest_lock(self, user_id, window):
+        """Take the digest lock for a user and window, or wait for the run holding it.
+
+        Returns (lock_owner, None) once this caller holds the lock, or
+        (None, digest) with the summary another run saved while we waited.
+        If that run ends without saving anything, we try to take the lock again.
+        """
+        lock_name = _digest_lock_name(user_id, window)
+        lock_ttl = timedelta(seconds=DIGEST_LOCK_TTL_SECONDS)
+        lock_owner = self.coordinator.lock_owner()
+        waited = False
+        while True:
+            attempted_at = datetime.now(timezone.utc)
+            if await asyncio.to_thread(self.coordinator.acquire_lease, lock_name, lock_ttl, lock_owner):
+                return lock_owner, None
+            if not waited:
+                waited = True
+                metrics.increment('digest.coalesced')
+                summary_logger.info(f"Digest for user {user_id} is being generated by another worker, waiting for it")
+            latest = await self._wait_for_digest(user_id, window, lock_name, attempted_at)
+            if latest:
+                return None, latest
+
+    async def _keep_digest_lock(self, user_id, window, lock_owner):
+        """Renew a held digest lock until cancelled, so long generations keep it"""
+        lock_name = _digest_lock_name(user_id, window)
+        lock_ttl = timedelta(seconds=DIGEST_LOCK_TTL_SECONDS)
+        while True:
+            await asyncio.sleep(DIGEST_LOCK_TTL_SECONDS / 3)
+            try:
+                renewed = await asyncio.to_thread(self.coordinator.acquire_lease, lock_name, lock_ttl, lock_owner)
+            except Exception as e:
+                log_error(summary_logger, e, f"Failed to renew digest lock for user: {user_id}")
+                continue
+            if not renewed:
+                summary_logger.warning(f"Lost digest lock for user {user_id} ({window})")
+                return
+
+    async def _wait_for_digest(self, user_id, window, lock_name, since):
+        """Wait for another worker's digest lock to go away and return the summary it saved after since"""
+        while await asyncio.to_thread(self.coordinator.lease_held, lock_name):
+            await asyncio.sleep(DIGEST_LOCK_POLL_SECONDS)
+        latest = await asyncio.to_thread(Summary.get_latest_summary, user_id, window)
+        if not latest or latest.generated_at < since:
+            return None
+        return {
+            "summary": latest.summary,
+            "generated_at": latest.generated_at.isoformat(),
+            "degraded": latest.degraded,
+            "coalesced": True
+        }
+
+    async def _generate_user_digest_async(self, user_id, window_hours, max_emails):
         try:
             summary_logger.info(f"Refreshing digest for user: {user_id}")
             
-            # Get user and check credentials
-            user = User.find_by_id(user_id)
-            if not user or not user.credentials:
-                summary_logger.warning(f"User {user_id} not found or has no credentials")
+            inputs = await self._collect_digest_inputs_async(user_id, window_hours, max_emails)
+            if not inputs:
                 return
-                
-            # Initialize services
-            calendar_service = CalendarService(user.credentials)
-            gmail_service = GmailService(user.credentials)
-            
-            # Fetch data
-            events = calendar_service.get_events(
-                time_min=datetime.now(timezone.utc).isoformat(),
-                time_max=(datetime.now(timezone.utc) + timedelta(hours=24)).isoformat()
-            )
-            emails = gmail_service.get_recent_emails(max_results=5)
+            events, emails, previous = inputs["events"], inputs["emails"], inputs["previous"]
+
+            # Skip Gemini when the inputs match the ones behind the last summary
+            if inputs["unchanged"]:
+                await asyncio.to_thread(previous.touch)
+                metrics.increment('digest.unchanged')
+                summary_logger.info(f"Mail and calendar unchanged for user {user_id}, reusing previous summary")
+                return {
+                    "summary": previous.summary,
+                    "emails": emails,
+                    "events": events,
+                    "generated_at": previous.generated_at.isoformat(),
+                    "unchanged": True
+                }
             
             # Generate summary
-            summary_text = self.gemini_service.generate_summary(events, emails)
+            summary = await self._build_summary(user_id, previous, events, emails, inputs["fingerprint"], inputs["window"])
             
             # Save to database
-            summary = Summary(user_id, summary_text)
-            summary.save()
+            await asyncio.to_thread(summary.save)
+
+            # Prepare smart replies for flagged threads without holding up the digest
+            self._start_background(
+                SmartReplyService(user_id, inputs["client"], self.gemini_service).pregenerate_async(summary.summary)
+            )
+            if not summary.degraded:
+                AudioPrerenderer.get_instance().submit(inputs["user"], summary.summary)
             
             summary_logger.info(f"Successfully refreshed digest for user: {user_id}")
             return {
-                "summary": summary_text,
+                "summary": summary.summary,
                 "emails": emails,
                 "events": events,
-                "generated_at": datetime.now(timezone.utc).isoformat()
+                "generated_at": datetime.now(timezone.utc).isoformat(),
+                "degraded": summary.degraded
             }
             
         except Exception as e:
             log_error(summary_logger, e, f"Failed to refresh digest for user: {user_id}")
             raise
             
+    async def _build_summary(self, user_id, previous, events, emails, fingerprint, window):
+        """Merge the changes into the previous summary when few items changed, else regenerate it.
+
+        Falls back to the local summarizer when Gemini fails, times out or is
+        behind an open circuit breaker.
+        """
+        sources = summary_sources(events, emails)
+        previous_data = _incremental_base(previous, window)
+        if previous_data is not None:
+            changes = diff_sources(previous.sources, events, emails)
+            if change_count(changes) <= DIGEST_INCREMENTAL_MAX_CHANGES:
+                try:
+                    summary_data = await self._merge_summary(previous_data, events, emails, changes)
+                    metrics.increment('digest.incremental')
+                    summary_logger.info(f"Merged {change_count(changes)} changes into previous summary for user {user_id}")
+                    return Summary(user_id, summary_data, fingerprint=fingerprint, sources=sources,
+                                   full_generated_at=previous.full_generated_at, window=window)
+                except Exception as e:
+                    log_error(summary_logger, e, f"Incremental summary failed for user {user_id}, regenerating")
+
+        try:
+            summary_data = await self._call_gemini(lambda: self.gemini_service.generate_summary_async(events, emails))
+            metrics.increment('digest.full')
+            return Summary(user_id, summary_data, fingerprint=fingerprint, sources=sources, window=window)
+        except Exception as e:
+            log_error(summary_logger, e, f"Gemini summary unavailable for user {user_id}, using local summary")
+
+        metrics.increment('digest.degraded')
+        # Saved without fingerprint or sources so the next refresh goes back to Gemini
+        return Summary(user_id, local_summary(events, emails), degraded=True, window=window)
+
+    async def _call_gemini(self, call):
+        """Await call() under the summary circuit breaker and timeout, recording its outcome"""
+        if not self.summary_breaker.allow():
+            raise CircuitOpenError("Gemini summary circuit is open")
+        started = time.monotonic()
+        ok = False
+        try:
+            result = await asyncio.wait_for(call(), GEMINI_SUMMARY_TIMEOUT_SECONDS)
+            ok = True
+            return result
+        finally:
+            self.summary_breaker.record(time.monotonic() - started, ok)
+
+    async def _merge_summary(self, previous_data, events, emails, changes):
+        added_events = [event for event in events if event.get('id') in changes['added_events']]
+        added_emails = [email for email in emails if email.get('id') in changes['added_emails']]
+        delta = None
+        # Removals alone are applied without calling Gemini
+        if added_events or added_emails:
+            removed_ids = changes['removed_events'] | changes['removed_emails']
+            removed_items = [
+                entry.get('title') or entry.get('subject')
+                for entry in previous_data['events'].get('upcoming', []) + previous_data['emails'].get('important', [])
+                if entry.get('id') in removed_ids
+            ]
+            delta = await self._call_gemini(
+                lambda: self.gemini_service.generate_summary_delta_async(previous_data, added_events, added_emails, removed_items)
+            )
+        return merge_summary(previous_data, delta, events, emails, changes)
+
+    def _start_background(self, coro):
+        """Run a coroutine on the current loop without awaiting it, keeping a reference until it finishes"""
+        task = asyncio.ensure_future(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    def _heartbeat(self):
+        """Keep this node registered, renew or take the leader lease and pick up shared Gemini limits"""
+        try:
+            self.coordinator.heartbeat()
+        except Exception as e:
+            log_error(summary_logger, e, "Scheduler heartbeat failed")
+        try:
+            GeminiLimiter.get_instance().sync()
+        except Exception as e:
+            log_error(summary_logger, e, "Failed to sync the shared Gemini rate limit")
+
     def _refresh_all_digests(self):
-        """Refresh digests for all users with valid credentials"""
+        """Start a digest run for all users, sharded across live nodes (leader only)"""
         try:
+            if not self.db.is_connected():
+                summary_logger.error("Database not connected")
+                return
+            if not self.coordinator.is_leader():
+                summary_logger.info("Not the scheduler leader, skipping digest run scheduling")
+                return
+
             summary_logger.info("Starting bulk digest refresh")
+            if self.coordinator.create_digest_run():
+                self._process_digest_shards()
             
-            # Get all users from database
+        except Exception as e:
+            log_error(summary_logger, e, "Failed to run bulk digest refresh")
+
+    def _process_digest_shards(self):
+        """Refresh the users of every shard this node can claim"""
+        try:
             if not self.db.is_connected():
                 summary_logger.error("Database not connected")
                 return
-                
-            users_cursor = self.db.users.find({
-                "credentials": {"$exists": True, "$ne": None}
-            })
-            
-            for user_data in users_cursor:
+
+            while True:
+                shard = self.coordinator.claim_shard()
+                if not shard:
+                    return
+                summary_logger.info(f"Processing digest shard {shard['_id']} (attempt {shard['attempts']})")
+                stats = AsyncRunner.get_instance().run(self._refresh_shard_async(shard))
+                self.coordinator.complete_shard(shard['_id'], stats)
+                metrics.increment('digest.shards_completed')
+
+        except Exception as e:
+            log_error(summary_logger, e, "Failed to process digest shards")
+
+    async def _refresh_shard_async(self, shard):
+        """Refresh the users that hash to a shard while keeping its lease alive"""
+        ring = HashRing(shard['nodes'])
+        users_cursor = self.db.users.find(
+            {"credentials": {"$exists": True, "$ne": None}},
+            {"user_id": 1, "_id": 0}
+        )
+        user_ids = await asyncio.to_thread(
+            lambda: [user_data['user_id'] for user_data in users_cursor
+                     if ring.get_node(user_data['user_id']) == shard['shard']]
+        )
+
+        async def _keep_lease():
+            while True:
+                await asyncio.sleep(SCHEDULER_LEASE_TTL_SECONDS / 3)
+                if not await asyncio.to_thread(self.coordinator.renew_shard, shard['_id']):
+                    summary_logger.warning(f"Lost lease on digest shard {shard['_id']}")
+                    return
+
+        lease_task = asyncio.create_task(_keep_lease())
+        try:
+            return await self._refresh_users_async(user_ids)
+        finally:
+            lease_task.cancel()
+
+    async def _refresh_users_async(self, user_ids, concurrency=DIGEST_REFRESH_CONCURRENCY):
+        """Refresh digests with at most `concurrency` users in flight, returning run stats"""
+        started = time.perf_counter()
+        queue = asyncio.Queue()
+        for user_id in user_ids:
+            queue.put_nowait(user_id)
+        latencies = []
+        failures = []
+
+        async def _worker():
+            while True:
                 try:
-                    user = User(user_data['user_id'], user_data.get('email'), user_data.get('name', ''))
-                    self.refresh_user_digest(user.user_id)
-                except Exception as e:
-                    log_error(summary_logger, e, f"Failed to refresh digest for user: {user_data.get('user_id')}")
-                    continue
-                    
-            summary_logger.info("Completed bulk digest refresh")
-            
+                    user_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                user_started = time.perf_counter()
+                try:
+                    await self._refresh_user_digest_async(user_id)
+                except Exception:
+                    # Already logged by _refresh_user_digest_async
+                    failures.append(user_id)
+                latency = time.perf_counter() - user_started
+                latencies.append(latency)
+                metrics.observe('digest.user_refresh_seconds', latency)
+
+        await asyncio.gather(*(_worker() for _ in range(max(1, min(concurrency, len(user_ids))))))
+
+        stats = {
+            'users': len(user_ids),
+            'succeeded': len(user_ids) - len(failures),
+            'failed': len(failures),
+            'p50_seconds': round(percentile(latencies, 50), 3),
+            'p95_seconds': round(percentile(latencies, 95), 3),
+            'duration_seconds': round(time.perf_counter() - started, 3),
+            'concurrency': concurrency
+        }
+        metrics.increment('digest.refreshed', stats['succeeded'])
+        metrics.increment('digest.failed', stats['failed'])
+        for name in ('users', 'failed', 'p50_seconds', 'p95_seconds', 'duration_seconds'):
+            metrics.set_gauge(f'digest.last_run.{name}', stats[name])
+        summary_logger.info(f"Completed digest refresh batch: {stats}")
+        return stats
+
+    def _refresh_due_credentials(self):
+        """Refresh OAuth tokens that expire before the next scheduler cycle"""
+        try:
+            if not self.db.is_connected():
+                summary_logger.error("Database not connected")
+                return
+            if not self.coordinator.is_leader():
+                return
+            within = timedelta(minutes=CREDENTIAL_REFRESH_INTERVAL_MINUTES, seconds=CREDENTIAL_REFRESH_MARGIN_SECONDS)
+            CredentialManager.get_instance().refresh_due_credentials(within)
         except Exception as e:
-            log_error(summary_logger, e, "Failed to run bulk digest refresh")
\ No newline at end of file
+            log_error(summary_logger, e, "Failed to refresh expiring credentials")
+
+def _digest_lock_name(user_id, window):
+    return f"digest:{user_id}:{window}"
+
+def digest_window(window_hours, max_emails):
+    """Key for the calendar hours and email count a digest covers, e.g. 48h/10"""
+    return f"{window_hours}h/{max_emails}"
+
+def digest_fingerprint(events, emails, window):
+    """Hash the window and the IDs and versions of the events and emails a digest is built from"""
+    return hashlib.sha256(json.dumps({
+        'model': GEMINI_MODEL,
+        'window': window,
+        'events': [[event.get('id'), event.get('etag'), event.get('updated')] for event in events],
+        'emails': [[email.get('id'), email.get('historyId')] for email in emails if email]
+    }, sort_keys=True).encode('utf-8')).hexdigest()
+
+def _incremental_base(previous, window):
+    """Return the previous summary if a delta can be merged into it, else None.
+
+    Only a summary of the same window can be diffed: items outside a smaller
+    window would otherwise count as removed and be dropped.
+    """
+    if not previous or not previous.sources or not previous.summary or previous.window != window:
+        return None
+    if datetime.now(timezone.utc) - previous.full_generated_at > timedelta(hours=DIGEST_FULL_REFRESH_HOURS):
+        return None
+    previous_data = previous.summary
+    if not isinstance(previous_data, dict) or not all(key in previous_data for key in ('quickSummary', 'events', 'emails', 'actionItems')):
+        return None
+    return previous_data
+
+def _format_emails(raw_emails):
+    """Keep the email fields the summary needs, dropping emails without a threadId"""
+    formatted_emails = []
+    for email in raw_emails:
+        if email and email.get('threadId'):  # Only include emails with valid threadId
+            formatted_emails.append({
+                'subject': email.get('subject', 'No Subject'),
+                'from': email.get('from', 'Unknown Sender'),
+                'from_email': email.get('from_email'),
+                'threadId': email['threadId'],
+                'snippet': email.get('snippet', ''),
+                'date': email.get('date', ''),
+                'id': email.get('id', '')
+            })
+    return formatted_emails
@@ -0,0 +1,103 @@
+import asyncio
+from datetime import datetime, timezone
+from config.database import Database
+from config.settings import SMART_REPLY_PREGENERATE_MAX_THREADS
+from services.gemini_service import GeminiService
+from utils.async_runner import AsyncRunner
+from utils.logger import summary_logger, log_error
+from utils.metrics import metrics
+
+class SmartReplyService:
+    """Smart reply suggestions cached per thread in MongoDB.
+
+    An entry is keyed by the thread's latest message ID, so it is served until
+    a new message arrives. Checking that takes only a minimal thread fetch;
+    the full thread is fetched only when replies have to be generated.
+    pregenerate_async fills the cache for the threads a digest flags, so
+    opening a suggested email usually returns at once. A MongoDB outage only
+    disables the cache.
+
+    The work is done by the *_async methods on an AsyncGoogleClient; the
+    plain methods are blocking facades for Flask views.
+    """
+
+    def __init__(self, user_id, client, gemini_service=None):
+        self.user_id = user_id
+        self.client = client
+        self.gemini_service = gemini_service or GeminiService()
+        self.db = Database.get_instance()
+
+    def get_replies(self, thread_id):
+        """Return {replies, thread, cached} for a thread"""
+        return AsyncRunner.get_instance().run(self.get_replies_async(thread_id))
+
+    async def get_replies_async(self, thread_id):
+        """Return {replies, thread, cached} for a thread"""
+        cached = None
+        try:
+            message_ids = await self.client.get_thread_message_ids(thread_id)
+            if message_ids:
+                cached = await asyncio.to_thread(self._read, thread_id, message_ids[-1])
+        except Exception as e:
+            log_error(summary_logger, e, f"Smart reply cache lookup failed for thread: {thread_id}")
+
+        if cached:
+            metrics.increment('smart_replies.cache_hits')
+            summary_logger.info(f"Returning cached smart replies for thread: {thread_id}")
+            return {'replies': cached['replies'], 'thread': cached['thread'], 'cached': True}
+
+        metrics.increment('smart_replies.cache_misses')
+        thread = await self.client.get_thread(thread_id)
+        replies = await self.gemini_service.generate_smart_replies_async(thread)
+        await asyncio.to_thread(self._store, thread, replies)
+        return {'replies': replies, 'thread': thread, 'cached': False}
+
+    async def pregenerate_async(self, summary):
+        """Generate and cache replies for the threads a digest flags; returns how many were generated"""
+        generated = 0
+        # One thread at a time so background work leaves Gemini capacity for users
+        for thread_id in reply_candidates(summary):
+            try:
+                result = await self.get_replies_async(thread_id)
+                generated += not result['cached']
+            except Exception as e:
+                log_error(summary_logger, e, f"Failed to pre-generate smart replies for thread: {thread_id}")
+        if generated:
+            metrics.increment('smart_replies.pregenerated', generated)
+            summary_logger.info(f"Pre-generated smart replies for {generated} threads of user {self.user_id}")
+        return generated
+
+    def _read(self, thread_id, latest_message_id):
+        if self.db is None or not self.db.is_connected():
+            return None
+        return self.db.smart_replies.find_one({
+            'user_id': self.user_id,
+            'thread_id': thread_id,
+            'latest_message_id': latest_message_id
+        })
+
+    def _store(self, thread, replies):
+        if self.db is None or not self.db.is_connected() or not thread['messages']:
+            return
+        try:
+            self.db.smart_replies.update_one(
+                {'user_id': self.user_id, 'thread_id': thread['id']},
+                {'$set': {
+                    'latest_message_id': thread['messages'][-1]['id'],
+                    'replies': replies,
+                    'thread': thread,
+                    'generated_at': datetime.now(timezone.utc)
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            log_error(summary_logger, e, f"Failed to cache smart replies for thread: {thread['id']}")
+
+def reply_candidates(summary):
+    """Thread IDs of a digest's emails that need action or are HIGH priority, in digest order"""
+    thread_ids = []
+    for email in (summary or {}).get('emails', {}).get('important', []):
+        thread_id = email.get('threadId')
+        if thread_id and thread_id not in thread_ids and (email.get('actionRequired') or email.get('priority') == 'HIGH'):
+            thread_ids.append(thread_id)
+    return thread_ids[:SMART_REPLY_PREGENERATE_MAX_THREADS]
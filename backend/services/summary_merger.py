@@ -0,0 +1,92 @@
+PRIORITY_ORDER = {'LOW': 0, 'MEDIUM': 1, 'HIGH': 2}
+
+def summary_sources(events, emails):
+    """Record which event versions and email IDs a summary was built from"""
+    return {
+        'events': [[event.get('id'), event.get('etag') or event.get('updated')] for event in events],
+        'emails': [email.get('id') for email in emails]
+    }
+
+def diff_sources(previous_sources, events, emails):
+    """Compare the previous summary's sources with the current items.
+
+    Returns the IDs of added and removed events and emails. An event whose
+    etag changed counts as both removed and added.
+    """
+    previous_events = {event_id: version for event_id, version in previous_sources.get('events', [])}
+    current_events = {event_id: version for event_id, version in summary_sources(events, emails)['events']}
+    previous_emails = set(previous_sources.get('emails', []))
+    current_emails = {email.get('id') for email in emails}
+
+    changed_events = {
+        event_id for event_id, version in current_events.items()
+        if event_id in previous_events and previous_events[event_id] != version
+    }
+    return {
+        'added_events': (current_events.keys() - previous_events.keys()) | changed_events,
+        'removed_events': (previous_events.keys() - current_events.keys()) | changed_events,
+        'added_emails': current_emails - previous_emails,
+        'removed_emails': previous_emails - current_emails
+    }
+
+def change_count(changes):
+    """Total number of added and removed items in a diff"""
+    return sum(len(ids) for ids in changes.values())
+
+def merge_summary(previous, delta, events, emails, changes):
+    """Merge a delta for new items into the previous structured summary.
+
+    Entries for removed items, and action items that only refer to removed
+    items, are dropped. Then the delta's entries are added, replacing any
+    entries with the same ID. Events and emails are ordered like the current
+    source lists, and totals are recounted from them. The result depends
+    only on the inputs.
+    """
+    removed_ids = changes['removed_events'] | changes['removed_emails']
+    delta = delta or {}
+
+    upcoming = _merge_entries(
+        previous.get('events', {}).get('upcoming', []),
+        delta.get('events', []),
+        changes['removed_events'],
+        [event.get('id') for event in events]
+    )
+    important = _merge_entries(
+        previous.get('emails', {}).get('important', []),
+        delta.get('emails', []),
+        changes['removed_emails'],
+        [email.get('id') for email in emails]
+    )
+
+    action_items = [
+        item for item in previous.get('actionItems', [])
+        if not item.get('refs') or not set(item['refs']) <= removed_ids
+    ]
+    known_tasks = {item.get('task') for item in action_items}
+    action_items.extend(item for item in delta.get('actionItems', []) if item.get('task') not in known_tasks)
+
+    quick_summary = dict(previous.get('quickSummary', {}))
+    delta_summary = delta.get('quickSummary', {})
+    if delta_summary.get('overview'):
+        quick_summary['overview'] = delta_summary['overview']
+    if delta_summary.get('priority_level'):
+        quick_summary['priority_level'] = max(
+            [quick_summary.get('priority_level', 'LOW'), delta_summary['priority_level']],
+            key=lambda level: PRIORITY_ORDER.get(level, 0)
+        )
+
+    return {
+        'quickSummary': quick_summary,
+        'events': {'total': len(events), 'upcoming': upcoming},
+        'emails': {'total': len(emails), 'important': important},
+        'actionItems': action_items
+    }
+
+def _merge_entries(previous_entries, new_entries, removed_ids, order):
+    entries = {entry.get('id'): entry for entry in previous_entries if entry.get('id') not in removed_ids}
+    entries.update((entry.get('id'), entry) for entry in new_entries)
+    position = {item_id: index for index, item_id in enumerate(order)}
+    return sorted(
+        (entry for entry_id, entry in entries.items() if entry_id in position),
+        key=lambda entry: position[entry.get('id')]
+    )
@@ -1,143 +1,318 @@
-import os
+import io
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
 from gtts import gTTS
-from tempfile import NamedTemporaryFile
 import json
+from config.settings import (
+    AUDIO_SCRIPT_MODES,
+    AUDIO_SCRIPT_MODE,
+    AUDIO_SCRIPT_BUDGET_MS,
+    TTS_CHUNK_MAX_CHARS,
+    TTS_CHUNK_CONCURRENCY
+)
+from utils.async_runner import AsyncRunner
 from utils.logger import summary_logger, log_error
+from services.audio_cache import AudioCache
 from services.gemini_service import GeminiService
 
+TTS_LANGUAGE = 'en'
+
+PRIORITY_RANK = {'HIGH': 3, 'MEDIUM': 2, 'LOW': 1}
+
+# Whitespace after sentence-ending punctuation
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+# Words whose trailing period does not end a sentence
+ABBREVIATIONS = {'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'vs', 'etc', 'e.g', 'i.e', 'inc', 'ltd', 'approx', 'dept'}
+
 class TTSService:
+    """Renders audio summaries with gTTS.
+
+    The script is split into sentence-sized chunks that are synthesized
+    concurrently on a shared pool and concatenated in order (MP3 frames can be
+    joined as-is). Each chunk is cached by its text, so sentences that recur
+    across summaries are synthesized once.
+
+    The script comes from Gemini or from a template over the structured
+    summary, depending on the mode: 'llm' always waits for Gemini, 'template'
+    never calls it, and 'auto' gives Gemini AUDIO_SCRIPT_BUDGET_MS on the
+    request path before using the template. The mode is part of the cache key.
+    """
+    _pool = None
+    _pool_lock = threading.Lock()
+
+    @classmethod
+    def synthesis_pool(cls):
+        with cls._pool_lock:
+            if cls._pool is None:
+                cls._pool = ThreadPoolExecutor(max_workers=TTS_CHUNK_CONCURRENCY, thread_name_prefix='tts-chunk')
+            return cls._pool
+
     def __init__(self):
-        self.gemini_service = GeminiService()
-        
-    def generate_audio_summary(self, summary_json):
-        """Generate an audio summary from the summary JSON data"""
+        self._gemini_service = None
+        self.audio_cache = AudioCache.get_instance()
+        self.chunk_cache = AudioCache.get_chunk_instance()
+
+    @property
+    def gemini_service(self):
+        # Created on first use so cached audio never initializes Gemini
+        if self._gemini_service is None:
+            self._gemini_service = GeminiService()
+        return self._gemini_service
+
+    def get_audio(self, summary_json, mode=None):
+        """Return (path, key) of the MP3 for a summary, rendering it only if it isn't cached.
+
+        Used off the request path, so Gemini is never cut short by the budget.
+        """
+        summary_data = json.loads(summary_json) if isinstance(summary_json, str) else summary_json
+        mode = script_mode(mode)
+        key = self.audio_cache.key(summary_data, variant=mode)
+        path = self.audio_cache.get(key)
+        if path:
+            summary_logger.info("Serving cached audio summary")
+            return path, key
+
+        buffer = self.audio_cache.buffer()
         try:
-            summary_logger.info("Generating audio summary")
-            
-            # Parse the summary JSON
-            if isinstance(summary_json, str):
-                summary_data = json.loads(summary_json)
-            else:
-                summary_data = summary_json
-                
-            # Generate a concise script for the audio summary
-            script = self._generate_summary_script(summary_data)
-            
-            # Create audio file using gTTS
-            tts = gTTS(text=script, lang='en', slow=False)
-            
-            # Create a temporary file with .mp3 extension
-            temp_file = NamedTemporaryFile(suffix='.mp3', delete=False)
+            script, _ = self._generate_summary_script(summary_data, mode)
+            self._render(script, buffer)
+        except Exception:
+            buffer.discard()
+            raise
+        return buffer.commit(key), key
+
+    def get_cached_audio(self, summary_json, mode=None):
+        """Return (audio, key) for a summary: audio is a BytesIO or path for send_file, or None on a miss"""
+        summary_data = json.loads(summary_json) if isinstance(summary_json, str) else summary_json
+        key = self.audio_cache.key(summary_data, variant=script_mode(mode))
+        return self.audio_cache.open(key), key
+
+    def stream_audio(self, summary_json, mode=None):
+        """Return (chunks, key): a generator of MP3 bytes that yields each chunk as soon as it is ready.
+
+        The full MP3 is stored in the cache once the generator is exhausted,
+        and discarded if the client disconnects first. In auto mode a template
+        script used because Gemini missed the budget is not cached, so a later
+        play picks up Gemini's script once it has arrived.
+        """
+        summary_data = json.loads(summary_json) if isinstance(summary_json, str) else summary_json
+        mode = script_mode(mode)
+        key = self.audio_cache.key(summary_data, variant=mode)
+
+        def generate():
+            summary_logger.info(f"Streaming audio summary ({mode} script)")
+            buffer = self.audio_cache.buffer()
+            complete = False
             try:
-                tts.save(temp_file.name)
-                summary_logger.info("Audio summary generated successfully")
-                return temp_file.name
+                script, final = self._generate_summary_script(summary_data, mode, AUDIO_SCRIPT_BUDGET_MS / 1000)
+                for data in self.synthesize(script):
+                    buffer.write(data)
+                    yield data
+                complete = final
             except Exception as e:
-                if os.path.exists(temp_file.name):
-                    os.unlink(temp_file.name)
-                raise e
+                log_error(summary_logger, e, "Failed to stream audio summary")
+                raise
+            finally:
+                if complete:
+                    buffer.commit(key)
+                else:
+                    buffer.discard()
+
+        return generate(), key
+
+    def synthesize(self, script):
+        """Yield the MP3 bytes of each chunk of script in order, synthesizing chunks concurrently"""
+        pool = self.synthesis_pool()
+        futures = [pool.submit(self._synthesize_chunk, chunk) for chunk in split_script(script)]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            # Drop chunks nobody will read when the consumer stops early
+            for future in futures:
+                future.cancel()
+
+    def _synthesize_chunk(self, text):
+        key = self.chunk_cache.key(text, variant=TTS_LANGUAGE)
+        data = self.chunk_cache.read(key)
+        if data is not None:
+            return data
+
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=TTS_LANGUAGE, slow=False).write_to_fp(buffer)
+        data = buffer.getvalue()
+        self.chunk_cache.put_bytes(key, data)
+        return data
+
+    def _render(self, script, out):
+        """Write the MP3 for a script to the file-like out"""
+        try:
+            summary_logger.info("Generating audio summary")
+            for data in self.synthesize(script):
+                out.write(data)
+            summary_logger.info("Audio summary generated successfully")
                 
         except Exception as e:
             log_error(summary_logger, e, "Failed to generate audio summary")
             raise
             
-    def _generate_summary_script(self, summary_data):
-        """Generate a natural-sounding script for the audio summary"""
-        try:
-            # Use Gemini to generate a more natural-sounding script
-            prompt = f"""Based on this summary data, create a brief, natural-sounding audio script. 
+    def _generate_summary_script(self, summary_data, mode, budget=None):
+        """Return (script, final) for the audio summary.
+
+        In auto mode Gemini gets `budget` seconds; final is False when the
+        template stood in only because that ran out. The Gemini call keeps
+        running and caches its script for the next render.
+        """
+        if mode == 'template':
+            return self._generate_template_script(summary_data), True
+
+        # Use Gemini to generate a more natural-sounding script
+        prompt = f"""Based on this summary data, create a brief, natural-sounding audio script. 
             Make it conversational but professional, and focus on the most important points.
             Include quick overview, priority items, upcoming events, and important emails.
             Keep it under 45 seconds when spoken. Only include what you will say in the audio, do not include any other text.
             Data: {json.dumps(summary_data)}"""
-            
-            response = self.gemini_service.model.generate_content(prompt)
-            if response and response.text:
-                return response.text.strip()
-                
-            # Fallback to basic script generation if Gemini fails
-            return self._generate_basic_script(summary_data)
-            
+        timeout = budget if mode == 'auto' else None
+        try:
+            script = AsyncRunner.get_instance().run(self.gemini_service.generate_text_async(prompt), timeout)
+            if script:
+                return script, True
+        except TimeoutError:
+            summary_logger.info(f"Gemini script missed the {timeout:.1f}s budget, using the template")
+            return self._generate_template_script(summary_data), False
         except Exception as e:
             summary_logger.warning(f"Failed to generate Gemini script: {str(e)}")
-            return self._generate_basic_script(summary_data)
-            
-    def _generate_basic_script(self, summary_data):
-        """Generate a basic script without using Gemini"""
+
+        # Fallback to the template if Gemini fails
+        return self._generate_template_script(summary_data), True
+
+    def _generate_template_script(self, summary_data):
+        """Generate a script from the structured summary without calling Gemini"""
         script_parts = []
-        
-        # Extract high priority items
         self._add_quick_summary(script_parts, summary_data)
+        self._add_counts(script_parts, summary_data)
+        self._add_pending_invites(script_parts, summary_data)
         self._add_priority_events(script_parts, summary_data)
         self._add_important_emails(script_parts, summary_data)
         self._add_urgent_actions(script_parts, summary_data)
-                    
-        return ". ".join(script_parts)
+        return " ".join(script_parts)
         
     def _add_quick_summary(self, script_parts, summary_data):
         """Add quick summary to script parts"""
-        if 'quickSummary' in summary_data:
-            overview = summary_data['quickSummary'].get('overview', '')
-            if overview:
-                script_parts.append(overview)
-                
+        quick_summary = summary_data.get('quickSummary') or {}
+        if quick_summary.get('priority_level') == 'HIGH':
+            script_parts.append("Here is your summary. Some items need your attention today.")
+        else:
+            script_parts.append("Here is your summary.")
+        overview = quick_summary.get('overview', '')
+        if overview:
+            script_parts.append(_sentence(overview))
+
+    def _add_counts(self, script_parts, summary_data):
+        """Add event and email counts to script parts"""
+        events = self._events(summary_data)
+        emails = self._emails(summary_data)
+        needing_reply = sum(1 for email in emails if email.get('actionRequired'))
+        text = f"You have {_count(len(events), 'upcoming event')} and {_count(len(emails), 'important email')}"
+        if needing_reply:
+            text += f", {needing_reply} of which need{'s' if needing_reply == 1 else ''} a reply"
+        script_parts.append(text + ".")
+
+    def _add_pending_invites(self, script_parts, summary_data):
+        """Add calendar invitations awaiting a response to script parts"""
+        invites = [event for event in self._events(summary_data) if event.get('needsResponse')]
+        if invites:
+            titles = ", ".join(event.get('title', 'Untitled event') for event in invites[:3])
+            script_parts.append(f"{_count(len(invites), 'calendar invitation')} still need{'s' if len(invites) == 1 else ''} your response: {titles}.")
+
     def _add_priority_events(self, script_parts, summary_data):
-        """Add high priority events to script parts"""
-        if not self._has_events(summary_data):
-            return
-            
-        high_priority_events = [
-            event for event in summary_data['events']['upcoming']
-            if event.get('priority') == 'HIGH'
-        ][:2]  # Limit to 2 events
-        
-        if high_priority_events:
-            script_parts.append("High priority events")
-            for event in high_priority_events:
-                script_parts.append(f"{event['title']} at {event['time']}")
-                
+        """Add the most important upcoming events to script parts"""
+        events = sorted(self._events(summary_data), key=lambda event: -PRIORITY_RANK.get(event.get('priority'), 0))[:3]
+        events = [event for event in events if event.get('priority') in ('HIGH', 'MEDIUM')]
+        for event in events:
+            script_parts.append(
+                f"{event.get('title', 'Untitled event')}, {event.get('time', 'time not set')}, "
+                f"{event['priority'].lower()} priority."
+            )
+
     def _add_important_emails(self, script_parts, summary_data):
         """Add important emails to script parts"""
-        if not self._has_emails(summary_data):
-            return
-            
         urgent_emails = [
-            email for email in summary_data['emails']['important']
+            email for email in self._emails(summary_data)
             if email.get('priority') == 'HIGH' or email.get('actionRequired')
-        ][:2]  # Limit to 2 emails
-        
-        if urgent_emails:
-            script_parts.append("Important emails requiring attention")
-            for email in urgent_emails:
-                script_parts.append(f"From {email['from']}, subject: {email['subject']}")
-                
+        ][:3]
+        for email in urgent_emails:
+            text = f"Email from {_speakable_sender(email.get('from', 'an unknown sender'))} about {email.get('subject', 'no subject')}"
+            if email.get('actionRequired'):
+                text += ", which needs a reply"
+            script_parts.append(text + ".")
+
     def _add_urgent_actions(self, script_parts, summary_data):
         """Add urgent action items to script parts"""
-        if 'actionItems' not in summary_data:
-            return
-            
         urgent_actions = [
-            item for item in summary_data['actionItems']
+            item for item in summary_data.get('actionItems') or []
             if item.get('priority') == 'HIGH'
-        ][:2]  # Limit to 2 items
-        
+        ][:3]
         if urgent_actions:
-            script_parts.append("Urgent action items")
+            script_parts.append(f"{_count(len(urgent_actions), 'urgent action item')}.")
             for item in urgent_actions:
-                script_parts.append(item['task'])
-                
-    def _has_events(self, summary_data):
-        """Check if summary data has valid events"""
-        return (
-            'events' in summary_data and 
-            'upcoming' in summary_data['events'] and 
-            isinstance(summary_data['events']['upcoming'], list)
-        )
-        
-    def _has_emails(self, summary_data):
-        """Check if summary data has valid emails"""
-        return (
-            'emails' in summary_data and 
-            'important' in summary_data['emails'] and 
-            isinstance(summary_data['emails']['important'], list)
-        )
\ No newline at end of file
+                deadline = f", due {item['deadline']}" if item.get('deadline') else ""
+                script_parts.append(_sentence(f"{item.get('task', '')}{deadline}"))
+
+    def _events(self, summary_data):
+        upcoming = (summary_data.get('events') or {}).get('upcoming')
+        return [event for event in upcoming if isinstance(event, dict)] if isinstance(upcoming, list) else []
+
+    def _emails(self, summary_data):
+        important = (summary_data.get('emails') or {}).get('important')
+        return [email for email in important if isinstance(email, dict)] if isinstance(important, list) else []
+
+def script_mode(mode=None):
+    """The audio script mode to use: mode if it is valid, else AUDIO_SCRIPT_MODE"""
+    return mode if mode in AUDIO_SCRIPT_MODES else AUDIO_SCRIPT_MODE
+
+def split_script(script, max_chars=TTS_CHUNK_MAX_CHARS):
+    """Split a script into sentences, breaking any longer than max_chars at a comma or space"""
+    chunks = []
+    for sentence in _sentences(script):
+        sentence = ' '.join(sentence.split())
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(', ', 0, max_chars) + 1 or sentence.rfind(' ', 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            chunks.append(sentence)
+    return chunks
+
+def _sentences(script):
+    """Split at sentence ends, keeping "Mr. Smith" or "J. Smith" in one sentence"""
+    sentences = []
+    for piece in SENTENCE_BREAK.split(script.strip()):
+        if sentences and _ends_with_abbreviation(sentences[-1]):
+            sentences[-1] += ' ' + piece
+        else:
+            sentences.append(piece)
+    return sentences
+
+def _ends_with_abbreviation(text):
+    if not text.endswith('.'):
+        return False
+    word = text.split()[-1].rstrip('.').lower()
+    return word in ABBREVIATIONS or (len(word) == 1 and word.isalpha())
+
+def _count(n, noun):
+    if n == 0:
+        return f"no {noun}s"
+    return f"{n} {noun}{'s' if n != 1 else ''}"
+
+def _sentence(text):
+    text = text.strip()
+    return text if not text or text[-1] in '.!?' else text + '.'
+
+def _speakable_sender(sender):
+    """Display name from "Name <address>", or the address itself"""
+    name = sender.split('<')[0].strip().strip('"')
+    return name or sender.strip('<> ')
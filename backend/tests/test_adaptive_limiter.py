@@ -0,0 +1,51 @@
+import asyncio
+from utils.adaptive_limiter import AdaptiveLimiter
+
+
+def test_limiter_halves_once_per_rejection_burst():
+    limiter = AdaptiveLimiter(8, minimum=1, maximum=16)
+    tickets = [limiter.try_acquire() for _ in range(8)]
+
+    cuts = [limiter.release(ticket, overloaded=True) for ticket in tickets]
+
+    assert cuts == [True] + [False] * 7
+    assert limiter.limit == 4
+    assert limiter.in_flight == 0
+
+
+def test_limiter_cuts_again_for_calls_started_after_a_cut():
+    limiter = AdaptiveLimiter(8, minimum=1, maximum=16)
+    limiter.release(limiter.try_acquire(), overloaded=True)
+
+    assert limiter.release(limiter.try_acquire(), overloaded=True)
+    assert limiter.limit == 2
+
+
+def test_limiter_grows_additively_up_to_maximum():
+    limiter = AdaptiveLimiter(4, minimum=1, maximum=5)
+    for _ in range(4):
+        limiter.release(limiter.try_acquire())
+
+    # About one more slot per limit's worth of successes
+    assert 4.9 < limiter.limit < 5
+    for _ in range(10):
+        limiter.release(limiter.try_acquire())
+    assert limiter.limit == 5
+
+
+def test_limiter_never_drops_below_minimum():
+    limiter = AdaptiveLimiter(2, minimum=2, maximum=8)
+
+    assert not limiter.release(limiter.try_acquire(), overloaded=True)
+    assert limiter.limit == 2
+
+
+def test_acquire_times_out_when_all_slots_are_taken():
+    limiter = AdaptiveLimiter(1)
+    ticket = limiter.try_acquire()
+
+    assert limiter.try_acquire() is None
+    assert limiter.acquire(timeout=0.01) is None
+    assert asyncio.run(limiter.acquire_async(timeout=0.01)) is None
+    limiter.release(ticket)
+    assert limiter.try_acquire() is not None
@@ -0,0 +1,45 @@
+import asyncio
+import httpx
+import pytest
+from services import async_google_client as client_module
+from services.async_google_client import AsyncGoogleClient
+from utils.metrics import metrics
+
+CREDENTIALS = {'token': 'token', 'client_id': 'client', 'refresh_token': 'refresh'}
+
+
+def _client(monkeypatch, handler):
+    http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(AsyncGoogleClient, '_http', classmethod(lambda cls: http))
+    client = AsyncGoogleClient(CREDENTIALS, 'u1')
+    monkeypatch.setattr(client.executor, 'backoff_delay', lambda retry_after, attempt: 0)
+    return client
+
+
+def test_transport_errors_are_retried(monkeypatch):
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        if len(attempts) < 3:
+            raise httpx.ConnectTimeout('timed out', request=request)
+        return httpx.Response(200, json={'ok': True})
+
+    client = _client(monkeypatch, handler)
+    retried = metrics.snapshot()['counters'].get('google_api.gmail.retried', 0)
+
+    assert asyncio.run(client.request('gmail', 'https://example.com/messages')) == {'ok': True}
+    assert len(attempts) == 3
+    assert metrics.snapshot()['counters']['google_api.gmail.retried'] == retried + 2
+
+
+def test_transport_errors_raise_after_max_retries(monkeypatch):
+    monkeypatch.setattr(client_module, 'GOOGLE_API_MAX_RETRIES', 1)
+
+    def handler(request):
+        raise httpx.ConnectError('refused', request=request)
+
+    client = _client(monkeypatch, handler)
+
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(client.request('gmail', 'https://example.com/messages'))
@@ -0,0 +1,41 @@
+import os
+from services.audio_cache import AudioCache
+
+
+def _cache(tmp_path, scans):
+    cache = AudioCache(str(tmp_path), max_bytes=100, name='test_audio_cache', memory_bytes=0)
+    evict = cache._evict
+
+    def counting_evict():
+        scans.append(1)
+        evict()
+
+    cache._evict = counting_evict
+    return cache
+
+
+def test_put_only_scans_when_the_running_total_passes_the_limit(tmp_path):
+    scans = []
+    cache = _cache(tmp_path, scans)
+    for index in range(3):
+        path = cache.put_bytes(f'k{index}', b'x' * 30)
+        os.utime(path, (index, index))
+
+    assert len(scans) == 1  # The first put learns the directory size
+
+    cache.put_bytes('k3', b'x' * 30)
+
+    assert len(scans) == 2
+    assert cache.get('k0') is None
+    assert all(cache.get(f'k{index}') for index in (1, 2, 3))
+    assert cache._disk_total == 90
+
+
+def test_replacing_a_file_counts_only_the_size_difference(tmp_path):
+    scans = []
+    cache = _cache(tmp_path, scans)
+    cache.put_bytes('k', b'x' * 60)
+    cache.put_bytes('k', b'x' * 70)
+
+    assert len(scans) == 1
+    assert cache._disk_total == 70
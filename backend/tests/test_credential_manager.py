@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from google.auth.exceptions import RefreshError
+from services import credential_manager as credential_module
+from services.credential_manager import CredentialManager
+
+
+def _credentials(expires_in):
+    return {
+        'token': 'old-token',
+        'refresh_token': 'refresh',
+        'token_uri': 'https://oauth2.googleapis.com/token',
+        'client_id': 'client',
+        'client_secret': 'secret',
+        'scopes': [],
+        'expiry': datetime.now(timezone.utc) + expires_in
+    }
+
+
+class FakeUser:
+    """Stores credentials in memory the way User stores them in MongoDB"""
+    stored = {}
+
+    def __init__(self, user_id, email=None, name=''):
+        self.user_id = user_id
+        self.credentials = None
+        self.removed = False
+
+    def get_credentials(self):
+        return self.stored.get(self.user_id)
+
+    def update_credentials(self, credentials):
+        self.stored[self.user_id] = credentials
+
+    def remove_credentials(self):
+        self.removed = True
+        self.stored.pop(self.user_id, None)
+
+
+class FakeUsers:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection):
+        return list(self.docs)
+
+
+class FakeDatabase:
+    def __init__(self, docs):
+        self.users = FakeUsers(docs)
+
+    def is_connected(self):
+        return True
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    FakeUser.stored = {}
+    monkeypatch.setattr(credential_module, 'User', FakeUser)
+    return CredentialManager()
+
+
+def test_get_credentials_refreshes_expiring_token(manager, monkeypatch):
+    user = FakeUser('u1')
+    FakeUser.stored['u1'] = user.credentials = _credentials(timedelta(seconds=10))
+    monkeypatch.setattr(manager, '_refresh_token', lambda creds: dict(creds, token='new-token'))
+
+    assert manager.get_credentials(user)['token'] == 'new-token'
+    assert FakeUser.stored['u1']['token'] == 'new-token'
+    assert user.credentials['token'] == 'new-token'
+
+
+def test_transient_refresh_failure_keeps_current_token(manager, monkeypatch):
+    user = FakeUser('u1')
+    FakeUser.stored['u1'] = user.credentials = _credentials(timedelta(seconds=10))
+
+    def fail(creds):
+        raise RefreshError('temporarily unavailable', retryable=True)
+
+    monkeypatch.setattr(manager, '_refresh_token', fail)
+
+    assert manager.get_credentials(user)['token'] == 'old-token'
+    assert not user.removed
+
+
+def test_revoked_refresh_token_clears_credentials(manager, monkeypatch):
+    user = FakeUser('u1')
+    FakeUser.stored['u1'] = user.credentials = _credentials(timedelta(seconds=10))
+
+    def fail(creds):
+        raise RefreshError('invalid_grant')
+
+    monkeypatch.setattr(manager, '_refresh_token', fail)
+
+    assert manager.get_credentials(user) is None
+    assert user.removed
+    assert 'u1' not in FakeUser.stored
+
+
+def test_refresh_due_credentials_counts_failures(manager, monkeypatch):
+    FakeUser.stored = {
+        'ok': _credentials(timedelta(seconds=10)),
+        'revoked': _credentials(timedelta(seconds=10))
+    }
+    docs = [{'user_id': 'ok'}, {'user_id': 'revoked'}]
+    monkeypatch.setattr(credential_module.Database, 'get_instance', staticmethod(lambda: FakeDatabase(docs)))
+
+    def refresh_token(creds):
+        if creds is FakeUser.stored.get('revoked'):
+            raise RefreshError('invalid_grant')
+        return dict(creds, token='new-token')
+
+    monkeypatch.setattr(manager, '_refresh_token', refresh_token)
+
+    assert manager.refresh_due_credentials(timedelta(minutes=5)) == {'refreshed': 1, 'failed': 1}
+    assert 'revoked' not in FakeUser.stored
+
+
+def test_refresh_rejected_refreshes_and_stores_token(manager, monkeypatch):
+    FakeUser.stored['u1'] = _credentials(timedelta(minutes=30))
+    monkeypatch.setattr(manager, '_refresh_token', lambda creds: dict(creds, token='new-token'))
+
+    assert manager.refresh_rejected('u1', 'old-token')['token'] == 'new-token'
+    assert FakeUser.stored['u1']['token'] == 'new-token'
+
+
+def test_refresh_rejected_reuses_token_stored_by_another_caller(manager, monkeypatch):
+    FakeUser.stored['u1'] = dict(_credentials(timedelta(minutes=30)), token='newer-token')
+
+    def fail(creds):
+        raise AssertionError('should not refresh again')
+
+    monkeypatch.setattr(manager, '_refresh_token', fail)
+
+    assert manager.refresh_rejected('u1', 'old-token')['token'] == 'newer-token'
+
+
+def test_refresh_rejected_returns_none_when_revoked(manager, monkeypatch):
+    FakeUser.stored['u1'] = _credentials(timedelta(minutes=30))
+
+    def fail(creds):
+        raise RefreshError('invalid_grant')
+
+    monkeypatch.setattr(manager, '_refresh_token', fail)
+
+    assert manager.refresh_rejected('u1', 'old-token') is None
+    assert 'u1' not in FakeUser.stored
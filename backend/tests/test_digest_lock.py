@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from services import scheduler_service as scheduler_module
+from services.scheduler_service import SchedulerService
+
+
+class FakeCoordinator:
+    """Named leases in memory, with a script of who holds the digest lock"""
+
+    def __init__(self, holder=None, held_polls=1):
+        self.holder = holder
+        self.held_polls = held_polls
+        self.released = []
+        self.acquired = []
+        self._owners = 0
+
+    def lock_owner(self):
+        self._owners += 1
+        return f"node:{self._owners}"
+
+    def acquire_lease(self, name, ttl=None, owner=None):
+        if self.holder not in (None, owner):
+            return False
+        self.holder = owner
+        self.acquired.append(owner)
+        return True
+
+    def lease_held(self, name):
+        if self.held_polls > 0:
+            self.held_polls -= 1
+            return True
+        self.holder = None
+        return False
+
+    def release_lease(self, name, owner=None):
+        self.released.append(owner)
+        if self.holder == owner:
+            self.holder = None
+
+
+class FakeSummary:
+    def __init__(self, generated_at):
+        self.summary = {'quickSummary': 'done'}
+        self.generated_at = generated_at
+        self.degraded = False
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    monkeypatch.setattr(scheduler_module, 'DIGEST_LOCK_POLL_SECONDS', 0)
+    return SchedulerService.__new__(SchedulerService)
+
+
+def _latest(monkeypatch, summary):
+    monkeypatch.setattr(scheduler_module.Summary, 'get_latest_summary', staticmethod(lambda user_id, window=None: summary))
+
+
+def test_returns_summary_saved_by_lock_holder(scheduler, monkeypatch):
+    scheduler.coordinator = FakeCoordinator(holder='other')
+    _latest(monkeypatch, FakeSummary(datetime.now(timezone.utc) + timedelta(seconds=1)))
+
+    owner, latest = asyncio.run(scheduler._acquire_digest_lock('u1', '24h/5'))
+
+    assert owner is None
+    assert latest['coalesced'] is True
+    assert scheduler.coordinator.acquired == []
+
+
+def test_takes_lock_when_holder_saved_nothing_new(scheduler, monkeypatch):
+    scheduler.coordinator = FakeCoordinator(holder='other')
+    # The newest summary predates the wait, so it is not the holder's result
+    _latest(monkeypatch, FakeSummary(datetime.now(timezone.utc) - timedelta(seconds=5)))
+
+    owner, latest = asyncio.run(scheduler._acquire_digest_lock('u1', '24h/5'))
+
+    assert latest is None
+    assert owner == scheduler.coordinator.holder
+
+
+def test_release_only_frees_own_lock(scheduler):
+    scheduler.coordinator = FakeCoordinator(holder='other')
+
+    scheduler._release_digest_lock('u1', '24h/5', 'node:1')
+
+    assert scheduler.coordinator.holder == 'other'
+
+
+def test_keeps_renewing_until_the_lock_is_lost(scheduler, monkeypatch):
+    monkeypatch.setattr(scheduler_module, 'DIGEST_LOCK_TTL_SECONDS', 0)
+    scheduler.coordinator = FakeCoordinator(holder='node:1')
+    renewals = []
+    acquire = scheduler.coordinator.acquire_lease
+
+    def renew(name, ttl=None, owner=None):
+        renewals.append(name)
+        if len(renewals) == 3:
+            # Another worker took over after the lease lapsed
+            scheduler.coordinator.holder = 'other'
+        return acquire(name, ttl, owner)
+
+    scheduler.coordinator.acquire_lease = renew
+
+    asyncio.run(scheduler._keep_digest_lock('u1', '24h/5', 'node:1'))
+
+    assert renewals == ['digest:u1:24h/5'] * 3
@@ -0,0 +1,31 @@
+from datetime import datetime, timezone
+from services.scheduler_service import digest_fingerprint, digest_window, _incremental_base
+
+EVENTS = [{'id': 'e1', 'etag': 'v1', 'updated': '2026-03-01T00:00:00Z'}]
+EMAILS = [{'id': 'm1', 'historyId': '42'}]
+
+
+def test_fingerprint_is_stable_for_the_same_inputs_and_window():
+    window = digest_window(48, 10)
+
+    assert digest_fingerprint(EVENTS, EMAILS, window) == digest_fingerprint(list(EVENTS), list(EMAILS), window)
+
+
+def test_fingerprint_differs_between_windows():
+    assert digest_fingerprint(EVENTS, EMAILS, digest_window(24, 5)) != digest_fingerprint(EVENTS, EMAILS, digest_window(48, 10))
+
+
+class PreviousSummary:
+    def __init__(self, window):
+        self.summary = {'quickSummary': {}, 'events': {}, 'emails': {}, 'actionItems': []}
+        self.sources = {'events': [], 'emails': []}
+        self.window = window
+        self.full_generated_at = datetime.now(timezone.utc)
+
+
+def test_incremental_base_requires_the_same_window():
+    previous = PreviousSummary(digest_window(48, 10))
+
+    assert _incremental_base(previous, digest_window(48, 10)) is previous.summary
+    assert _incremental_base(previous, digest_window(24, 5)) is None
+    assert _incremental_base(PreviousSummary(None), digest_window(24, 5)) is None
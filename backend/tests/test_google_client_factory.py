@@ -0,0 +1,57 @@
+import threading
+from datetime import datetime, timedelta
+import httplib2
+import pytest
+from services.google_client_factory import GoogleClientFactory
+
+
+def _credentials():
+    return {
+        'token': 'token',
+        'refresh_token': 'refresh',
+        'token_uri': 'https://oauth2.googleapis.com/token',
+        'client_id': 'client',
+        'client_secret': 'secret',
+        'scopes': [],
+        'expiry': datetime.utcnow() + timedelta(hours=1)
+    }
+
+
+@pytest.fixture
+def factory():
+    return GoogleClientFactory()
+
+
+def _in_thread(func):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_service_is_shared_across_threads_with_a_transport_per_thread(factory):
+    credentials = _credentials()
+    service = factory.get_service('gmail', 'v1', credentials)
+    transport = service._http
+
+    assert _in_thread(lambda: factory.get_service('gmail', 'v1', credentials)) is service
+    assert transport.http is transport.http
+    assert _in_thread(lambda: transport.http) is not transport.http
+
+
+def test_requests_go_through_the_calling_threads_transport(factory, monkeypatch):
+    used = []
+
+    def fake_request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        used.append(self)
+        return httplib2.Response({'status': '200'}), b'{"emailAddress": "me@example.com"}'
+
+    monkeypatch.setattr(httplib2.Http, 'request', fake_request)
+    service = factory.get_service('gmail', 'v1', _credentials())
+
+    profile = _in_thread(lambda: service.users().getProfile(userId='me').execute())
+    service.users().getProfile(userId='me').execute()
+
+    assert profile == {'emailAddress': 'me@example.com'}
+    assert len(used) == 2 and used[0] is not used[1]
@@ -0,0 +1,28 @@
+from utils.hash_ring import HashRing
+
+USERS = [f"user-{index}" for index in range(1000)]
+
+
+def test_ring_assignment_stays_stable_when_a_node_is_removed():
+    before = HashRing(['node-a', 'node-b', 'node-c'])
+    after = HashRing(['node-a', 'node-c'])
+
+    for user_id in USERS:
+        if before.get_node(user_id) != 'node-b':
+            assert after.get_node(user_id) == before.get_node(user_id)
+
+
+def test_ring_spreads_keys_across_nodes():
+    ring = HashRing(['node-b', 'node-a', 'node-c', 'node-a'])
+    counts = {}
+    for user_id in USERS:
+        node = ring.get_node(user_id)
+        counts[node] = counts.get(node, 0) + 1
+
+    assert ring.nodes == ['node-a', 'node-b', 'node-c']
+    assert set(counts) == set(ring.nodes)
+    assert min(counts.values()) > len(USERS) / 6
+
+
+def test_empty_ring_has_no_owner():
+    assert HashRing([]).get_node('user-1') is None
@@ -0,0 +1,26 @@
+import json
+from utils.json_stream import JsonSectionParser
+
+
+def test_parser_emits_sections_as_they_complete():
+    parser = JsonSectionParser()
+
+    assert parser.feed('```json\n{"quickSummary": {"overview": "Busy"}, "ev') == [('quickSummary', {'overview': 'Busy'})]
+    assert parser.feed('ents": [1, 2]}\n```') == [('events', [1, 2])]
+    assert parser.finished
+
+
+def test_parser_handles_braces_inside_strings_split_across_chunks():
+    document = {
+        'quickSummary': {'overview': 'Use {braces}, [brackets] and "quotes" \\ here'},
+        'actionItems': [{'task': 'Reply: "done}"'}]
+    }
+    text = json.dumps(document)
+    parser = JsonSectionParser()
+
+    sections = []
+    for index in range(0, len(text), 3):
+        sections.extend(parser.feed(text[index:index + 3]))
+
+    assert sections == list(document.items())
+    assert parser.finished
@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+from services.local_summarizer import local_summary
+
+NOW = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)
+
+
+def _events():
+    return [
+        {'id': 'e2', 'summary': 'Team lunch', 'start': '2026-03-04T12:00:00Z', 'attendees': []},
+        {'id': 'e1', 'summary': 'Design review', 'start': '2026-03-02T10:00:00Z',
+         'attendees': [{'self': True, 'responseStatus': 'needsAction'}, {'email': 'a@example.com'}]}
+    ]
+
+
+def _emails():
+    return [
+        {'id': 'm1', 'subject': 'Weekly newsletter', 'from': 'News <newsletter@example.com>',
+         'from_email': 'newsletter@example.com', 'snippet': 'Please read our update', 'threadId': 't1'},
+        {'id': 'm2', 'subject': 'Urgent: contract', 'from': 'Ana <ana@example.com>',
+         'from_email': 'ana@example.com', 'snippet': 'Could you sign it by Friday?', 'threadId': 't2'}
+    ]
+
+
+def test_local_summary_orders_and_prioritizes_items():
+    summary = local_summary(_events(), _emails(), now=NOW)
+
+    assert [event['id'] for event in summary['events']['upcoming']] == ['e1', 'e2']
+    review, lunch = summary['events']['upcoming']
+    assert (review['priority'], review['needsResponse']) == ('HIGH', True)
+    assert (lunch['type'], lunch['priority']) == ('PERSONAL', 'LOW')
+
+    contract, newsletter = summary['emails']['important']
+    assert (contract['id'], contract['priority'], contract['actionRequired']) == ('m2', 'HIGH', True)
+    assert (newsletter['priority'], newsletter['actionRequired']) == ('LOW', False)
+    assert summary['quickSummary']['priority_level'] == 'HIGH'
+
+
+def test_local_summary_builds_action_items_with_refs_and_deadlines():
+    items = local_summary(_events(), _emails(), now=NOW)['actionItems']
+
+    assert [(item['refs'], item['deadline']) for item in items] == [
+        (['e1'], 'Mon Mar 02, 10:00 UTC'),
+        (['m2'], 'Friday')
+    ]
+    assert items[1]['task'] == 'Reply to Ana about "Urgent: contract"'
+
+
+def test_local_summary_is_deterministic():
+    assert local_summary(_events(), _emails(), now=NOW) == local_summary(_events(), _emails(), now=NOW)
@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+from services import gemini_service as gemini_module
+from services.gemini_service import GeminiService
+from services.prompt_builder import PromptBuilder, estimate_tokens, scaled_counter
+
+
+def test_builder_compresses_then_drops_lowest_priority_items():
+    builder = PromptBuilder('test', budget=7)
+    builder.add('items', 'a' * 16, priority=2)
+    builder.add('items', 'b' * 16, priority=1, compressed='b' * 8)
+    builder.add('items', 'c' * 16, priority=0)
+
+    assert builder.build() == {'items': ['a' * 16, 'b' * 8]}
+    assert builder.stats['items_compressed'] == 1
+    assert builder.stats['items_dropped'] == 1
+
+
+def test_scaled_counter_matches_the_exact_count_on_the_sample():
+    calls = []
+
+    def count(text):
+        calls.append(text)
+        return estimate_tokens(text) * 2
+
+    counter = scaled_counter(count, 'x' * 400)
+
+    assert counter('y' * 40) == 20
+    assert calls == ['x' * 400]
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = 0
+
+    def count_tokens(self, text):
+        self.calls += 1
+        return SimpleNamespace(total_tokens=estimate_tokens(text))
+
+
+def test_summary_prompt_counts_tokens_once_for_all_items(monkeypatch):
+    monkeypatch.setattr(gemini_module, 'PROMPT_TOKEN_COUNTER', 'count_tokens')
+    service = GeminiService.__new__(GeminiService)
+    service.model = FakeModel()
+    events = [{'id': f'e{index}', 'summary': f'Meeting {index}', 'start': '2026-03-02T10:00:00Z'} for index in range(5)]
+    emails = [{'id': f'm{index}', 'subject': f'Subject {index}', 'from': 'Ana', 'snippet': 'Hi'} for index in range(5)]
+
+    prompt = service._create_prompt(events, emails)
+
+    assert service.model.calls == 1
+    assert 'Meeting 4' in prompt and 'Subject 4' in prompt
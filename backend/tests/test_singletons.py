@@ -0,0 +1,36 @@
+import threading
+import time
+import pytest
+from services.google_api_executor import GoogleApiExecutor
+from services.gemini_limiter import GeminiLimiter
+from services.credential_manager import CredentialManager
+
+
+@pytest.mark.parametrize('cls', [GoogleApiExecutor, GeminiLimiter, CredentialManager])
+def test_get_instance_builds_one_instance_under_contention(cls, monkeypatch):
+    monkeypatch.setattr(cls, '_instance', None)
+    init = cls.__init__
+    built = []
+
+    def slow_init(self):
+        built.append(self)
+        # Widen the window in which an unlocked check-then-set would race
+        time.sleep(0.01)
+        init(self)
+
+    monkeypatch.setattr(cls, '__init__', slow_init)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(cls.get_instance())
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(built) == 1
+    assert all(result is built[0] for result in results)
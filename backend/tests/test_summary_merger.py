@@ -0,0 +1,54 @@
+from services.summary_merger import summary_sources, diff_sources, change_count, merge_summary
+
+
+def _previous():
+    return {
+        'quickSummary': {'overview': 'Old overview', 'priority_level': 'MEDIUM'},
+        'events': {'total': 2, 'upcoming': [{'id': 'e1', 'title': 'Standup'}, {'id': 'e2', 'title': 'Review'}]},
+        'emails': {'total': 1, 'important': [{'id': 'm1', 'subject': 'Budget'}]},
+        'actionItems': [
+            {'task': 'Prepare review', 'refs': ['e2']},
+            {'task': 'Answer budget mail', 'refs': ['m1', 'e2']},
+            {'task': 'General follow-up', 'refs': []}
+        ]
+    }
+
+
+def test_diff_counts_changed_event_as_removed_and_added():
+    previous = summary_sources([{'id': 'e1', 'etag': 'v1'}, {'id': 'e2', 'etag': 'v1'}], [{'id': 'm1'}])
+
+    changes = diff_sources(previous, [{'id': 'e1', 'etag': 'v2'}], [{'id': 'm1'}, {'id': 'm2'}])
+
+    assert changes == {
+        'added_events': {'e1'},
+        'removed_events': {'e1', 'e2'},
+        'added_emails': {'m2'},
+        'removed_emails': set()
+    }
+    assert change_count(changes) == 4
+
+
+def test_merge_drops_action_items_that_only_reference_removed_sources():
+    changes = {'added_events': set(), 'removed_events': {'e2'}, 'added_emails': set(), 'removed_emails': set()}
+
+    merged = merge_summary(_previous(), None, [{'id': 'e1'}], [{'id': 'm1'}], changes)
+
+    assert [item['task'] for item in merged['actionItems']] == ['Answer budget mail', 'General follow-up']
+    assert merged['events'] == {'total': 1, 'upcoming': [{'id': 'e1', 'title': 'Standup'}]}
+
+
+def test_merge_adds_delta_entries_in_source_order_and_keeps_highest_priority():
+    changes = {'added_events': {'e0'}, 'removed_events': set(), 'added_emails': set(), 'removed_emails': set()}
+    delta = {
+        'quickSummary': {'overview': 'New overview', 'priority_level': 'LOW'},
+        'events': [{'id': 'e0', 'title': 'Planning'}],
+        'actionItems': [{'task': 'Prepare review', 'refs': ['e0']}, {'task': 'Book room', 'refs': ['e0']}]
+    }
+    events = [{'id': 'e0'}, {'id': 'e1'}, {'id': 'e2'}]
+
+    merged = merge_summary(_previous(), delta, events, [{'id': 'm1'}], changes)
+
+    assert [entry['id'] for entry in merged['events']['upcoming']] == ['e0', 'e1', 'e2']
+    assert merged['quickSummary'] == {'overview': 'New overview', 'priority_level': 'MEDIUM'}
+    assert [item['task'] for item in merged['actionItems']].count('Prepare review') == 1
+    assert merged['actionItems'][-1]['task'] == 'Book room'
@@ -0,0 +1,15 @@
+from services.tts_service import split_script
+
+
+def test_split_script_keeps_abbreviations_in_their_sentence():
+    assert split_script("This is Mr. Smith! Dr. Lee joins, e.g. for the review. J. Doe is out.") == [
+        'This is Mr. Smith!',
+        'Dr. Lee joins, e.g. for the review.',
+        'J. Doe is out.'
+    ]
+
+
+def test_split_script_breaks_long_sentences_at_commas():
+    chunks = split_script("First part here, second part here, third part here.", max_chars=20)
+
+    assert chunks == ['First part here,', 'second part here,', 'third part here.']
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+
+# How often asyncio waiters check for a free slot
+ASYNC_POLL_SECONDS = 0.05
+
+class AdaptiveLimiter:
+    """Concurrency limit tuned by additive increase, multiplicative decrease.
+
+    Each successful call raises the limit by about one per limit's worth of
+    calls. An overloaded call (e.g. HTTP 429) multiplies it by decrease. Only
+    the first overload from calls started under the current limit cuts it,
+    so one burst of rejections halves the limit once instead of collapsing it
+    to the minimum. Blocking and asyncio callers share one limiter.
+    """
+
+    def __init__(self, initial, minimum=1, maximum=64, decrease=0.5):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.in_flight = 0
+        self._epoch = 0
+        self._condition = threading.Condition()
+
+    def try_acquire(self):
+        """Take a slot if one is free; returns a ticket for release, or None"""
+        with self._condition:
+            return self._take()
+
+    def acquire(self, timeout=None):
+        """Wait for a slot; returns a ticket, or None if timeout passed first"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                ticket = self._take()
+                if ticket is not None:
+                    return ticket
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+    async def acquire_async(self, timeout=None):
+        """Async version of acquire that waits without blocking the event loop"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            ticket = self.try_acquire()
+            if ticket is not None:
+                return ticket
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(ASYNC_POLL_SECONDS)
+
+    def release(self, ticket, overloaded=False):
+        """Free a slot and adjust the limit; returns True if this call cut the limit"""
+        with self._condition:
+            self.in_flight -= 1
+            cut = False
+            if overloaded:
+                cut = ticket == self._epoch and self._cut()
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+            return cut
+
+    def cut(self):
+        """Decrease the limit now, e.g. on an overload reported by another process"""
+        with self._condition:
+            return self._cut()
+
+    def _take(self):
+        if self.in_flight >= int(self.limit):
+            return None
+        self.in_flight += 1
+        return self._epoch
+
+    def _cut(self):
+        if self.limit <= self.minimum:
+            return False
+        self.limit = max(self.minimum, self.limit * self.decrease)
+        self._epoch += 1
+        return True
@@ -0,0 +1,43 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import ASYNC_BLOCKING_WORKERS
+
+class AsyncRunner:
+    """Runs coroutines on one long-lived event loop in a background thread.
+
+    Synchronous callers (Flask views, APScheduler jobs) submit coroutines with
+    run() and block for the result. Because every coroutine shares the same
+    loop, loop-bound resources such as the pooled HTTP client are reused
+    across calls. Blocking work sent to asyncio.to_thread runs on a pool sized
+    by ASYNC_BLOCKING_WORKERS.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(ThreadPoolExecutor(max_workers=ASYNC_BLOCKING_WORKERS, thread_name_prefix='async-blocking'))
+        self._thread = threading.Thread(target=self._run_loop, name='async-runner', daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the background loop and wait for its result"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        return future.result(timeout)
+
+    def submit(self, coro):
+        """Start a coroutine on the background loop without waiting; cancel() the returned future to stop it"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
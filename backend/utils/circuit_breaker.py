@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import deque
+from utils.logger import summary_logger
+from utils.metrics import metrics, percentile
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency while its circuit is open"""
+    pass
+
+class CircuitBreaker:
+    """Routes around a dependency that misses its latency or error-rate SLO.
+
+    Outcomes of the last `window` calls are kept. Once there are at least
+    min_calls, the breaker opens when the error rate exceeds max_error_rate or
+    the p95 latency exceeds max_p95_seconds. While open, allow() is False so
+    callers use their fallback. After open_seconds a single trial call is let
+    through: success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, name, max_p95_seconds, max_error_rate, window=20, min_calls=5, open_seconds=60):
+        self.name = name
+        self.max_p95_seconds = max_p95_seconds
+        self.max_error_rate = max_error_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def allow(self):
+        """Check whether a call may go to the dependency"""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record(self, seconds, ok):
+        """Record a call's latency and whether it succeeded"""
+        with self._lock:
+            if self._trial_running:
+                self._trial_running = False
+                if ok and seconds <= self.max_p95_seconds:
+                    self._close()
+                else:
+                    self._open("trial call failed")
+                return
+
+            self._outcomes.append((seconds, ok))
+            if self._opened_at is not None or len(self._outcomes) < self.min_calls:
+                return
+            error_rate = sum(not ok for _, ok in self._outcomes) / len(self._outcomes)
+            p95 = percentile([seconds for seconds, _ in self._outcomes], 95)
+            if error_rate > self.max_error_rate:
+                self._open(f"error rate {error_rate:.0%} over {self.max_error_rate:.0%}")
+            elif p95 > self.max_p95_seconds:
+                self._open(f"p95 latency {p95:.1f}s over {self.max_p95_seconds:.1f}s")
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.open_seconds:
+            return 'half_open'
+        return 'open'
+
+    def _open(self, reason):
+        self._opened_at = time.monotonic()
+        metrics.increment(f'circuit.{self.name}.opened')
+        metrics.set_gauge(f'circuit.{self.name}.open', 1)
+        summary_logger.warning(f"Circuit {self.name} opened: {reason}")
+
+    def _close(self):
+        self._opened_at = None
+        self._outcomes.clear()
+        metrics.set_gauge(f'circuit.{self.name}.open', 0)
+        summary_logger.info(f"Circuit {self.name} closed")
@@ -0,0 +1,28 @@
+import bisect
+import hashlib
+
+class HashRing:
+    """Consistent-hash ring mapping keys to nodes.
+
+    Each node is placed on the ring `replicas` times so keys spread evenly,
+    and adding or removing a node only moves the keys next to its points.
+    """
+
+    def __init__(self, nodes, replicas=100):
+        self.nodes = sorted(set(nodes))
+        self._ring = sorted(
+            (_hash(f"{node}#{replica}"), node)
+            for node in self.nodes
+            for replica in range(replicas)
+        )
+        self._points = [point for point, _ in self._ring]
+
+    def get_node(self, key):
+        """Get the node that owns key, or None when the ring is empty"""
+        if not self._ring:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+def _hash(value):
+    return int(hashlib.md5(value.encode('utf-8')).hexdigest()[:16], 16)
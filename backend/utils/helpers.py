@@ -1,5 +1,7 @@
 from datetime import datetime
 from typing import Dict, Any, Optional, Union
+import hashlib
+import json
 import re
 
 def format_timestamp(timestamp: str) -> str:
@@ -26,6 +28,11 @@ def validate_credentials(credentials: Dict[str, Any]) -> bool:
     required_fields = ['token', 'token_uri', 'client_id', 'client_secret', 'scopes']
     return all(field in credentials for field in required_fields)
 
+def credentials_fingerprint(credentials: Dict[str, Any]) -> str:
+    """Hash a credentials dict; the hash changes whenever the stored token does."""
+    payload = json.dumps(credentials, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
 def handle_api_error(error: Exception) -> Dict[str, str]:
     """Format API errors for consistent response."""
     error_type = type(error).__name__
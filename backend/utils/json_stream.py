@@ -0,0 +1,71 @@
+import json
+
+class JsonSectionParser:
+    """Incrementally parses a streamed JSON object into its top-level members.
+
+    feed() takes the next chunk of text and returns the (key, value) pairs
+    whose values were completed by it, in document order. Text before the
+    opening brace, such as a markdown code fence, is ignored.
+    """
+
+    def __init__(self):
+        self._buffer = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expecting = 'key'
+        self._key = None
+        self._key_start = None
+        self._value_start = None
+        self.finished = False
+
+    def feed(self, chunk):
+        """Add text and return the top-level members it completed"""
+        self._buffer += chunk
+        sections = []
+        while self._pos < len(self._buffer) and not self.finished:
+            index = self._pos
+            char = self._buffer[index]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expecting == 'key':
+                        self._key = json.loads(self._buffer[self._key_start:index + 1])
+                continue
+
+            if char == '"':
+                if self._depth > 0:
+                    self._in_string = True
+                    if self._depth == 1 and self._expecting == 'key':
+                        self._key_start = index
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]' and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(index, sections)
+                    self.finished = True
+            elif self._depth == 1:
+                if char == ':' and self._expecting == 'key':
+                    self._expecting = 'value'
+                    self._value_start = index + 1
+                elif char == ',' and self._expecting == 'value':
+                    self._emit(index, sections)
+        return sections
+
+    def _emit(self, end, sections):
+        if self._expecting == 'value' and self._key is not None:
+            try:
+                sections.append((self._key, json.loads(self._buffer[self._value_start:end])))
+            except ValueError:
+                pass
+        self._expecting = 'key'
+        self._key = None
+        self._value_start = None
@@ -0,0 +1,65 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+class Metrics:
+    """Thread-safe in-process counters, gauges and timers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._timers = {}
+
+    def increment(self, name, value=1):
+        """Add value to a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        """Record the latest value of a gauge"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name, seconds):
+        """Record one timing sample in seconds"""
+        with self._lock:
+            timer = self._timers.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0, 'last': 0.0})
+            timer['count'] += 1
+            timer['total'] += seconds
+            timer['max'] = max(timer['max'], seconds)
+            timer['last'] = seconds
+
+    @contextmanager
+    def timer(self, name):
+        """Time the wrapped block and record it under name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        """Get a copy of all metrics, with average timings"""
+        with self._lock:
+            timers = {
+                name: dict(timer, avg=timer['total'] / timer['count'] if timer['count'] else 0.0)
+                for name, timer in self._timers.items()
+            }
+            return {
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'timers': timers
+            }
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers, 0.0 when empty"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+# Shared registry for the whole process
+metrics = Metrics()
@@ -0,0 +1,28 @@
+import threading
+import time
+
+class TokenBucket:
+    """Thread-safe token bucket that hands out reservations.
+
+    reserve() always takes the tokens and returns how long the caller must
+    wait before using them, so both blocking and asyncio callers can share a
+    bucket and sleep in their own way.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        """Take tokens from the bucket and return the wait in seconds"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
@@ -0,0 +1,26 @@
+import asyncio
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key on one event loop.
+
+    The first caller for a key runs the work; callers that arrive while it is
+    in flight await the same result or exception instead of starting their
+    own.
+    """
+
+    def __init__(self):
+        self._flights = {}
+
+    async def do(self, key, func):
+        """Run func() for key unless a call for key is already in flight, and return its result"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(func())
+            self._flights[key] = flight
+            flight.add_done_callback(lambda _: self._flights.pop(key, None))
+        # Shield so one cancelled waiter doesn't cancel the work for the others
+        return await asyncio.shield(flight)
+
+    def in_flight(self, key):
+        """Check whether a call for key is running"""
+        return key in self._flights
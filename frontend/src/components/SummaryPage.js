@@ -89,6 +89,7 @@ function SummaryPage() {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [dbStatus, setDbStatus] = useState('available');
+  const [degraded, setDegraded] = useState(false);
   const [selectedEmail, setSelectedEmail] = useState(null);
   const [showSmartReplyModal, setShowSmartReplyModal] = useState(false);
   const navigate = useNavigate();
@@ -98,7 +99,10 @@ function SummaryPage() {
       setLoading(true);
       setError(null);
       const response = await summary.get(forceRefresh);
-      setSummaryData(JSON.parse(response.data.summary));
+      // Older API responses sent the summary as a JSON string
+      const data = response.data.summary;
+      setSummaryData(typeof data === 'string' ? JSON.parse(data) : data);
+      setDegraded(Boolean(response.data.degraded));
       setDbStatus('available');
     } catch (err) {
       logger.error('Error fetching summary:', err);
@@ -155,6 +159,16 @@ function SummaryPage() {
                 sx={{ ml: 1 }}
               />
             )}
+            {degraded && (
+              <Chip
+                label="Basic summary"
+                title="AI summaries are temporarily unavailable"
+                color="warning"
+                variant="outlined"
+                size="small"
+                sx={{ ml: 1 }}
+              />
+            )}
           </Box>
         </Box>
         
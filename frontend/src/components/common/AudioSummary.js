@@ -3,8 +3,10 @@ import {
   Box,
   IconButton,
   LinearProgress,
-  Alert 
+  Alert,
+  Tooltip
 } from '@mui/material';
+import BoltIcon from '@mui/icons-material/Bolt';
 import PlayArrowIcon from '@mui/icons-material/PlayArrow';
 import PauseIcon from '@mui/icons-material/Pause';
 import VolumeUpIcon from '@mui/icons-material/VolumeUp';
@@ -17,46 +19,45 @@ const AudioSummary = () => {
   const [audio, setAudio] = useState(null);
   const [error, setError] = useState(null);
   const [loading, setLoading] = useState(false);
-  const [audioUrl, setAudioUrl] = useState(null);
+  const [fastMode, setFastMode] = useState(false);
+
+  useEffect(() => {
+    // Fast mode reads the summary from a template instead of waiting for Gemini
+    summary.getAudioMode()
+      .then((response) => setFastMode(response.data.mode === 'template'))
+      .catch((err) => logger.error('Failed to fetch audio mode:', err));
+  }, []);
 
   useEffect(() => {
     return () => {
-      // Cleanup function to revoke object URL and stop audio
-      if (audioUrl) {
-        URL.revokeObjectURL(audioUrl);
-      }
+      // Cleanup function to stop audio and abort any download in progress
       if (audio) {
         audio.pause();
-        audio.currentTime = 0;
+        audio.removeAttribute('src');
+        audio.load();
       }
     };
-  }, [audio, audioUrl]);
+  }, [audio]);
 
   const fetchAudioSummary = async () => {
     try {
       setLoading(true);
       setError(null);
       logger.info('Fetching audio summary');
-      
-      const response = await summary.getAudioSummary();
-      if (!response.ok) {
-        throw new Error('Failed to fetch audio summary');
-      }
-      
-      const blob = await response.blob();
-      if (!blob || blob.size === 0) {
-        throw new Error('Received empty audio data');
-      }
-      
-      const url = URL.createObjectURL(blob);
-      
-      // Create new audio object
-      const newAudio = new Audio(url);
+
+      // The server streams the MP3 as it is synthesized, so the element can
+      // start playing after the first sentence instead of the whole file
+      const newAudio = new Audio();
+      newAudio.crossOrigin = 'use-credentials';
+      newAudio.preload = 'auto';
+      newAudio.src = summary.getAudioSummaryUrl();
       
       // Set up event listeners
       newAudio.addEventListener('timeupdate', () => {
-        const percent = (newAudio.currentTime / newAudio.duration) * 100;
-        setProgress(percent);
+        // Duration is unknown until a streamed response has finished
+        if (Number.isFinite(newAudio.duration) && newAudio.duration > 0) {
+          setProgress((newAudio.currentTime / newAudio.duration) * 100);
+        }
       });
 
       newAudio.addEventListener('ended', () => {
@@ -71,18 +72,17 @@ const AudioSummary = () => {
       });
 
       // Update state
-      setAudioUrl(url);
       setAudio(newAudio);
-      setLoading(false);
       
-      // Start playing automatically
+      // Start playing automatically; play() resolves once enough has arrived
       try {
         await newAudio.play();
         setIsPlaying(true);
       } catch (err) {
         logger.error('Failed to start audio playback:', err);
-        setError('Failed to start audio playback. Please try again.');
+        setError('Failed to load audio summary. Please try again.');
       }
+      setLoading(false);
       
     } catch (err) {
       logger.error('Failed to fetch audio summary:', err);
@@ -91,6 +91,24 @@ const AudioSummary = () => {
     }
   };
 
+  const toggleFastMode = async () => {
+    const enabled = !fastMode;
+    try {
+      await summary.setAudioMode(enabled ? 'template' : 'auto');
+      setFastMode(enabled);
+      // The next play fetches audio in the new mode
+      if (audio) {
+        audio.pause();
+      }
+      setAudio(null);
+      setIsPlaying(false);
+      setProgress(0);
+    } catch (err) {
+      logger.error('Failed to update audio mode:', err);
+      setError('Failed to update audio mode. Please try again.');
+    }
+  };
+
   const togglePlay = async () => {
     if (!audio) {
       await fetchAudioSummary();
@@ -150,6 +168,16 @@ const AudioSummary = () => {
         )}
       </Box>
       
+      <Tooltip title={fastMode ? 'Fast mode on: skips the AI-written script' : 'Fast mode off'}>
+        <IconButton 
+          onClick={toggleFastMode} 
+          color={fastMode ? 'warning' : 'default'}
+          disabled={loading}
+        >
+          <BoltIcon />
+        </IconButton>
+      </Tooltip>
+      
       <VolumeUpIcon color="primary" />
     </Box>
   );
@@ -115,15 +115,15 @@ export const summary = {
     logger.info('Sending email reply');
     return api.post('/send-reply', data);
   },
-  getAudioSummary: () => {
-    logger.info('Fetching audio summary');
-    return fetch(`${API_URL}/audio-summary`, {
-      method: 'GET',
-      credentials: 'include',
-      headers: {
-        'Accept': 'audio/mpeg'
-      }
-    });
+  // Played straight from the URL so audio starts while it is still streaming
+  getAudioSummaryUrl: () => `${API_URL}/audio-summary`,
+  getAudioMode: () => {
+    logger.info('Fetching audio script mode');
+    return api.get('/audio-summary/mode');
+  },
+  setAudioMode: (mode) => {
+    logger.info('Setting audio script mode:', mode);
+    return api.post('/audio-summary/mode', { mode });
   }
 };
 